@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
 from ..database import get_db
 from ..models.bot_log import BotLog, LogLevel
+from .pagination import paginate, next_cursor, NEXT_CURSOR_HEADER
 from pydantic import BaseModel
 
 router = APIRouter(prefix="/api/bot-logs", tags=["bot-logs"])
@@ -22,10 +23,12 @@ class BotLogResponse(BaseModel):
 
 @router.get("/", response_model=List[BotLogResponse])
 def get_bot_logs(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     level: Optional[str] = None,
     user_id: Optional[int] = None,
+    cursor: Optional[str] = Query(None, description="Keyset cursor from the X-Next-Cursor header; replaces skip"),
     db: Session = Depends(get_db)
 ):
     query = db.query(BotLog)
@@ -35,7 +38,11 @@ def get_bot_logs(
     if user_id:
         query = query.filter(BotLog.user_id == user_id)
     
-    logs = query.order_by(BotLog.created_at.desc()).offset(skip).limit(limit).all()
+    logs = paginate(query, BotLog.created_at, BotLog.id, skip, limit, cursor).all()
+    
+    cursor_value = next_cursor(logs, limit, "created_at")
+    if cursor_value:
+        response.headers[NEXT_CURSOR_HEADER] = cursor_value
     return logs
 
 @router.get("/stats")
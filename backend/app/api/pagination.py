@@ -0,0 +1,43 @@
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+from typing import Optional, Tuple, List, Any
+from datetime import datetime
+import base64
+import json
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(sort_value: datetime, row_id: int) -> str:
+    """Opaque cursor pointing at the last row of a page."""
+    payload = json.dumps([sort_value.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(sort_value), int(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def paginate(query, sort_column, id_column, skip: int, limit: int, cursor: Optional[str] = None):
+    """
+    Order newest first with `id` as tie-breaker and apply either keyset
+    (cursor) or legacy offset pagination.
+    """
+    query = query.order_by(sort_column.desc(), id_column.desc())
+
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor)
+        query = query.filter(tuple_(sort_column, id_column) < tuple_(sort_value, row_id))
+    elif skip:
+        query = query.offset(skip)
+
+    return query.limit(limit)
+
+def next_cursor(rows: List[Any], limit: int, sort_attr: str) -> Optional[str]:
+    """Cursor for the page after `rows`, or None when this was the last page."""
+    if not rows or len(rows) < limit:
+        return None
+    last = rows[-1]
+    return encode_cursor(getattr(last, sort_attr), last.id)
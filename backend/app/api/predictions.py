@@ -1,129 +1,180 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List, Dict, Any
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import update, or_
+from sqlalchemy.orm import Session, defer
+from typing import List, Dict, Any, Optional, Literal
 from ..database import get_db
-from ..models.transaction import Transaction
+from ..models.transaction import Transaction, TransactionType
 from ..models.prediction import Prediction, PredictionType
-from ..services.ml_forecasting import forecasting_service
-from ..services.ml_anomaly import anomaly_detection_service
+from ..services.user_stats import user_stats_store
+from ..services.prediction_store import save_prediction
+from .pagination import paginate, next_cursor, NEXT_CURSOR_HEADER
 from pydantic import BaseModel
-from datetime import datetime
+import time
 
 router = APIRouter(prefix="/api/predictions", tags=["predictions"])
 
 class ForecastRequest(BaseModel):
     user_id: int = None
     periods: int = 30
+    # None = FORECAST_ENGINE setting ("auto": seasonal for short histories, Prophet for long ones)
+    engine: Optional[Literal["auto", "prophet", "seasonal"]] = None
+    # "columnar": dates/actual/yhat/lower/upper arrays instead of actual/forecast/chart_data records
+    format: Literal["records", "columnar"] = "records"
+
+class BatchForecastRequest(BaseModel):
+    periods: int = 30
+    engine: Optional[Literal["auto", "prophet", "seasonal"]] = None
+    workers: Optional[int] = None
+    user_ids: Optional[List[int]] = None
+    force: bool = False
 
 class AnomalyRequest(BaseModel):
     user_id: int = None
+    force_retrain: bool = False
 
 @router.post("/forecast")
 def generate_forecast(request: ForecastRequest, db: Session = Depends(get_db)):
-    query = db.query(Transaction)
-    if request.user_id:
-        query = query.filter(Transaction.user_id == request.user_id)
-    
-    transactions = query.all()
-    
-    transactions_data = [
-        {
-            "id": t.id,
-            "transaction_type": t.transaction_type.value,
-            "amount": t.amount,
-            "transaction_date": t.transaction_date,
-            "category": t.category
-        }
-        for t in transactions
-    ]
+    # Only the columns the forecast needs, streamed straight into pandas
+    from ..services.transaction_frames import load_transactions_frame
+    
+    transactions = load_transactions_frame(
+        db,
+        columns=("transaction_type", "amount", "transaction_date"),
+        user_id=request.user_id,
+        transaction_type=TransactionType.INCOME
+    )
     
-    forecast_result = forecasting_service.forecast_revenue(transactions_data, request.periods)
+    # Prophet/cmdstanpy are imported on first use, not at startup
+    from ..services.ml_forecasting import forecasting_service, format_forecast
     
-    prediction = Prediction(
-        prediction_type=PredictionType.FORECAST,
-        prediction_data=forecast_result,
-        extra_metadata={"user_id": request.user_id, "periods": request.periods}
+    def find_stored(fingerprint: str):
+        prediction = (
+            db.query(Prediction)
+            .filter(
+                Prediction.fingerprint == fingerprint,
+                or_(Prediction.payload.isnot(None), Prediction.prediction_data.isnot(None))
+            )
+            .order_by(Prediction.created_at.desc())
+            .first()
+        )
+        return prediction.data if prediction else None
+    
+    forecast_result = forecasting_service.forecast_revenue(
+        transactions,
+        request.periods,
+        user_id=request.user_id,
+        find_stored=find_stored,
+        engine=request.engine,
+        output_format="columnar"
     )
-    db.add(prediction)
-    db.commit()
     
-    return forecast_result
+    # Stored columnar (no triplicated series); cached results are already in the predictions table
+    cache = forecast_result.pop("cache", None)
+    if not cache or cache["status"] == "miss":
+        save_prediction(
+            db,
+            PredictionType.FORECAST,
+            forecast_result,
+            user_id=request.user_id,
+            extra_metadata={"user_id": request.user_id, "periods": request.periods},
+            fingerprint=cache["fingerprint"] if cache else None
+        )
+    
+    return {**format_forecast(forecast_result, request.format), "cache": cache}
+
+@router.post("/batch-forecast")
+def batch_forecast(request: BatchForecastRequest, db: Session = Depends(get_db)):
+    """Admin: forecast every user in parallel (same job as `python -m app.jobs.batch_forecast`)"""
+    from ..jobs.batch_forecast import run_batch_forecast
+    
+    return run_batch_forecast(db, request.periods, request.workers, request.user_ids, request.force, request.engine)
+
+def write_anomaly_flags(db: Session, anomalies: List[Dict[str, Any]], user_id: Optional[int], max_id: int) -> Dict[str, Any]:
+    """
+    Persist a detection run in one transaction: one UPDATE clears the flags of
+    the analysed rows, then one executemany UPDATE by primary key sets the
+    flagged ones. Rows newer than `max_id` (scored inline by the bot while
+    this run was going) are left alone.
+    """
+    started = time.perf_counter()
+    scope = [Transaction.id <= max_id, Transaction.is_anomaly == 1]
+    if user_id:
+        scope.append(Transaction.user_id == user_id)
+    
+    try:
+        reset = db.execute(
+            update(Transaction).where(*scope).values(is_anomaly=0, anomaly_score=None),
+            execution_options={"synchronize_session": False}
+        )
+        if anomalies:
+            db.execute(
+                update(Transaction),
+                [
+                    {"id": anomaly["transaction_id"], "is_anomaly": 1, "anomaly_score": anomaly["anomaly_score"]}
+                    for anomaly in anomalies
+                ]
+            )
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error saving anomaly flags: {str(e)}")
+    
+    return {
+        "flagged": len(anomalies),
+        "previously_flagged": reset.rowcount,
+        "duration_ms": round((time.perf_counter() - started) * 1000, 2)
+    }
 
 @router.post("/anomaly")
 def detect_anomalies(request: AnomalyRequest, db: Session = Depends(get_db)):
-    query = db.query(Transaction)
-    if request.user_id:
-        query = query.filter(Transaction.user_id == request.user_id)
-    
-    transactions = query.all()
-    
-    transactions_data = [
-        {
-            "id": t.id,
-            "transaction_type": t.transaction_type.value,
-            "amount": t.amount,
-            "transaction_date": t.transaction_date,
-            "category": t.category,
-            "description": t.description
-        }
-        for t in transactions
-    ]
+    from ..services.transaction_frames import load_transactions_frame
     
-    anomaly_result = anomaly_detection_service.detect_anomalies(transactions_data)
+    transactions = load_transactions_frame(db, user_id=request.user_id)
+    
+    from ..services.ml_anomaly import anomaly_detection_service
+    
+    # Category and hour statistics come from the incremental per-user store
+    stats = user_stats_store.get(db, request.user_id) if request.user_id else None
+    
+    anomaly_result = anomaly_detection_service.detect_anomalies(
+        transactions, user_id=request.user_id, force_retrain=request.force_retrain, stats=stats
+    )
     
     if anomaly_result["status"] == "success":
-        for anomaly in anomaly_result["anomalies"]:
-            transaction = db.query(Transaction).filter(Transaction.id == anomaly["transaction_id"]).first()
-            if transaction:
-                transaction.is_anomaly = 1
-                transaction.anomaly_score = anomaly["anomaly_score"]
-        
-        db.commit()
+        anomaly_result["write_back"] = write_anomaly_flags(
+            db, anomaly_result["anomalies"], request.user_id, int(transactions["id"].max())
+        )
     
-    prediction = Prediction(
-        prediction_type=PredictionType.ANOMALY,
-        prediction_data=anomaly_result,
+    save_prediction(
+        db,
+        PredictionType.ANOMALY,
+        anomaly_result,
+        user_id=request.user_id,
         extra_metadata={"user_id": request.user_id}
     )
-    db.add(prediction)
-    db.commit()
     
     return anomaly_result
 
 @router.get("/business-pattern/{user_id}")
 def get_business_pattern(user_id: int, db: Session = Depends(get_db)):
     """Get user's business pattern analysis"""
-    transactions = db.query(Transaction).filter(Transaction.user_id == user_id).all()
+    # O(categories) read of the incremental statistics instead of loading every transaction
+    stats = user_stats_store.get(db, user_id)
     
-    if len(transactions) < 5:
+    if stats.total < 5:
         return {
             "status": "insufficient_data",
             "message": "Minimal 5 transaksi diperlukan untuk analisis pola bisnis"
         }
     
-    transactions_data = [
-        {
-            "id": t.id,
-            "transaction_type": t.transaction_type.value,
-            "amount": t.amount,
-            "transaction_date": t.transaction_date,
-            "category": t.category,
-            "description": t.description
-        }
-        for t in transactions
-    ]
-    
-    # Use the anomaly service to analyze patterns
-    import pandas as pd
-    df = pd.DataFrame(transactions_data)
-    df['transaction_date'] = pd.to_datetime(df['transaction_date'])
+    from ..services.ml_anomaly import anomaly_detection_service
     
-    business_pattern = anomaly_detection_service._analyze_business_pattern(df)
+    business_pattern = anomaly_detection_service.business_pattern_from_stats(stats)
     
     return {
         "status": "success",
         "user_id": user_id,
-        "total_transactions": len(transactions),
+        "total_transactions": stats.total,
         "business_type": business_pattern['business_type'],
         "operating_hours": business_pattern['hour_pattern']['common_hours'],
         "hour_distribution": business_pattern['hour_pattern']['hour_distribution'],
@@ -187,6 +238,8 @@ def fix_timezone_issues(db: Session = Depends(get_db)):
     
     if fixed_count > 0:
         db.commit()
+        # Hour histograms depend on the stored dates
+        user_stats_store.invalidate()
     
     return {
         "status": "success",
@@ -196,26 +249,54 @@ def fix_timezone_issues(db: Session = Depends(get_db)):
 
 @router.get("/history")
 def get_prediction_history(
-    prediction_type: str = None,
+    response: Response,
+    prediction_type: Optional[PredictionType] = None,
+    user_id: Optional[int] = None,
+    full: bool = Query(False, description="Include the full prediction_data (otherwise only the summary)"),
+    skip: int = 0,
     limit: int = 10,
+    cursor: Optional[str] = Query(None, description="Keyset cursor from the X-Next-Cursor header; replaces skip"),
     db: Session = Depends(get_db)
 ):
     query = db.query(Prediction)
     
     if prediction_type:
         query = query.filter(Prediction.prediction_type == prediction_type)
+    if user_id:
+        query = query.filter(Prediction.user_id == user_id)
+    if not full:
+        # Summaries only; the payload columns are never read
+        query = query.options(defer(Prediction.payload), defer(Prediction.prediction_data))
     
-    predictions = query.order_by(Prediction.created_at.desc()).limit(limit).all()
+    predictions = paginate(query, Prediction.created_at, Prediction.id, skip, limit, cursor).all()
     
-    return {
-        "predictions": [
-            {
-                "id": p.id,
-                "prediction_type": p.prediction_type.value,
-                "prediction_data": p.prediction_data,
-                "metadata": p.extra_metadata,
-                "created_at": p.created_at
-            }
-            for p in predictions
-        ]
-    }
+    cursor_value = next_cursor(predictions, limit, "created_at")
+    if cursor_value:
+        response.headers[NEXT_CURSOR_HEADER] = cursor_value
+    
+    history = []
+    for p in predictions:
+        item = {
+            "id": p.id,
+            "prediction_type": p.prediction_type.value,
+            "user_id": p.user_id,
+            "summary": p.summary,
+            "metadata": p.extra_metadata,
+            "created_at": p.created_at
+        }
+        if full:
+            item["prediction_data"] = p.data
+        history.append(item)
+    
+    return {"predictions": history}
+
+@router.post("/retention")
+def prediction_retention(
+    retention_days: Optional[int] = None,
+    payload_days: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """Admin: compact legacy rows, drop old payloads and delete expired predictions"""
+    from ..jobs.prediction_retention import run_retention
+    
+    return run_retention(db, retention_days, payload_days)
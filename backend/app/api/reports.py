@@ -1,17 +1,26 @@
-from fastapi import APIRouter, Depends, Query, Response
+from fastapi import APIRouter, Depends, Query
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import select, case, cast, String
 from typing import Optional, List
 from datetime import datetime, timedelta
-from io import BytesIO
-from ..database import get_db
+import tempfile
+from ..database import get_db, SessionLocal
 from ..models.transaction import Transaction, TransactionType
 from ..models.user import User
+from ..services.aggregation import build_transaction_filters, get_transaction_summary
+from .pagination import paginate, next_cursor
 from pydantic import BaseModel
 
 router = APIRouter(prefix="/api/reports", tags=["reports"])
 
+# PDF export: rows fetched per round-trip, and in-memory size before the output spills to disk
+PDF_BATCH_SIZE = 2000
+PDF_SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+# CSV / XLSX / Parquet exports: rows per cursor batch (one Parquet row group each)
+EXPORT_BATCH_SIZE = 50000
+
 class ReportTransaction(BaseModel):
     id: int
     user_id: int
@@ -39,7 +48,68 @@ class ReportSummary(BaseModel):
 class ReportResponse(BaseModel):
     transactions: List[ReportTransaction]
     summary: ReportSummary
-    total_count: int
+    total_count: Optional[int] = None
+    next_cursor: Optional[str] = None
+
+def _parse_report_date(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except:
+        return None
+
+def _report_filters(
+    user_id: Optional[int],
+    transaction_type: Optional[str],
+    category: Optional[str],
+    start_date: Optional[str],
+    end_date: Optional[str]
+):
+    """Build report filters; the end date is inclusive of the whole day."""
+    end_dt = _parse_report_date(end_date)
+    return build_transaction_filters(
+        user_id=user_id,
+        transaction_type=transaction_type,
+        category=category,
+        start_date=_parse_report_date(start_date),
+        end_before=end_dt + timedelta(days=1) if end_dt else None
+    )
+
+PDF_TYPE_LABELS = {
+    'income': '💰 Pemasukan',
+    'expense': '💸 Pengeluaran',
+    'receivable': '📝 Piutang',
+    'payable': '📋 Hutang'
+}
+
+def _pdf_row(idx: int, row) -> List[str]:
+    """One detail-table row; text is kept to a single line so every row has the same height."""
+    txn_type = row.transaction_type.value if hasattr(row.transaction_type, 'value') else row.transaction_type
+    
+    desc = ' '.join((row.description or '').split()) or '-'
+    if len(desc) > 40:
+        desc = desc[:37] + '...'
+    
+    return [
+        str(idx),
+        row.transaction_date.strftime('%d/%m/%Y\n%H:%M'),
+        PDF_TYPE_LABELS.get(txn_type, txn_type),
+        ' '.join((row.category or '').split()) or '-',
+        desc,
+        f"Rp {row.amount:,.0f}",
+    ]
+
+def _iter_file(file, chunk_size: int = 64 * 1024):
+    """Stream a file in chunks and close it once sent (or the client went away)."""
+    try:
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        file.close()
 
 @router.get("/transactions", response_model=ReportResponse)
 def get_report_transactions(
@@ -50,38 +120,19 @@ def get_report_transactions(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     user_id: Optional[int] = None,
+    cursor: Optional[str] = Query(None, description="Keyset cursor from a previous next_cursor; replaces skip"),
+    include_count: bool = Query(True, description="Set false to skip the separate COUNT(*) query"),
     db: Session = Depends(get_db)
 ):
     """Get transactions for reporting with filters."""
-    query = db.query(Transaction, User.username).join(User, Transaction.user_id == User.id)
-    
-    # Apply filters
-    if user_id:
-        query = query.filter(Transaction.user_id == user_id)
-    if transaction_type:
-        query = query.filter(Transaction.transaction_type == transaction_type)
-    if category:
-        query = query.filter(Transaction.category.ilike(f"%{category}%"))
-    if start_date:
-        try:
-            start_dt = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-            query = query.filter(Transaction.transaction_date >= start_dt)
-        except:
-            pass
-    if end_date:
-        try:
-            end_dt = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-            # Add 1 day to include the end date
-            end_dt = end_dt + timedelta(days=1)
-            query = query.filter(Transaction.transaction_date < end_dt)
-        except:
-            pass
+    filters = _report_filters(user_id, transaction_type, category, start_date, end_date)
+    query = db.query(Transaction, User.username).join(User, Transaction.user_id == User.id).filter(*filters)
     
     # Get total count
-    total_count = query.count()
+    total_count = query.count() if include_count else None
     
     # Get paginated results
-    results = query.order_by(Transaction.transaction_date.desc()).offset(skip).limit(limit).all()
+    results = paginate(query, Transaction.transaction_date, Transaction.id, skip, limit, cursor).all()
     
     # Build transactions list
     transactions = []
@@ -99,41 +150,15 @@ def get_report_transactions(
         ))
     
     # Calculate summary (for all filtered data, not just paginated)
-    summary_query = db.query(Transaction)
-    if user_id:
-        summary_query = summary_query.filter(Transaction.user_id == user_id)
-    if transaction_type:
-        summary_query = summary_query.filter(Transaction.transaction_type == transaction_type)
-    if category:
-        summary_query = summary_query.filter(Transaction.category.ilike(f"%{category}%"))
-    if start_date:
-        try:
-            start_dt = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-            summary_query = summary_query.filter(Transaction.transaction_date >= start_dt)
-        except:
-            pass
-    if end_date:
-        try:
-            end_dt = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-            end_dt = end_dt + timedelta(days=1)
-            summary_query = summary_query.filter(Transaction.transaction_date < end_dt)
-        except:
-            pass
-    
-    all_transactions = summary_query.all()
-    
-    total_income = sum(t.amount for t in all_transactions if t.transaction_type == TransactionType.INCOME)
-    total_expense = sum(t.amount for t in all_transactions if t.transaction_type == TransactionType.EXPENSE)
-    total_receivable = sum(t.amount for t in all_transactions if t.transaction_type == TransactionType.RECEIVABLE)
-    total_payable = sum(t.amount for t in all_transactions if t.transaction_type == TransactionType.PAYABLE)
+    totals = get_transaction_summary(db, filters)
     
     summary = ReportSummary(
-        total_income=total_income,
-        total_expense=total_expense,
-        total_receivable=total_receivable,
-        total_payable=total_payable,
-        net_balance=total_income - total_expense,
-        transaction_count=len(all_transactions),
+        total_income=totals["total_income"],
+        total_expense=totals["total_expense"],
+        total_receivable=totals["total_receivable"],
+        total_payable=totals["total_payable"],
+        net_balance=totals["total_income"] - totals["total_expense"],
+        transaction_count=totals["transaction_count"],
         period_start=start_date,
         period_end=end_date
     )
@@ -141,7 +166,8 @@ def get_report_transactions(
     return ReportResponse(
         transactions=transactions,
         summary=summary,
-        total_count=total_count
+        total_count=total_count,
+        next_cursor=next_cursor([txn for txn, _ in results], limit, "transaction_date")
     )
 
 @router.get("/categories")
@@ -168,43 +194,37 @@ def export_pdf(
     from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT
     from reportlab.pdfbase import pdfmetrics
     from reportlab.pdfbase.ttfonts import TTFont
+    from ..services.report_pdf import LazyStory, TableRows
+    from itertools import chain
     import pytz
     
-    # Query transactions
-    query = db.query(Transaction, User.username).join(User, Transaction.user_id == User.id)
-    
-    if user_id:
-        query = query.filter(Transaction.user_id == user_id)
-    if transaction_type:
-        query = query.filter(Transaction.transaction_type == transaction_type)
-    if category:
-        query = query.filter(Transaction.category.ilike(f"%{category}%"))
-    if start_date:
-        try:
-            start_dt = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-            query = query.filter(Transaction.transaction_date >= start_dt)
-        except:
-            pass
-    if end_date:
-        try:
-            end_dt = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-            end_dt = end_dt + timedelta(days=1)
-            query = query.filter(Transaction.transaction_date < end_dt)
-        except:
-            pass
-    
-    results = query.order_by(Transaction.transaction_date.desc()).all()
+    # Stream rows in batches; only the columns the table shows
+    filters = _report_filters(user_id, transaction_type, category, start_date, end_date)
+    stmt = (
+        select(
+            Transaction.transaction_date,
+            Transaction.transaction_type,
+            Transaction.category,
+            Transaction.description,
+            Transaction.amount
+        )
+        .join(User, Transaction.user_id == User.id)
+        .where(*filters)
+        .order_by(Transaction.transaction_date.desc(), Transaction.id.desc())
+        .execution_options(yield_per=PDF_BATCH_SIZE)
+    )
     
     # Calculate summary
-    total_income = sum(t.amount for t, _ in results if t.transaction_type == TransactionType.INCOME)
-    total_expense = sum(t.amount for t, _ in results if t.transaction_type == TransactionType.EXPENSE)
-    total_receivable = sum(t.amount for t, _ in results if t.transaction_type == TransactionType.RECEIVABLE)
-    total_payable = sum(t.amount for t, _ in results if t.transaction_type == TransactionType.PAYABLE)
-    
-    # Create PDF
-    buffer = BytesIO()
+    totals = get_transaction_summary(db, filters)
+    total_income = totals["total_income"]
+    total_expense = totals["total_expense"]
+    total_receivable = totals["total_receivable"]
+    total_payable = totals["total_payable"]
+    
+    # Create PDF; spills from memory to disk past PDF_SPOOL_MAX_SIZE
+    spool = tempfile.SpooledTemporaryFile(max_size=PDF_SPOOL_MAX_SIZE)
     doc = SimpleDocTemplate(
-        buffer, 
+        spool, 
         pagesize=landscape(A4), 
         rightMargin=1*cm, 
         leftMargin=1*cm, 
@@ -287,7 +307,7 @@ def export_pdf(
         ["Saldo Bersih", f"Rp {(total_income - total_expense):,.0f}"],
         ["Total Piutang", f"Rp {total_receivable:,.0f}"],
         ["Total Hutang", f"Rp {total_payable:,.0f}"],
-        ["Jumlah Transaksi", str(len(results))],
+        ["Jumlah Transaksi", str(totals["transaction_count"])],
     ]
     
     summary_table = Table(summary_data, colWidths=[8*cm, 6*cm])
@@ -324,78 +344,52 @@ def export_pdf(
     elements.append(summary_table)
     elements.append(Spacer(1, 25))
     
-    # Transaction Details
-    if results:
-        elements.append(Paragraph("DETAIL TRANSAKSI", heading_style))
-        elements.append(Spacer(1, 10))
-        
-        table_data = [["No", "Tanggal", "Tipe", "Kategori", "Deskripsi", "Jumlah"]]
-        
-        for idx, (txn, username) in enumerate(results, 1):
-            txn_type = txn.transaction_type.value if hasattr(txn.transaction_type, 'value') else txn.transaction_type
-            type_label = {
-                'income': '💰 Pemasukan',
-                'expense': '💸 Pengeluaran',
-                'receivable': '📝 Piutang',
-                'payable': '📋 Hutang'
-            }.get(txn_type, txn_type)
-            
-            desc = txn.description or '-'
-            if len(desc) > 40:
-                desc = desc[:37] + '...'
-            
-            table_data.append([
-                str(idx),
-                txn.transaction_date.strftime('%d/%m/%Y\n%H:%M'),
-                type_label,
-                txn.category or '-',
-                desc,
-                f"Rp {txn.amount:,.0f}",
-            ])
-        
-        col_widths = [1.2*cm, 2.5*cm, 3*cm, 2.8*cm, 6*cm, 3.5*cm]
-        txn_table = Table(table_data, colWidths=col_widths, repeatRows=1)
+    # Transaction Details: page-sized tables built as layout reaches them
+    col_widths = [1.2*cm, 2.5*cm, 3*cm, 2.8*cm, 6*cm, 3.5*cm]
+    table_style = [
+        # Header
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3B82F6')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 10),
+        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
         
-        # Build table style
-        table_style = [
-            # Header
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3B82F6')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            
-            # Body
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -1), 8),
-            ('ALIGN', (0, 1), (0, -1), 'CENTER'),
-            ('ALIGN', (1, 1), (1, -1), 'CENTER'),
-            ('ALIGN', (2, 1), (4, -1), 'LEFT'),
-            ('ALIGN', (5, 1), (5, -1), 'RIGHT'),
-            
-            # Grid
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#E5E7EB')),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('TOPPADDING', (0, 0), (-1, -1), 6),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ('LEFTPADDING', (0, 0), (-1, -1), 8),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 8),
-        ]
+        # Body
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 1), (-1, -1), 8),
+        ('ALIGN', (0, 1), (0, -1), 'CENTER'),
+        ('ALIGN', (1, 1), (1, -1), 'CENTER'),
+        ('ALIGN', (2, 1), (4, -1), 'LEFT'),
+        ('ALIGN', (5, 1), (5, -1), 'RIGHT'),
         
+        # Grid
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#E5E7EB')),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('TOPPADDING', (0, 0), (-1, -1), 6),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+        ('LEFTPADDING', (0, 0), (-1, -1), 8),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 8),
+    ]
+    results = db.execute(stmt)
+    table_rows = TableRows(
+        (_pdf_row(idx, row) for idx, row in enumerate(results, 1)),
+        header=["No", "Tanggal", "Tipe", "Kategori", "Deskripsi", "Jumlah"],
+        col_widths=col_widths,
+        style=table_style,
         # Alternating row colors
-        for i in range(1, len(table_data)):
-            if i % 2 == 0:
-                table_style.append(('BACKGROUND', (0, i), (-1, i), colors.HexColor('#F9FAFB')))
-            else:
-                table_style.append(('BACKGROUND', (0, i), (-1, i), colors.white))
-        
-        txn_table.setStyle(TableStyle(table_style))
-        elements.append(txn_table)
+        row_backgrounds=[colors.white, colors.HexColor('#F9FAFB')],
+        sample_row=["1", "01/01/2024\n00:00", "-", "-", "-", "-"]
+    )
+    
+    if table_rows.has_more():
+        elements.append(Paragraph("DETAIL TRANSAKSI", heading_style))
+        elements.append(Spacer(1, 10))
+        details = table_rows.tables()
     else:
-        elements.append(Paragraph("Tidak ada transaksi untuk periode ini.", styles['Normal']))
+        details = [Paragraph("Tidak ada transaksi untuk periode ini.", styles['Normal'])]
     
     # Footer note
-    elements.append(Spacer(1, 30))
+    footer = [Spacer(1, 30)]
     footer_style = ParagraphStyle(
         'Footer',
         parent=styles['Normal'],
@@ -403,18 +397,120 @@ def export_pdf(
         textColor=colors.HexColor('#9CA3AF'),
         alignment=TA_CENTER
     )
-    elements.append(Paragraph(
+    footer.append(Paragraph(
         "Laporan ini dibuat secara otomatis oleh CuanBot - Akunting Chatbot untuk UMKM Indonesia",
         footer_style
     ))
     
-    doc.build(elements)
-    buffer.seek(0)
+    try:
+        doc.build(LazyStory(chain(elements, details, footer)))
+    except Exception:
+        spool.close()
+        raise
+    size = spool.tell()
+    spool.seek(0)
     
     filename = f"laporan_keuangan_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
     
     return StreamingResponse(
-        buffer,
+        _iter_file(spool),
         media_type="application/pdf",
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}",
+            "Content-Length": str(size)
+        }
+    )
+
+def _export_batches(filters, session_factory=SessionLocal):
+    """
+    Rows of the export query in batches from a server-side cursor. Uses its
+    own session (the request's is closed before the response streams) and a
+    Core connection, so rows come back as plain tuples without ORM loading.
+    """
+    # Enum names as stored -> the values the API returns, mapped in SQL. A real
+    # CAST keeps the CASE a string (Postgres would otherwise resolve it to the enum)
+    stored_type = cast(Transaction.transaction_type, String)
+    transaction_type = case(
+        {t.name: t.value for t in TransactionType},
+        value=stored_type,
+        else_=stored_type
+    )
+    
+    stmt = (
+        select(
+            Transaction.id,
+            Transaction.user_id,
+            User.username,
+            transaction_type.label("transaction_type"),
+            Transaction.amount,
+            Transaction.category,
+            Transaction.description,
+            Transaction.transaction_date,
+            Transaction.is_anomaly
+        )
+        .join(User, Transaction.user_id == User.id)
+        .where(*filters)
+        .order_by(Transaction.transaction_date.desc(), Transaction.id.desc())
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    
+    db = session_factory()
+    try:
+        for batch in db.connection().execute(stmt).partitions():
+            yield batch
+    finally:
+        db.close()
+
+def _export_response(chunks, media_type: str, extension: str) -> StreamingResponse:
+    filename = f"transaksi_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
         headers={"Content-Disposition": f"attachment; filename={filename}"}
     )
+
+@router.get("/export/csv")
+def export_csv(
+    transaction_type: Optional[str] = None,
+    category: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    user_id: Optional[int] = None
+):
+    """Export filtered transactions as CSV, streamed batch by batch."""
+    from ..services.report_export import csv_chunks
+    
+    filters = _report_filters(user_id, transaction_type, category, start_date, end_date)
+    return _export_response(csv_chunks(_export_batches(filters)), "text/csv", "csv")
+
+@router.get("/export/xlsx")
+def export_xlsx(
+    transaction_type: Optional[str] = None,
+    category: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    user_id: Optional[int] = None
+):
+    """Export filtered transactions as an Excel workbook."""
+    from ..services.report_export import xlsx_chunks
+    
+    filters = _report_filters(user_id, transaction_type, category, start_date, end_date)
+    return _export_response(
+        xlsx_chunks(_export_batches(filters)),
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        "xlsx"
+    )
+
+@router.get("/export/parquet")
+def export_parquet(
+    transaction_type: Optional[str] = None,
+    category: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    user_id: Optional[int] = None
+):
+    """Export filtered transactions as Parquet, one row group per cursor batch."""
+    from ..services.report_export import parquet_chunks
+    
+    filters = _report_filters(user_id, transaction_type, category, start_date, end_date)
+    return _export_response(parquet_chunks(_export_batches(filters)), "application/vnd.apache.parquet", "parquet")
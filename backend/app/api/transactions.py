@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import func, extract
 from typing import List, Optional
@@ -6,6 +6,9 @@ from datetime import datetime, timedelta
 from ..database import get_db
 from ..models.transaction import Transaction, TransactionType
 from ..models.user import User
+from ..services.aggregation import build_transaction_filters, get_transaction_summary
+from ..services.user_stats import user_stats_store
+from .pagination import paginate, next_cursor, NEXT_CURSOR_HEADER
 from pydantic import BaseModel
 
 router = APIRouter(prefix="/api/transactions", tags=["transactions"])
@@ -38,10 +41,12 @@ class TransactionStats(BaseModel):
 
 @router.get("/", response_model=List[TransactionResponse])
 def get_transactions(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     transaction_type: Optional[str] = None,
     user_id: Optional[int] = None,
+    cursor: Optional[str] = Query(None, description="Keyset cursor from the X-Next-Cursor header; replaces skip"),
     db: Session = Depends(get_db)
 ):
     query = db.query(Transaction)
@@ -51,7 +56,11 @@ def get_transactions(
     if transaction_type:
         query = query.filter(Transaction.transaction_type == transaction_type)
     
-    transactions = query.order_by(Transaction.transaction_date.desc()).offset(skip).limit(limit).all()
+    transactions = paginate(query, Transaction.transaction_date, Transaction.id, skip, limit, cursor).all()
+    
+    cursor_value = next_cursor(transactions, limit, "transaction_date")
+    if cursor_value:
+        response.headers[NEXT_CURSOR_HEADER] = cursor_value
     return transactions
 
 @router.get("/stats", response_model=TransactionStats)
@@ -61,27 +70,15 @@ def get_transaction_stats(
     end_date: Optional[datetime] = None,
     db: Session = Depends(get_db)
 ):
-    query = db.query(Transaction)
-    
-    if user_id:
-        query = query.filter(Transaction.user_id == user_id)
-    if start_date:
-        query = query.filter(Transaction.transaction_date >= start_date)
-    if end_date:
-        query = query.filter(Transaction.transaction_date <= end_date)
-    
-    transactions = query.all()
-    
-    total_income = sum(t.amount for t in transactions if t.transaction_type == TransactionType.INCOME)
-    total_expense = sum(t.amount for t in transactions if t.transaction_type == TransactionType.EXPENSE)
-    total_receivable = sum(t.amount for t in transactions if t.transaction_type == TransactionType.RECEIVABLE)
-    total_payable = sum(t.amount for t in transactions if t.transaction_type == TransactionType.PAYABLE)
+    summary = get_transaction_summary(db, build_transaction_filters(
+        user_id=user_id,
+        start_date=start_date,
+        end_date=end_date
+    ))
     
-    # Calculate HPP (Cost of Goods Sold) from expenses with specific categories
-    hpp_categories = ['COGS', 'Bahan Baku', 'HPP', 'Cost of Goods Sold']
-    hpp = sum(t.amount for t in transactions 
-              if t.transaction_type == TransactionType.EXPENSE 
-              and t.category and any(cat.lower() in t.category.lower() for cat in hpp_categories))
+    total_income = summary["total_income"]
+    total_expense = summary["total_expense"]
+    hpp = summary["hpp"]
     
     # Calculate Operational Expenses (excluding HPP)
     operational_expense = total_expense - hpp
@@ -98,9 +95,9 @@ def get_transaction_stats(
         operational_expense=operational_expense,
         net_profit=net_profit,
         cash_balance=cash_balance,
-        total_receivable=total_receivable,
-        total_payable=total_payable,
-        transaction_count=len(transactions)
+        total_receivable=summary["total_receivable"],
+        total_payable=summary["total_payable"],
+        transaction_count=summary["transaction_count"]
     )
 
 @router.get("/daily")
@@ -184,6 +181,7 @@ def reset_all_transactions(
         # Delete all transactions
         deleted_count = db.query(Transaction).delete()
         db.commit()
+        user_stats_store.invalidate()
         
         return {
             "status": "success",
@@ -291,6 +289,7 @@ def generate_sample_data(db: Session = Depends(get_db)):
         # Add all transactions to database
         db.add_all(transactions)
         db.commit()
+        user_stats_store.invalidate(user.id)
         
         return {
             "status": "success",
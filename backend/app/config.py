@@ -12,8 +12,46 @@ class Settings(BaseSettings):
     telegram_bot_token: str
     telegram_webhook_url: str = ""
     
+    # Webhook ingestion queue
+    webhook_workers: int = 4
+    webhook_queue_size: int = 1000
+    webhook_drain_timeout: float = 10.0
+    
     gemini_api_key: str
     
+    # Rule-based parser results at or above this confidence skip the LLM
+    fast_parse_min_confidence: float = 0.8
+    
+    # LLM response cache; set llm_cache_url (may equal database_url) to persist across restarts
+    llm_cache_enabled: bool = True
+    llm_cache_size: int = 2048
+    llm_cache_ttl: int = 86400
+    llm_cache_url: str = ""
+    
+    # Per-user anomaly models (joblib files); retrained after this many hours or on drift
+    anomaly_model_dir: str = "data/anomaly_models"
+    anomaly_retrain_hours: float = 24.0
+    anomaly_drift_factor: float = 2.0
+    anomaly_drift_min_rows: int = 50
+    # Score new bot transactions against the cached model (warn when the reply is slower than the budget)
+    anomaly_inline_scoring: bool = True
+    anomaly_inline_budget_ms: float = 5.0
+    
+    # Forecast results kept in memory, keyed by a fingerprint of the daily income series
+    forecast_cache_size: int = 256
+    # "auto" uses the NumPy seasonal engine up to forecast_fast_max_days of history and Prophet beyond
+    forecast_engine: str = "auto"
+    forecast_fast_max_days: int = 90
+    # Processes for the batch forecast job (0 = CPU count)
+    forecast_batch_workers: int = 0
+    
+    # Prediction history: full payloads kept this many days, rows deleted after retention (0 = keep)
+    prediction_payload_days: int = 30
+    prediction_retention_days: int = 90
+    
+    # Import Gemini/Prophet/scikit-learn in the background at startup instead of on first request
+    warmup_services: bool = False
+    
     backend_port: int = 8000
     secret_key: str
     
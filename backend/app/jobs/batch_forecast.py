@@ -0,0 +1,208 @@
+"""
+Nightly revenue forecasts for every user.
+
+Every user's daily income series is read with one grouped query, a
+forecast engine (Prophet or the seasonal engine, see forecasters.py) is
+fitted per user in a process pool (cmdstan pinned to one thread per
+process) and the results are bulk-inserted into `predictions`, tagged with
+the same fingerprint the /forecast endpoint uses, so its cache serves them.
+
+Usage (from backend/):
+    python -m app.jobs.batch_forecast --periods 30 --workers 4
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import Date, func, insert, select
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..database import SessionLocal
+from ..models.prediction import Prediction, PredictionType
+from ..models.transaction import Transaction, TransactionType
+from ..services.prediction_store import prediction_row
+
+logger = logging.getLogger(__name__)
+
+# Same minimum as ForecastingService.forecast_revenue
+MIN_DAYS = 7
+INSERT_BATCH_SIZE = 500
+
+# BLAS pools inside every worker would oversubscribe the cores the pool already uses
+_SINGLE_THREAD_ENV = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+
+def load_daily_income(db: Session, user_ids: Optional[List[int]] = None) -> Dict[int, pd.DataFrame]:
+    """Daily income per user ({user_id: DataFrame(ds, y)}) from a single GROUP BY query."""
+    day = func.date(Transaction.transaction_date, type_=Date)
+    statement = (
+        select(Transaction.user_id, day.label("ds"), func.sum(Transaction.amount).label("y"))
+        .where(Transaction.transaction_type == TransactionType.INCOME)
+        .group_by(Transaction.user_id, day)
+        .order_by(Transaction.user_id, day)
+    )
+    if user_ids:
+        statement = statement.where(Transaction.user_id.in_(user_ids))
+    
+    df = pd.read_sql(statement, db.connection())
+    df["ds"] = pd.to_datetime(df["ds"])
+    df["y"] = df["y"].astype(np.float64)
+    return {
+        int(user_id): group[["ds", "y"]].reset_index(drop=True)
+        for user_id, group in df.groupby("user_id", sort=False)
+    }
+
+def stored_fingerprints(db: Session, fingerprints: List[str], chunk_size: int = 500) -> set:
+    """Fingerprints that already have a stored forecast (with its payload)."""
+    stored = set()
+    for start in range(0, len(fingerprints), chunk_size):
+        chunk = fingerprints[start:start + chunk_size]
+        stored.update(
+            value for (value,) in db.query(Prediction.fingerprint).filter(
+                Prediction.prediction_type == PredictionType.FORECAST,
+                Prediction.fingerprint.in_(chunk),
+                Prediction.payload.isnot(None)
+            )
+        )
+    return stored
+
+def _init_worker():
+    os.environ["STAN_NUM_THREADS"] = "1"
+    logging.getLogger("cmdstanpy").setLevel(logging.WARNING)
+
+def _fit_user(task: Tuple[int, np.ndarray, np.ndarray, int, str]) -> Tuple[int, Dict[str, Any]]:
+    user_id, days, amounts, periods, engine = task
+    # Engines (Prophet) are imported once per worker process
+    from ..services.ml_forecasting import forecasting_service
+    from ..services.forecasters import ENGINES
+    
+    df = pd.DataFrame({"ds": days, "y": amounts})
+    return user_id, forecasting_service.fit_forecast(df, periods, ENGINES[engine])
+
+def _fit_all(tasks: List[tuple], workers: int) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    if workers <= 1:
+        _init_worker()
+        yield from map(_fit_user, tasks)
+        return
+    
+    for var in _SINGLE_THREAD_ENV:
+        os.environ.setdefault(var, "1")
+    # spawn: never fork a process that is running threads (uvicorn, the bot)
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker
+    ) as pool:
+        chunksize = max(1, len(tasks) // (workers * 4))
+        yield from pool.map(_fit_user, tasks, chunksize=chunksize)
+
+def run_batch_forecast(
+    db: Session,
+    periods: int = 30,
+    workers: Optional[int] = None,
+    user_ids: Optional[List[int]] = None,
+    force: bool = False,
+    engine: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Forecast every user (or `user_ids`) and store one prediction per user.
+    Users with unchanged data since their last stored forecast are skipped
+    unless `force` is set.
+    """
+    from ..services.ml_forecasting import forecasting_service
+    
+    started = time.perf_counter()
+    workers = workers or settings.forecast_batch_workers or os.cpu_count() or 1
+    
+    series = load_daily_income(db, user_ids)
+    load_seconds = time.perf_counter() - started
+    
+    tasks = []
+    fingerprints = {}
+    engines = {}
+    insufficient = 0
+    for user_id, df in series.items():
+        if len(df) < MIN_DAYS:
+            insufficient += 1
+            continue
+        forecaster = forecasting_service.engine_for(engine, len(df))
+        engines[forecaster.name] = engines.get(forecaster.name, 0) + 1
+        fingerprints[user_id] = forecasting_service.fingerprint(df, periods, user_id, forecaster.name)
+        tasks.append((user_id, df["ds"].to_numpy(), df["y"].to_numpy(), periods, forecaster.name))
+    
+    unchanged = 0
+    if not force and tasks:
+        stored = stored_fingerprints(db, list(fingerprints.values()))
+        unchanged = sum(1 for task in tasks if fingerprints[task[0]] in stored)
+        tasks = [task for task in tasks if fingerprints[task[0]] not in stored]
+    
+    fit_started = time.perf_counter()
+    counts = {"success": 0, "error": 0}
+    rows = []
+    for user_id, result in _fit_all(tasks, min(workers, max(len(tasks), 1))):
+        counts["success" if result["status"] == "success" else "error"] += 1
+        if result["status"] != "success":
+            logger.warning(f"Batch forecast failed for user {user_id}: {result.get('message')}")
+            continue
+        rows.append(prediction_row(
+            PredictionType.FORECAST,
+            result,
+            user_id=user_id,
+            extra_metadata={"user_id": user_id, "periods": periods, "batch": True},
+            fingerprint=fingerprints[user_id]
+        ))
+        if len(rows) >= INSERT_BATCH_SIZE:
+            db.execute(insert(Prediction), rows)
+            db.commit()
+            rows = []
+    if rows:
+        db.execute(insert(Prediction), rows)
+        db.commit()
+    fit_seconds = time.perf_counter() - fit_started
+    
+    total_seconds = time.perf_counter() - started
+    fitted = counts["success"] + counts["error"]
+    summary = {
+        "status": "success",
+        "users": len(series),
+        "forecasted": counts["success"],
+        "failed": counts["error"],
+        "insufficient_data": insufficient,
+        "unchanged": unchanged,
+        "workers": workers,
+        "engines": engines,
+        "periods": periods,
+        "load_seconds": round(load_seconds, 3),
+        "fit_seconds": round(fit_seconds, 3),
+        "total_seconds": round(total_seconds, 3),
+        "users_per_second": round(fitted / fit_seconds, 2) if fitted and fit_seconds else 0.0
+    }
+    logger.info(f"Batch forecast: {summary}")
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--periods", type=int, default=30)
+    parser.add_argument("--workers", type=int, default=None, help="process count (default FORECAST_BATCH_WORKERS or CPU count)")
+    parser.add_argument("--users", type=int, nargs="*", default=None, help="only these user ids")
+    parser.add_argument("--force", action="store_true", help="refit users whose data did not change")
+    parser.add_argument("--engine", choices=("auto", "prophet", "seasonal"), default=None, help="default FORECAST_ENGINE")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    db = SessionLocal()
+    try:
+        summary = run_batch_forecast(db, args.periods, args.workers, args.users, args.force, args.engine)
+    finally:
+        db.close()
+    for key, value in summary.items():
+        print(f"{key:>18}: {value}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Retention and compaction for the `predictions` table.
+
+1. Compacts legacy rows (full JSON in `prediction_data`) into a compressed
+   `payload` + `summary`, filling `user_id`/`fingerprint` from their metadata.
+2. Drops the payload of rows older than PREDICTION_PAYLOAD_DAYS (the summary
+   stays listed in /history).
+3. Deletes rows older than PREDICTION_RETENTION_DAYS.
+
+A value of 0 disables step 2 or 3.
+
+Usage (from backend/):
+    python -m app.jobs.prediction_retention --retention-days 90 --payload-days 30
+"""
+import argparse
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from sqlalchemy import delete, update
+
+from ..config import settings
+from ..database import SessionLocal
+from ..models.prediction import Prediction, encode_payload
+from ..services.prediction_store import summarize
+
+logger = logging.getLogger(__name__)
+
+def compact_legacy(db, batch_size: int = 500) -> int:
+    compacted = 0
+    while True:
+        rows = (
+            db.query(Prediction)
+            .filter(Prediction.prediction_data.isnot(None))
+            .order_by(Prediction.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            return compacted
+        for row in rows:
+            metadata = row.extra_metadata or {}
+            data = row.prediction_data or {}
+            row.payload = encode_payload(data)
+            row.summary = summarize(row.prediction_type, data)
+            row.user_id = row.user_id if row.user_id is not None else metadata.get("user_id")
+            row.fingerprint = row.fingerprint or metadata.get("fingerprint")
+            row.prediction_data = None
+        db.commit()
+        compacted += len(rows)
+
+def run_retention(
+    db,
+    retention_days: Optional[int] = None,
+    payload_days: Optional[int] = None,
+    batch_size: int = 500
+) -> Dict[str, Any]:
+    started = time.perf_counter()
+    retention_days = settings.prediction_retention_days if retention_days is None else retention_days
+    payload_days = settings.prediction_payload_days if payload_days is None else payload_days
+    now = datetime.now(timezone.utc)
+    
+    compacted = compact_legacy(db, batch_size)
+    
+    payloads_dropped = 0
+    if payload_days:
+        payloads_dropped = db.execute(
+            update(Prediction)
+            .where(Prediction.created_at < now - timedelta(days=payload_days), Prediction.payload.isnot(None))
+            .values(payload=None),
+            execution_options={"synchronize_session": False}
+        ).rowcount
+    
+    deleted = 0
+    if retention_days:
+        deleted = db.execute(
+            delete(Prediction).where(Prediction.created_at < now - timedelta(days=retention_days)),
+            execution_options={"synchronize_session": False}
+        ).rowcount
+    db.commit()
+    
+    summary = {
+        "status": "success",
+        "compacted": compacted,
+        "payloads_dropped": payloads_dropped,
+        "deleted": deleted,
+        "retention_days": retention_days,
+        "payload_days": payload_days,
+        "duration_ms": round((time.perf_counter() - started) * 1000, 2)
+    }
+    logger.info(f"Prediction retention: {summary}")
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--retention-days", type=int, default=None, help="default PREDICTION_RETENTION_DAYS")
+    parser.add_argument("--payload-days", type=int, default=None, help="default PREDICTION_PAYLOAD_DAYS")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    db = SessionLocal()
+    try:
+        summary = run_retention(db, args.retention_days, args.payload_days)
+    finally:
+        db.close()
+    for key, value in summary.items():
+        print(f"{key:>16}: {value}")
+
+if __name__ == "__main__":
+    main()
@@ -1,34 +1,81 @@
 from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 import logging
+import time
 
-from .database import engine, SessionLocal, Base
+from .database import engine, SessionLocal, AsyncSessionLocal, async_engine, Base
 from .models import User, Transaction, BotLog, Prediction
 from .api import transactions, predictions, bot_logs, reports
 from .services.telegram_bot import TelegramBotService
+from .services.update_queue import UpdateQueue
 from .config import settings
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 bot_service = None
+update_queue = None
+warmup_task = None
+
+def warm_up_services():
+    """Load the heavy services (Gemini SDK, Prophet, scikit-learn) ahead of the first request."""
+    started = time.perf_counter()
+    from .services.llm_service import llm_service
+    # Imported only for their side effects: the modules (pandas, scikit-learn) load and build their singletons
+    from .services.ml_forecasting import forecasting_service
+    from .services.forecasters import ProphetForecaster
+    from .services.ml_anomaly import anomaly_detection_service
+    
+    # Property access is the side effect: imports the Gemini SDK and configures the model
+    llm_service.model
+    ProphetForecaster.load()
+    logger.info(f"Services warmed up in {time.perf_counter() - started:.2f}s")
+
+def _log_warmup_result(task: asyncio.Task):
+    if task.cancelled():
+        logger.info("Service warm-up cancelled")
+    elif task.exception() is not None:
+        logger.error("Service warm-up failed", exc_info=task.exception())
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("Starting CuanBot application...")
     
+    # Creates the head schema on an empty database only; such a database must
+    # then be `alembic stamp head`-ed (see docs/DATABASE_MIGRATIONS.md)
     Base.metadata.create_all(bind=engine)
     logger.info("Database tables created")
     
-    global bot_service
-    bot_service = TelegramBotService(SessionLocal)
+    global bot_service, update_queue
+    bot_service = TelegramBotService(AsyncSessionLocal)
     await bot_service.initialize()
     logger.info("Telegram bot initialized")
     
+    update_queue = UpdateQueue(
+        bot_service.process_update,
+        workers=settings.webhook_workers,
+        maxsize=settings.webhook_queue_size
+    )
+    await update_queue.start()
+    
+    global warmup_task
+    if settings.warmup_services:
+        # Runs in a thread so the app starts serving immediately
+        warmup_task = asyncio.create_task(asyncio.to_thread(warm_up_services))
+        warmup_task.add_done_callback(_log_warmup_result)
+    
     yield
     
     logger.info("Shutting down CuanBot application...")
+    if warmup_task and not warmup_task.done():
+        # Stops waiting for it; the thread itself cannot be interrupted
+        warmup_task.cancel()
+        await asyncio.gather(warmup_task, return_exceptions=True)
+    await update_queue.stop(settings.webhook_drain_timeout)
+    await async_engine.dispose()
 
 app = FastAPI(
     title="CuanBot API",
@@ -43,6 +90,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 app.include_router(transactions.router)
@@ -62,6 +110,27 @@ def read_root():
 def health_check():
     return {"status": "healthy"}
 
+@app.get("/health/queue")
+def queue_health_check():
+    """Webhook queue depth and throughput counters"""
+    if not update_queue:
+        return {"status": "not_started"}
+    return {"status": "healthy", **update_queue.metrics()}
+
+@app.get("/health/parser")
+def parser_health_check():
+    """Fast-path (rule-based) parser hit ratio"""
+    from .services.rule_parser import rule_parser
+    
+    return {"status": "healthy", "min_confidence": settings.fast_parse_min_confidence, **rule_parser.stats()}
+
+@app.get("/health/llm-cache")
+def llm_cache_health_check():
+    """LLM response cache size and hit/miss counters"""
+    from .services.llm_cache import llm_cache
+    
+    return {"status": "healthy", "enabled": settings.llm_cache_enabled, **llm_cache.stats()}
+
 @app.get("/health/llm")
 def llm_health_check():
     """Check if LLM service is working"""
@@ -93,13 +162,18 @@ async def test_parse_transaction(request: Request):
             return {"error": "No text provided"}
         
         from .services.llm_service import llm_service
+        from .services.rule_parser import rule_parser
         
-        # Test both parsing methods
+        # Test all parsing methods
+        rule_result = rule_parser.parse(text)
+        interpreted = llm_service.interpret_message(text)
         single_result = llm_service.parse_transaction(text)
         multi_result = llm_service.parse_multiple_transactions(text)
         
         return {
             "input": text,
+            "rule_parsing": rule_result,
+            "interpretation": interpreted,
             "single_parsing": single_result,
             "multiple_parsing": multi_result,
             "model_initialized": llm_service.model is not None
@@ -115,15 +189,25 @@ async def telegram_webhook_head():
 async def telegram_webhook(request: Request):
     try:
         update_data = await request.json()
-        logger.info(f"Received update: {update_data}")
-        
-        if bot_service:
-            await bot_service.process_update(update_data)
-        
-        return {"ok": True}
     except Exception as e:
-        logger.error(f"Error processing webhook: {e}")
-        return {"ok": False, "error": str(e)}
+        logger.error(f"Invalid webhook payload: {e}")
+        return JSONResponse(status_code=400, content={"ok": False, "error": "Invalid JSON"})
+    
+    if not isinstance(update_data, dict) or not isinstance(update_data.get("update_id"), int):
+        return JSONResponse(status_code=400, content={"ok": False, "error": "Missing update_id"})
+    
+    logger.info(f"Received update: {update_data.get('update_id')}")
+    
+    if not update_queue:
+        return JSONResponse(status_code=503, content={"ok": False, "error": "Bot not ready"})
+    
+    # ACK immediately; workers process the update in the background
+    status = update_queue.submit(update_data)
+    if status == UpdateQueue.REJECTED:
+        # Non-2xx makes Telegram redeliver the update later
+        return JSONResponse(status_code=503, content={"ok": False, "error": "Queue full"})
+    
+    return {"ok": True, "status": status}
 
 @app.get("/api/dashboard/overview")
 def get_dashboard_overview():
@@ -2,5 +2,6 @@ from .user import User
 from .transaction import Transaction
 from .bot_log import BotLog
 from .prediction import Prediction
+from .llm_cache import LLMCacheEntry
 
-__all__ = ["User", "Transaction", "BotLog", "Prediction"]
+__all__ = ["User", "Transaction", "BotLog", "Prediction", "LLMCacheEntry"]
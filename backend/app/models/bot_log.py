@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Index, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..database import Base
@@ -22,3 +22,9 @@ class BotLog(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     user = relationship("User", back_populates="bot_logs")
+    
+    __table_args__ = (
+        # Keyset pagination on (created_at, id), newest first
+        Index("ix_bot_logs_created_id", "created_at", "id"),
+        Index("ix_bot_logs_user_created_id", "user_id", "created_at", "id"),
+    )
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, String, Float, Text, DateTime
+from sqlalchemy.sql import func
+from ..database import Base
+
+class LLMCacheEntry(Base):
+    __tablename__ = "llm_cache_entries"
+    
+    # sha256 of namespace + normalized message
+    key = Column(String(64), primary_key=True)
+    namespace = Column(String(50), nullable=False)
+    value = Column(Text, nullable=False)
+    # Unix timestamp; compared in Python so it behaves the same on SQLite and PostgreSQL
+    expires_at = Column(Float, nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -1,17 +1,48 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, JSON, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, DateTime, JSON, LargeBinary, Index, Enum as SQLEnum
 from sqlalchemy.sql import func
 from ..database import Base
+from typing import Any, Optional
 import enum
+import json
+import zlib
 
 class PredictionType(str, enum.Enum):
     FORECAST = "forecast"
     ANOMALY = "anomaly"
 
+def encode_payload(data: Any) -> bytes:
+    """Compact JSON, zlib-compressed."""
+    return zlib.compress(json.dumps(data, separators=(",", ":"), default=str).encode(), 6)
+
+def decode_payload(payload: bytes) -> Any:
+    return json.loads(zlib.decompress(payload))
+
 class Prediction(Base):
     __tablename__ = "predictions"
     
     id = Column(Integer, primary_key=True, index=True)
     prediction_type = Column(SQLEnum(PredictionType), nullable=False)
-    prediction_data = Column(JSON, nullable=False)
+    user_id = Column(Integer, nullable=True)
+    # Legacy uncompressed result; new rows store `payload` (see `data`) and leave this NULL
+    prediction_data = Column(JSON(none_as_null=True), nullable=True)
+    # Full result as zlib-compressed JSON; dropped by the retention job after PREDICTION_PAYLOAD_DAYS
+    payload = Column(LargeBinary, nullable=True)
+    # Small summary listed by /history without touching the payload
+    summary = Column(JSON(none_as_null=True), nullable=True)
+    # Forecast cache key (ForecastingService.fingerprint)
+    fingerprint = Column(String(64), nullable=True)
     extra_metadata = Column(JSON, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        # History per type/user, newest first (keyset on created_at, id)
+        Index("ix_predictions_type_user_created", "prediction_type", "user_id", "created_at", "id"),
+        Index("ix_predictions_fingerprint", "fingerprint"),
+    )
+    
+    @property
+    def data(self) -> Optional[Any]:
+        """The full result, from the compressed payload or the legacy JSON column."""
+        if self.payload is not None:
+            return decode_payload(self.payload)
+        return self.prediction_data
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Index, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..database import Base
@@ -26,3 +26,18 @@ class Transaction(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     user = relationship("User", back_populates="transactions")
+    
+    __table_args__ = (
+        # Hot paths filter by user/type and sort by transaction_date desc
+        Index("ix_transactions_user_date", "user_id", "transaction_date"),
+        Index("ix_transactions_user_type_date", "user_id", "transaction_type", "transaction_date"),
+        # Keyset pagination on (transaction_date, id) for unfiltered listings
+        Index("ix_transactions_date_id", "transaction_date", "id"),
+        # Trigram index for the category ILIKE '%...%' report filter (requires pg_trgm)
+        Index(
+            "ix_transactions_category_trgm",
+            "category",
+            postgresql_using="gin",
+            postgresql_ops={"category": "gin_trgm_ops"}
+        ),
+    )
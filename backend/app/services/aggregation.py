@@ -0,0 +1,78 @@
+from sqlalchemy import select, func, case, or_, and_
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Dict, Any, Optional
+from datetime import datetime
+from ..models.transaction import Transaction, TransactionType
+
+# Expense categories counted as HPP (Cost of Goods Sold)
+HPP_CATEGORIES = ['COGS', 'Bahan Baku', 'HPP', 'Cost of Goods Sold']
+
+def build_transaction_filters(
+    user_id: Optional[int] = None,
+    transaction_type: Optional[str] = None,
+    category: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    end_before: Optional[datetime] = None
+) -> List[Any]:
+    """
+    Build the WHERE criteria shared by listings, summaries and exports.
+    `end_date` is inclusive, `end_before` is exclusive.
+    """
+    filters = []
+
+    if user_id:
+        filters.append(Transaction.user_id == user_id)
+    if transaction_type:
+        filters.append(Transaction.transaction_type == transaction_type)
+    if category:
+        filters.append(Transaction.category.ilike(f"%{category}%"))
+    if start_date:
+        filters.append(Transaction.transaction_date >= start_date)
+    if end_date:
+        filters.append(Transaction.transaction_date <= end_date)
+    if end_before:
+        filters.append(Transaction.transaction_date < end_before)
+
+    return filters
+
+def _type_total(transaction_type: TransactionType, condition=None):
+    matches = Transaction.transaction_type == transaction_type
+    if condition is not None:
+        matches = and_(matches, condition)
+    return func.coalesce(func.sum(case((matches, Transaction.amount), else_=0.0)), 0.0)
+
+def summary_query(filters: List[Any]):
+    """Single aggregate statement with conditional sums per transaction type."""
+    is_hpp = or_(*[
+        func.lower(Transaction.category).contains(cat.lower(), autoescape=True)
+        for cat in HPP_CATEGORIES
+    ])
+
+    return select(
+        _type_total(TransactionType.INCOME).label('total_income'),
+        _type_total(TransactionType.EXPENSE).label('total_expense'),
+        _type_total(TransactionType.RECEIVABLE).label('total_receivable'),
+        _type_total(TransactionType.PAYABLE).label('total_payable'),
+        _type_total(TransactionType.EXPENSE, is_hpp).label('hpp'),
+        func.count(Transaction.id).label('transaction_count')
+    ).where(*filters)
+
+def summary_from_row(row) -> Dict[str, Any]:
+    return {
+        "total_income": float(row.total_income),
+        "total_expense": float(row.total_expense),
+        "total_receivable": float(row.total_receivable),
+        "total_payable": float(row.total_payable),
+        "hpp": float(row.hpp),
+        "transaction_count": int(row.transaction_count)
+    }
+
+def get_transaction_summary(db: Session, filters: List[Any]) -> Dict[str, Any]:
+    """Run the summary aggregate in one round-trip."""
+    return summary_from_row(db.execute(summary_query(filters)).one())
+
+async def get_transaction_summary_async(db: AsyncSession, filters: List[Any]) -> Dict[str, Any]:
+    result = await db.execute(summary_query(filters))
+    return summary_from_row(result.one())
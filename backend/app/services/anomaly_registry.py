@@ -0,0 +1,224 @@
+import logging
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+import numpy as np
+import pytz
+from ..config import settings
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Bump when the feature layout changes; older files are retrained on next use
+MODEL_VERSION = 2
+
+JAKARTA_TZ = pytz.timezone('Asia/Jakarta')
+
+# Inline checks use the thresholds of the amount rules in anomaly_rules
+# (LargeExpenseRule, SalarySpikeRule, OperationalSpikeRule); they are repeated
+# here so scoring a single transaction does not import pandas
+INLINE_Z_THRESHOLD = 2.5
+INLINE_SPIKE_RULES = [
+    (re.compile("gaji"), 2.0),
+    (re.compile("gas|listrik|bensin|operasional"), 2.5),
+]
+
+class AnomalyModel:
+    """
+    A fitted Isolation Forest plus what is needed to score new rows the same
+    way it was trained: category statistics, the hour distribution, and the
+    training watermark (last transaction id/date and row count).
+    """
+    
+    def __init__(
+        self,
+        estimator,
+        category_stats: "pd.DataFrame",
+        hour_distribution: Dict[int, float],
+        watermark: Dict[str, Any],
+        baseline_anomaly_rate: float
+    ):
+        self.estimator = estimator
+        self.category_stats = category_stats
+        # Plain dict for single-row scoring without pandas
+        self.category_index = category_stats.to_dict('index')
+        self.hour_distribution = hour_distribution
+        self.watermark = watermark
+        self.baseline_anomaly_rate = baseline_anomaly_rate
+        self.trained_at = time.time()
+        self.version = MODEL_VERSION
+    
+    def info(self) -> Dict[str, Any]:
+        return {
+            "trained_at": datetime.fromtimestamp(self.trained_at, timezone.utc).isoformat(),
+            "training_rows": self.watermark["count"],
+            "last_transaction_id": self.watermark["max_id"],
+            "baseline_anomaly_rate": self.baseline_anomaly_rate
+        }
+    
+    def score_one(self, amount: float, transaction_type: str, category: Optional[str], transaction_date: datetime) -> Tuple[int, float]:
+        """
+        (prediction, score) for a single transaction without pandas; the
+        feature layout must match AnomalyDetectionService._build_features.
+        """
+        if transaction_date.tzinfo is None:
+            transaction_date = pytz.utc.localize(transaction_date)
+        local = transaction_date.astimezone(JAKARTA_TZ)
+        stats = self.category_index.get(category, {'mean': 0, 'count': 1})
+        
+        features = np.array([[
+            amount,
+            local.hour,
+            local.weekday(),
+            1 if transaction_type == 'expense' else 0,
+            amount / (stats['mean'] + 1),
+            stats['count'],
+            1.0 - self.hour_distribution.get(local.hour, 0.0),
+        ]], dtype=float)
+        
+        score = float(self.estimator.score_samples(features)[0])
+        return (-1 if score - self.estimator.offset_ < 0 else 1), score
+
+class AnomalyModelRegistry:
+    """
+    Per-user (or per-segment) anomaly models, kept in memory and persisted
+    with joblib under `model_dir`. Models are retrained when missing, older
+    than `retrain_interval` seconds, or when rows newer than the watermark
+    drift from the training anomaly rate. Training for one key is
+    serialized with a per-key lock; different keys train in parallel.
+    """
+    
+    def __init__(self, model_dir: str, retrain_interval: float, drift_factor: float = 2.0, drift_min_rows: int = 50):
+        self.model_dir = model_dir
+        self.retrain_interval = retrain_interval
+        self.drift_factor = drift_factor
+        self.drift_min_rows = drift_min_rows
+        self._models: Dict[str, AnomalyModel] = {}
+        self._mtimes: Dict[str, float] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+    
+    @staticmethod
+    def key_for(user_id: Optional[int]) -> str:
+        return f"user_{user_id}" if user_id else "global"
+    
+    def _path(self, key: str) -> str:
+        return os.path.join(self.model_dir, f"{key}.joblib")
+    
+    def lock(self, key: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+    
+    def cached(self, key: str) -> Optional[AnomalyModel]:
+        """In-memory model only; never touches the disk (for latency-sensitive callers)."""
+        return self._models.get(key)
+    
+    def load(self, key: str) -> Optional[AnomalyModel]:
+        """Model from memory, reloaded from disk when another process saved a newer one."""
+        path = self._path(key)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return self._models.get(key)
+        
+        if key in self._models and self._mtimes.get(key) == mtime:
+            return self._models[key]
+        
+        try:
+            import joblib
+            model = joblib.load(path)
+        except Exception as e:
+            logger.warning(f"Could not load anomaly model {path}: {e}")
+            return self._models.get(key)
+        
+        self._models[key] = model
+        self._mtimes[key] = mtime
+        return model
+    
+    def save(self, key: str, model: AnomalyModel):
+        self._models[key] = model
+        try:
+            import joblib
+            os.makedirs(self.model_dir, exist_ok=True)
+            path = self._path(key)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            joblib.dump(model, tmp_path)
+            os.replace(tmp_path, path)
+            self._mtimes[key] = os.path.getmtime(path)
+        except Exception as e:
+            # The in-memory model still serves this process
+            logger.warning(f"Could not persist anomaly model {key}: {e}")
+    
+    def retrain_reason(self, model: Optional[AnomalyModel], ids: "pd.Series", predictions: Optional[np.ndarray]) -> Optional[str]:
+        """
+        Why `model` should be retrained for the current rows, or None.
+        `predictions` are the model's -1/1 labels for `ids`.
+        """
+        if model is None:
+            return "missing"
+        if getattr(model, "version", None) != MODEL_VERSION:
+            return "version"
+        if time.time() - model.trained_at > self.retrain_interval:
+            return "stale"
+        
+        new_rows = (ids > model.watermark["max_id"]).to_numpy()
+        new_count = int(new_rows.sum())
+        if new_count > model.watermark["count"]:
+            # History more than doubled since training
+            return "growth"
+        if new_count >= self.drift_min_rows and predictions is not None:
+            new_rate = float((predictions[new_rows] == -1).mean())
+            if new_rate > self.drift_factor * max(model.baseline_anomaly_rate, 0.01):
+                return "drift"
+        return None
+    
+    @staticmethod
+    def _rule_warning(model: AnomalyModel, amount: float, transaction_type: str, category: Optional[str]) -> Optional[str]:
+        """Warning when an amount rule fires against the model's category statistics, else None."""
+        stats = model.category_index.get(category)
+        if not stats or not stats['mean'] > 0:
+            return None
+        mean = stats['mean']
+        
+        # NaN std (single-row category) never fires, as in LargeExpenseRule
+        if transaction_type == 'expense' and (amount - mean) / (stats.get('std', float('nan')) + 1) > INLINE_Z_THRESHOLD:
+            return f"⚠️ {category} Rp {amount:,.0f} jauh di atas biasanya (rata-rata Rp {mean:,.0f}). Cek lagi ya!"
+        for pattern, multiplier in INLINE_SPIKE_RULES:
+            if pattern.search(category.lower()) and amount > mean * multiplier:
+                return f"⚠️ {category} Rp {amount:,.0f} lebih dari {multiplier:g}x biasanya (rata-rata Rp {mean:,.0f}). Cek lagi ya!"
+        return None
+    
+    def score_new(self, key: str, amount: float, transaction_type: str, category: Optional[str], transaction_date: datetime) -> Optional[Dict[str, Any]]:
+        """
+        Score a transaction as it is recorded, using the in-memory model only
+        (no disk or database access). Returns None when no model is cached.
+        
+        Like the batch run, a transaction is only flagged when a rule fires
+        (the amount rules; duplicates, odd hours and capital bursts need the
+        history and are left to `/anomaly`). The Isolation Forest score is
+        stored either way.
+        """
+        model = self.cached(key)
+        if model is None or getattr(model, "version", None) != MODEL_VERSION:
+            return None
+        
+        _, score = model.score_one(amount, transaction_type, category, transaction_date)
+        warning = self._rule_warning(model, amount, transaction_type, category)
+        
+        return {
+            "is_anomaly": warning is not None,
+            "anomaly_score": score,
+            "warning": warning
+        }
+
+anomaly_model_registry = AnomalyModelRegistry(
+    settings.anomaly_model_dir,
+    retrain_interval=settings.anomaly_retrain_hours * 3600,
+    drift_factor=settings.anomaly_drift_factor,
+    drift_min_rows=settings.anomaly_drift_min_rows
+)
@@ -0,0 +1,200 @@
+import re
+import numpy as np
+import pandas as pd
+from typing import List, Dict, Any, Tuple
+
+SEVERITY_RANK = {"low": 0, "medium": 1, "high": 2}
+
+class RuleContext:
+    """
+    Per-call data shared by the rules. `frame` holds the columns rules read
+    (id, amount, transaction_type, category, hour, category_mean,
+    category_std), computed once for the whole DataFrame.
+    """
+    
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        hours: pd.Series,
+        category_stats: pd.DataFrame,
+        business_pattern: Dict[str, Any],
+        unusual_hours: set,
+        duplicates: List[int],
+        frequent_capital: Dict[Any, int]
+    ):
+        self.business_pattern = business_pattern
+        self.unusual_hours = unusual_hours
+        self.duplicates = duplicates
+        self.frequent_capital = frequent_capital
+        
+        categories = df['category']
+        self.frame = pd.DataFrame({
+            'id': df['id'],
+            'amount': df['amount'],
+            'transaction_type': df['transaction_type'],
+            'category': categories,
+            'hour': hours,
+            # Transactions without category statistics count as mean 0 (never flagged)
+            'category_mean': categories.map(category_stats['mean']).fillna(0),
+            'category_std': categories.map(category_stats['std'])
+        }, index=df.index)
+    
+    def category_matches(self, pattern: str) -> pd.Series:
+        """Case-insensitive regex search, evaluated once per distinct category."""
+        regex = re.compile(pattern)
+        categories = self.frame['category']
+        hits = {c: bool(c) and bool(regex.search(str(c).lower())) for c in categories.dropna().unique()}
+        return categories.map(hits).fillna(False).astype(bool)
+
+class AnomalyRule:
+    """
+    One rule-based anomaly check. `mask` flags rows over the whole frame;
+    `describe` builds the reason for flagged rows only, by formatting the
+    `message` template with the row plus `fields`.
+    """
+    type = ""
+    severity = "medium"
+    message = ""
+    
+    def mask(self, ctx: RuleContext) -> pd.Series:
+        raise NotImplementedError
+    
+    def fields(self, ctx: RuleContext, row: Dict[str, Any]) -> Dict[str, Any]:
+        return {}
+    
+    def describe(self, ctx: RuleContext, row: Dict[str, Any]) -> Dict[str, str]:
+        return {
+            "type": self.type,
+            "message": self.message.format(**row, **self.fields(ctx, row)),
+            "severity": self.severity
+        }
+
+class DuplicateRule(AnomalyRule):
+    type = "duplicate"
+    severity = "high"
+    message = "Duplikasi transaksi terdeteksi"
+    
+    def mask(self, ctx):
+        return ctx.frame['id'].isin(ctx.duplicates)
+
+class OddHoursRule(AnomalyRule):
+    """Hours that are unusual for this user; milder for late-night business types."""
+    type = "odd_hours"
+    severity = "medium"
+    message = "Transaksi pada jam tidak biasa ({hour:02d}:00) - biasanya jam {common_hours}"
+    late_message = "Transaksi agak terlambat ({hour:02d}:00) - biasanya jam {common_hours}"
+    early_message = "Transaksi dini hari ({hour:02d}:00) - biasanya jam {common_hours}"
+    
+    def mask(self, ctx):
+        return ctx.frame['hour'].isin(ctx.unusual_hours)
+    
+    def describe(self, ctx, row):
+        hour = row['hour']
+        business_type = ctx.business_pattern['business_type']
+        common_hours = ctx.business_pattern['hour_pattern']['common_hours']
+        
+        if business_type == "restaurant" and 22 <= hour <= 2:
+            # Restaurants might operate late, so be less strict
+            template, severity = self.late_message, "low"
+        elif business_type == "online" and 0 <= hour <= 6:
+            # Online businesses might have 24/7 transactions
+            template, severity = self.early_message, "low"
+        else:
+            template, severity = self.message, self.severity
+        
+        return {
+            "type": self.type,
+            "message": template.format(hour=hour, common_hours=common_hours),
+            "severity": severity
+        }
+
+class LargeExpenseRule(AnomalyRule):
+    """Expenses more than `z_threshold` standard deviations above the category mean."""
+    type = "large_expense"
+    severity = "high"
+    message = "{category} Rp {amount_int:,} (biasanya {normal_range} ribu)"
+    z_threshold = 2.5
+    
+    def mask(self, ctx):
+        frame = ctx.frame
+        z_score = (frame['amount'] - frame['category_mean']) / (frame['category_std'] + 1)
+        return (frame['transaction_type'] == 'expense') & (frame['category_mean'] > 0) & (z_score > self.z_threshold)
+    
+    def fields(self, ctx, row):
+        mean, std = row['category_mean'], row['category_std']
+        return {
+            "amount_int": int(row['amount']),
+            "normal_range": f"{int(mean - std):,}–{int(mean + std):,}"
+        }
+
+class CategorySpikeRule(AnomalyRule):
+    """Amounts above `multiplier` x the category mean, for categories matching `pattern`."""
+    pattern = ""
+    multiplier = 2.0
+    
+    def mask(self, ctx):
+        frame = ctx.frame
+        return (
+            ctx.category_matches(self.pattern)
+            & (frame['category_mean'] > 0)
+            & (frame['amount'] > frame['category_mean'] * self.multiplier)
+        )
+    
+    def fields(self, ctx, row):
+        return {"amount_int": int(row['amount']), "mean_int": int(row['category_mean'])}
+
+class SalarySpikeRule(CategorySpikeRule):
+    type = "salary_spike"
+    severity = "high"
+    message = "Gaji crew Rp {amount_int:,} (biasanya {mean_int:,} ribu)"
+    pattern = "gaji"
+    multiplier = 2.0
+
+class OperationalSpikeRule(CategorySpikeRule):
+    type = "operational_spike"
+    severity = "medium"
+    message = "{category} mendadak tinggi Rp {amount_int:,} (biasanya {mean_int:,})"
+    pattern = "gas|listrik|bensin|operasional"
+    multiplier = 2.5
+
+class FrequentCapitalRule(AnomalyRule):
+    type = "frequent_capital"
+    severity = "medium"
+    message = "Setoran modal {count} kali dalam {days} hari"
+    
+    def mask(self, ctx):
+        ids = [key for key in ctx.frequent_capital if key != 'days']
+        return ctx.frame['id'].isin(ids)
+    
+    def fields(self, ctx, row):
+        return {"count": ctx.frequent_capital[row['id']], "days": ctx.frequent_capital['days']}
+
+# Evaluation order is the order reasons are listed in
+DEFAULT_RULES: List[AnomalyRule] = [
+    DuplicateRule(),
+    OddHoursRule(),
+    LargeExpenseRule(),
+    SalarySpikeRule(),
+    OperationalSpikeRule(),
+    FrequentCapitalRule(),
+]
+
+def evaluate_rules(rules: List[AnomalyRule], ctx: RuleContext) -> Tuple[List[Tuple[Any, str, List[Dict[str, str]]]], Dict[str, int]]:
+    """
+    Run every rule mask over the frame, then describe only the flagged rows.
+    Returns ([(index label, severity, reasons)] in frame order, {rule type: flagged count}).
+    """
+    masks = [(rule, rule.mask(ctx).to_numpy(dtype=bool)) for rule in rules]
+    counts = {rule.type: int(mask.sum()) for rule, mask in masks}
+    if not masks:
+        return [], counts
+    
+    positions = np.flatnonzero(np.logical_or.reduce([mask for _, mask in masks]))
+    flagged = ctx.frame.iloc[positions]
+    
+    results = []
+    for position, label, row in zip(positions, flagged.index, flagged.to_dict('records')):
+        reasons = [rule.describe(ctx, row) for rule, mask in masks if mask[position]]
+        severity = max((reason["severity"] for reason in reasons), key=SEVERITY_RANK.__getitem__)
+        results.append((label, severity, reasons))
+    return results, counts
@@ -0,0 +1,116 @@
+import threading
+from typing import Dict, Optional
+import numpy as np
+import pandas as pd
+
+# Every engine returns history + future rows with these columns (the layout of Prophet.predict)
+FORECAST_COLUMNS = ['ds', 'yhat', 'yhat_lower', 'yhat_upper']
+
+class Forecaster:
+    """
+    Forecasting engine. `fit_predict` takes a daily series (ds, y) and
+    returns FORECAST_COLUMNS for every history day plus `periods` future days,
+    with a 95% interval.
+    """
+    name = "base"
+    
+    def fit_predict(self, df: pd.DataFrame, periods: int) -> pd.DataFrame:
+        raise NotImplementedError
+
+class ProphetForecaster(Forecaster):
+    """Facebook Prophet (Stan optimisation; seconds per fit)."""
+    name = "prophet"
+    
+    _prophet_class = None
+    _import_lock = threading.Lock()
+    
+    @classmethod
+    def load(cls):
+        """Import Prophet/cmdstanpy once, on first use."""
+        with cls._import_lock:
+            if cls._prophet_class is None:
+                from prophet import Prophet
+                cls._prophet_class = Prophet
+            return cls._prophet_class
+    
+    def fit_predict(self, df: pd.DataFrame, periods: int) -> pd.DataFrame:
+        model = self.load()(
+            daily_seasonality=True,
+            weekly_seasonality=True,
+            yearly_seasonality=False,  # Not enough data for yearly patterns
+            changepoint_prior_scale=0.05,  # Flexibility of trend changes
+            seasonality_prior_scale=10.0,  # Strength of seasonality
+            interval_width=0.95  # 95% confidence interval
+        )
+        model.fit(df)
+        
+        # Create future dataframe for predictions
+        future = model.make_future_dataframe(periods=periods, freq='D')
+        return model.predict(future)[FORECAST_COLUMNS]
+
+class SeasonalForecaster(Forecaster):
+    """
+    NumPy-only additive model: level + linear trend + day-of-week effects,
+    fitted by least squares. The 95% interval comes from a residual bootstrap
+    (refit on resampled residuals, plus resampled noise), all as matrix
+    products, so a fit takes a few milliseconds.
+    """
+    name = "seasonal"
+    
+    def __init__(self, bootstrap: int = 300, min_trend_days: int = 14, seed: int = 42):
+        self.bootstrap = bootstrap
+        # Below this many days a trend mostly extrapolates noise
+        self.min_trend_days = min_trend_days
+        self.seed = seed
+    
+    def _design(self, ds: pd.Series, origin: pd.Timestamp, span: float, trend: bool) -> np.ndarray:
+        days = ((ds - origin).dt.days.to_numpy(dtype=np.float64)) / span
+        weekday = ds.dt.dayofweek.to_numpy()
+        columns = [np.ones(len(ds))]
+        if trend:
+            columns.append(days)
+        # Monday is the baseline; one indicator per other weekday
+        columns.extend((weekday == day).astype(np.float64) for day in range(1, 7))
+        return np.column_stack(columns)
+    
+    def fit_predict(self, df: pd.DataFrame, periods: int) -> pd.DataFrame:
+        history = df['ds'].reset_index(drop=True)
+        y = df['y'].to_numpy(dtype=np.float64)
+        future = pd.Series(pd.date_range(history.iloc[-1] + pd.Timedelta(days=1), periods=periods, freq='D'))
+        ds = pd.concat([history, future], ignore_index=True)
+        
+        origin = history.iloc[0]
+        span = max((history.iloc[-1] - origin).days, 1)
+        trend = len(history) >= self.min_trend_days
+        X = self._design(history, origin, span, trend)
+        X_all = self._design(ds, origin, span, trend)
+        
+        # Least-squares projection; pinv copes with weekdays missing from the history
+        projection = np.linalg.pinv(X)
+        beta = projection @ y
+        fitted = X @ beta
+        residuals = y - fitted
+        yhat = X_all @ beta
+        
+        # Residual bootstrap: B refits at once, plus fresh noise on every point
+        rng = np.random.default_rng(self.seed)
+        picks = rng.integers(0, len(residuals), size=(len(y), self.bootstrap))
+        betas = projection @ (fitted[:, None] + residuals[picks])
+        noise = residuals[rng.integers(0, len(residuals), size=(len(ds), self.bootstrap))]
+        simulations = X_all @ betas + noise
+        lower, upper = np.percentile(simulations, [2.5, 97.5], axis=1)
+        
+        return pd.DataFrame({'ds': ds, 'yhat': yhat, 'yhat_lower': lower, 'yhat_upper': upper})
+
+ENGINES: Dict[str, Forecaster] = {
+    ProphetForecaster.name: ProphetForecaster(),
+    SeasonalForecaster.name: SeasonalForecaster()
+}
+
+def select_engine(engine: Optional[str], history_days: int, fast_max_days: int) -> Forecaster:
+    """`auto` (or None) uses the seasonal engine up to `fast_max_days` days of history, Prophet beyond."""
+    if engine in (None, "auto"):
+        engine = SeasonalForecaster.name if history_days <= fast_max_days else ProphetForecaster.name
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown forecast engine: {engine}")
+    return ENGINES[engine]
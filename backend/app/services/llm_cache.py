@@ -0,0 +1,193 @@
+import asyncio
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from sqlalchemy import create_engine, delete
+from sqlalchemy.orm import sessionmaker
+from ..config import settings
+from ..models.llm_cache import LLMCacheEntry
+from .rule_parser import normalize_amounts
+
+logger = logging.getLogger(__name__)
+
+def normalize_message(text: str) -> str:
+    """Cache key text: lowercase, canonical amounts, single spaces, no trailing punctuation."""
+    text = normalize_amounts(text.lower())
+    text = re.sub(r'\s+', ' ', text)
+    return text.strip(' .,!?;:')
+
+class SQLCacheStore:
+    """Persistent backing for `LLMCache` in any SQLAlchemy database (SQLite or PostgreSQL)."""
+    
+    def __init__(self, url: str):
+        if url == settings.database_url:
+            from ..database import engine
+        else:
+            engine = create_engine(url, pool_pre_ping=True)
+        LLMCacheEntry.__table__.create(engine, checkfirst=True)
+        self.Session = sessionmaker(bind=engine)
+        self.purge_expired()
+    
+    def get(self, key: str, now: float) -> Optional[Tuple[str, float]]:
+        with self.Session() as db:
+            entry = db.get(LLMCacheEntry, key)
+            if entry is None:
+                return None
+            if entry.expires_at <= now:
+                db.delete(entry)
+                db.commit()
+                return None
+            return entry.value, entry.expires_at
+    
+    def set(self, key: str, namespace: str, value: str, expires_at: float):
+        with self.Session() as db:
+            db.merge(LLMCacheEntry(key=key, namespace=namespace, value=value, expires_at=expires_at))
+            db.commit()
+    
+    def purge_expired(self) -> int:
+        with self.Session() as db:
+            result = db.execute(delete(LLMCacheEntry).where(LLMCacheEntry.expires_at <= time.time()))
+            db.commit()
+            return result.rowcount
+
+class LLMCache:
+    """
+    LRU + TTL cache for raw LLM responses, keyed by (namespace, normalized
+    message). With a `store_url` entries are also written to a database and
+    read back on memory misses, so the cache survives restarts. Store errors
+    are logged and treated as misses.
+    """
+    
+    def __init__(self, maxsize: int = 2048, ttl: int = 86400, store_url: str = ""):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.store_url = store_url
+        self._store: Optional[SQLCacheStore] = None
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._store_lock = threading.Lock()
+        self._counters = {
+            "hits": 0,
+            "misses": 0,
+            "store_hits": 0,
+            "evictions": 0,
+            "expired": 0,
+            "store_errors": 0
+        }
+    
+    @staticmethod
+    def key(namespace: str, text: str) -> str:
+        return hashlib.sha256(f"{namespace}\x00{normalize_message(text)}".encode()).hexdigest()
+    
+    @property
+    def store(self) -> Optional[SQLCacheStore]:
+        # Created on first use so importing the service never touches the database
+        if self.store_url and self._store is None:
+            with self._store_lock:
+                if self._store is None:
+                    self._store = SQLCacheStore(self.store_url)
+        return self._store
+    
+    def _count(self, name: str):
+        with self._lock:
+            self._counters[name] += 1
+    
+    def _put_memory(self, key: str, value: str, expires_at: float):
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+    
+    def _get_memory(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                self._counters["expired"] += 1
+                return None
+            self._entries.move_to_end(key)
+            return value
+    
+    def _get_store(self, key: str) -> Optional[str]:
+        try:
+            found = self.store.get(key, time.time())
+        except Exception as e:
+            logger.warning(f"LLM cache store read failed: {e}")
+            self._count("store_errors")
+            return None
+        if found is None:
+            return None
+        value, expires_at = found
+        self._put_memory(key, value, expires_at)
+        self._count("store_hits")
+        return value
+    
+    def _set_store(self, key: str, namespace: str, value: str, expires_at: float):
+        try:
+            self.store.set(key, namespace, value, expires_at)
+        except Exception as e:
+            logger.warning(f"LLM cache store write failed: {e}")
+            self._count("store_errors")
+    
+    def get(self, namespace: str, text: str) -> Optional[str]:
+        key = self.key(namespace, text)
+        value = self._get_memory(key)
+        if value is None and self.store_url:
+            value = self._get_store(key)
+        self._count("hits" if value is not None else "misses")
+        return value
+    
+    async def get_async(self, namespace: str, text: str) -> Optional[str]:
+        """Same as `get`; the database lookup runs in a worker thread."""
+        key = self.key(namespace, text)
+        value = self._get_memory(key)
+        if value is None and self.store_url:
+            value = await asyncio.to_thread(self._get_store, key)
+        self._count("hits" if value is not None else "misses")
+        return value
+    
+    def set(self, namespace: str, text: str, value: str):
+        key = self.key(namespace, text)
+        expires_at = time.time() + self.ttl
+        self._put_memory(key, value, expires_at)
+        if self.store_url:
+            self._set_store(key, namespace, value, expires_at)
+    
+    async def set_async(self, namespace: str, text: str, value: str):
+        key = self.key(namespace, text)
+        expires_at = time.time() + self.ttl
+        self._put_memory(key, value, expires_at)
+        if self.store_url:
+            await asyncio.to_thread(self._set_store, key, namespace, value, expires_at)
+    
+    def clear(self):
+        """Drop the in-memory entries (persisted entries expire on their own)."""
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                **self._counters,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "persistent": bool(self.store_url),
+                "hit_ratio": (self._counters["hits"] / lookups) if lookups else 0.0
+            }
+
+llm_cache = LLMCache(
+    maxsize=settings.llm_cache_size,
+    ttl=settings.llm_cache_ttl,
+    store_url=settings.llm_cache_url
+)
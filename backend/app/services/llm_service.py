@@ -1,86 +1,154 @@
-import google.generativeai as genai
 from ..config import settings
+from .rule_parser import rule_parser
+from .llm_cache import llm_cache
+import asyncio
 import json
-from typing import Dict, Any
+import threading
+from functools import partial
+from types import SimpleNamespace
+from typing import Dict, Any, Callable, Optional, Tuple
 
-genai.configure(api_key=settings.gemini_api_key)
+# Structured output: Gemini returns raw JSON without markdown fences
+JSON_GENERATION_CONFIG = {"response_mime_type": "application/json"}
+
+TRANSACTION_TYPES = ("income", "expense", "receivable", "payable")
+
+# Cache namespaces; bump the version when a prompt changes so stale answers are not reused
+CACHE_PARSE = "parse:v1"
+CACHE_MULTIPLE = "multiple:v1"
+CACHE_ANSWER = "answer:v1"
+CACHE_INTERPRET = "interpret:v1"
 
 class LLMService:
     def __init__(self):
+        # The Gemini SDK is slow to import; the model is built on first use (or by the warm-up hook)
+        self._model = None
+        self._model_loaded = False
+        self._model_lock = threading.Lock()
+        self.cache = llm_cache if settings.llm_cache_enabled else None
+    
+    @staticmethod
+    def _load_model():
         try:
+            import google.generativeai as genai
+            genai.configure(api_key=settings.gemini_api_key)
             # Use the correct Gemini model name
-            self.model = genai.GenerativeModel('gemini-1.5-flash')
+            model = genai.GenerativeModel('gemini-1.5-flash')
             print(f"LLM Service initialized with gemini-1.5-flash")
+            return model
         except Exception as e:
             print(f"Error initializing LLM Service: {e}")
-            self.model = None
+            return None
     
-    def parse_transaction_fallback(self, user_message: str) -> Dict[str, Any]:
+    @property
+    def model(self):
+        """Gemini model, or None when it could not be initialized."""
+        if not self._model_loaded:
+            with self._model_lock:
+                if not self._model_loaded:
+                    self._model = self._load_model()
+                    self._model_loaded = True
+        return self._model
+    
+    @model.setter
+    def model(self, model):
+        self._model = model
+        self._model_loaded = True
+    
+    async def _model_async(self):
+        # Keep the one-off SDK import off the event loop
+        if self._model_loaded:
+            return self._model
+        return await asyncio.to_thread(lambda: self.model)
+    
+    def _generate(
+        self,
+        prompt: str,
+        on_response: Callable[[Any], Any],
+        on_failure: Callable[[Optional[Exception]], Any],
+        generation_config: Optional[Dict[str, Any]] = None,
+        cache_key: Optional[Tuple[str, str]] = None
+    ):
         """
-        Fallback parsing using regex patterns for common Indonesian transaction patterns
+        Run a blocking Gemini call. `on_failure` receives None when the model
+        is not initialized, or the raised exception. With a `cache_key`
+        (namespace, message) the raw response text is cached and replayed
+        through `on_response` on later hits.
         """
-        import re
-        
-        # Convert to lowercase for easier matching
-        text = user_message.lower()
-        
-        # Check for transaction type patterns
-        buy_patterns = ['beli', 'belanja', 'bayar', 'stok', 'restok']
-        sell_patterns = ['jual', 'terima', 'dapat', 'pembayaran', 'penjualan']
-        debt_patterns = ['hutang', 'pinjam']
-        receivable_patterns = ['piutang', 'tagihan']
-        
-        # Extract amounts - handle both ribu and juta
-        ribu_pattern = r'(\d+)\s*(?:ribu|rb)'
-        juta_pattern = r'(\d+)\s*(?:juta|jt)'
-        
-        ribu_amounts = re.findall(ribu_pattern, text)
-        juta_amounts = re.findall(juta_pattern, text)
-        
-        if not ribu_amounts and not juta_amounts:
-            return {"error": "Tidak ditemukan jumlah uang"}
-        
-        # Calculate total
-        total = 0
-        total += sum(int(amount) * 1000 for amount in ribu_amounts)
-        total += sum(int(amount) * 1000000 for amount in juta_amounts)
-        
-        # Determine transaction type based on context
-        transaction_type = "expense"  # default
-        category = "Umum"
-        
-        # Check for income patterns first (more specific)
-        if any(pattern in text for pattern in sell_patterns):
-            transaction_type = "income"
-            category = "Penjualan"
-        elif any(pattern in text for pattern in receivable_patterns):
-            transaction_type = "receivable"
-            category = "Piutang"
-        elif any(pattern in text for pattern in debt_patterns):
-            transaction_type = "payable"
-            category = "Hutang"
-        elif any(pattern in text for pattern in buy_patterns):
-            transaction_type = "expense"
-            if 'stok' in text or 'belanja' in text:
-                category = "Pembelian Stok"
-            else:
-                category = "Pengeluaran"
+        if cache_key and self.cache:
+            cached = self.cache.get(*cache_key)
+            if cached is not None:
+                return on_response(SimpleNamespace(text=cached))
+        if not self.model:
+            return on_failure(None)
+        try:
+            response = self.model.generate_content(prompt, generation_config=generation_config)
+        except Exception as e:
+            return on_failure(e)
+        if cache_key and self.cache:
+            text = self._response_text(response)
+            if text:
+                self.cache.set(*cache_key, text)
+        return on_response(response)
+    
+    async def _generate_async(
+        self,
+        prompt: str,
+        on_response: Callable[[Any], Any],
+        on_failure: Callable[[Optional[Exception]], Any],
+        generation_config: Optional[Dict[str, Any]] = None,
+        cache_key: Optional[Tuple[str, str]] = None
+    ):
+        """Same as `_generate` but awaits Gemini without blocking the event loop."""
+        if cache_key and self.cache:
+            cached = await self.cache.get_async(*cache_key)
+            if cached is not None:
+                return on_response(SimpleNamespace(text=cached))
+        model = await self._model_async()
+        if not model:
+            return on_failure(None)
+        try:
+            response = await model.generate_content_async(prompt, generation_config=generation_config)
+        except Exception as e:
+            return on_failure(e)
+        if cache_key and self.cache:
+            text = self._response_text(response)
+            if text:
+                await self.cache.set_async(*cache_key, text)
+        return on_response(response)
+    
+    @staticmethod
+    def _response_text(response) -> Optional[str]:
+        """Response text, or None for empty/blocked responses (which are not cached)."""
+        try:
+            text = response.text
+        except Exception:
+            return None
+        return text if text and text.strip() else None
+    
+    @staticmethod
+    def _response_json(response) -> Any:
+        text = response.text.strip()
         
-        # Create description
-        total_items = len(ribu_amounts) + len(juta_amounts)
-        description = f"Transaksi {category.lower()}"
-        if total_items > 1:
-            description += f" ({total_items} item)"
+        # Clean up the response
+        if text.startswith('```json'):
+            text = text[7:]
+        if text.endswith('```'):
+            text = text[:-3]
+        text = text.strip()
         
-        return {
-            "transaction_type": transaction_type,
-            "amount": total,
-            "category": category,
-            "description": description
-        }
+        return json.loads(text)
     
-    def parse_transaction(self, user_message: str) -> Dict[str, Any]:
-        prompt = f"""
+    def parse_transaction_fallback(self, user_message: str) -> Dict[str, Any]:
+        """
+        Fallback parsing using regex patterns for common Indonesian transaction patterns
+        """
+        result = rule_parser.parse(user_message)
+        result.pop("confidence", None)
+        return result
+    
+    def _transaction_prompt(self, user_message: str) -> str:
+        return f"""
 Analisis pesan transaksi berikut dan ekstrak informasi dalam format JSON.
 
 Pesan: "{user_message}"
@@ -113,29 +181,15 @@ WAJIB format JSON:
 
 Jika tidak bisa diparse sebagai transaksi, return: {{"error": "Tidak dapat memahami transaksi"}}
 """
-        
+    
+    def _transaction_from_response(self, user_message: str, response) -> Dict[str, Any]:
         try:
-            if not self.model:
-                print("LLM model not initialized, using fallback parsing")
-                return self.parse_transaction_fallback(user_message)
-                
-            response = self.model.generate_content(prompt)
-            
             if not response or not response.text:
                 print("Empty response from LLM, using fallback parsing")
                 return self.parse_transaction_fallback(user_message)
-                
-            text = response.text.strip()
-            
-            # Clean up the response
-            if text.startswith('```json'):
-                text = text[7:]
-            if text.endswith('```'):
-                text = text[:-3]
-            text = text.strip()
             
             # Try to parse JSON
-            result = json.loads(text)
+            result = self._response_json(response)
             
             # Validate the result
             if "transaction_type" in result and "amount" in result:
@@ -156,8 +210,31 @@ Jika tidak bisa diparse sebagai transaksi, return: {{"error": "Tidak dapat memah
             print(f"LLM parsing error: {e}, using fallback parsing")
             return self.parse_transaction_fallback(user_message)
     
-    def answer_accounting_question(self, question: str, context: str = "") -> str:
-        prompt = f"""
+    def _transaction_failed(self, user_message: str, error: Optional[Exception]) -> Dict[str, Any]:
+        if error is None:
+            print("LLM model not initialized, using fallback parsing")
+        else:
+            print(f"LLM parsing error: {error}, using fallback parsing")
+        return self.parse_transaction_fallback(user_message)
+    
+    def parse_transaction(self, user_message: str) -> Dict[str, Any]:
+        return self._generate(
+            self._transaction_prompt(user_message),
+            partial(self._transaction_from_response, user_message),
+            partial(self._transaction_failed, user_message),
+            cache_key=(CACHE_PARSE, user_message)
+        )
+    
+    async def parse_transaction_async(self, user_message: str) -> Dict[str, Any]:
+        return await self._generate_async(
+            self._transaction_prompt(user_message),
+            partial(self._transaction_from_response, user_message),
+            partial(self._transaction_failed, user_message),
+            cache_key=(CACHE_PARSE, user_message)
+        )
+    
+    def _question_prompt(self, question: str, context: str = "") -> str:
+        return f"""
 Kamu adalah asisten akunting CuanBOT untuk UMKM Indonesia. Jawab pertanyaan berikut dengan format yang RINGKAS dan MENARIK.
 
 Pertanyaan: {question}
@@ -183,26 +260,44 @@ Contoh soft selling:
 "Gunakan CuanBOT untuk mencatat transaksi kamu dengan mudah! 🤖"
 "CuanBOT siap membantu kelola keuangan UMKM kamu! 💼"
 """
-        
+    
+    @staticmethod
+    def _answer_from_response(response) -> str:
         try:
-            if not self.model:
-                return "Maaf, sistem sedang bermasalah. Coba lagi nanti."
-                
-            response = self.model.generate_content(prompt)
-            
             if not response or not response.text:
                 return "Maaf, tidak ada respons dari sistem. Coba lagi."
-                
             return response.text
         except Exception as e:
             return f"Maaf, terjadi error: {str(e)}"
     
-    def parse_multiple_transactions(self, user_message: str) -> Dict[str, Any]:
-        """
-        Parse message that might contain multiple transactions
-        Returns either single transaction or list of transactions
-        """
-        prompt = f"""
+    @staticmethod
+    def _answer_failed(error: Optional[Exception]) -> str:
+        if error is None:
+            return "Maaf, sistem sedang bermasalah. Coba lagi nanti."
+        return f"Maaf, terjadi error: {str(error)}"
+    
+    @staticmethod
+    def _question_cache_key(question: str, context: str) -> Tuple[str, str]:
+        return (CACHE_ANSWER, f"{question}\n{context}" if context else question)
+    
+    def answer_accounting_question(self, question: str, context: str = "") -> str:
+        return self._generate(
+            self._question_prompt(question, context),
+            self._answer_from_response,
+            self._answer_failed,
+            cache_key=self._question_cache_key(question, context)
+        )
+    
+    async def answer_accounting_question_async(self, question: str, context: str = "") -> str:
+        return await self._generate_async(
+            self._question_prompt(question, context),
+            self._answer_from_response,
+            self._answer_failed,
+            cache_key=self._question_cache_key(question, context)
+        )
+    
+    def _multiple_prompt(self, user_message: str) -> str:
+        return f"""
 Analisis pesan berikut dan tentukan apakah ini berisi SATU transaksi atau MULTIPLE transaksi terpisah.
 
 Pesan: "{user_message}"
@@ -234,33 +329,151 @@ Untuk MULTIPLE transaksi, return:
 
 Konversi: ribu/rb = x1000, juta = x1000000
 """
-        
+    
+    def _multiple_from_response(self, response) -> Dict[str, Any]:
         try:
-            if not self.model:
-                return {"error": "LLM service not initialized"}
-                
-            response = self.model.generate_content(prompt)
-            
             if not response or not response.text:
                 return {"error": "Empty response from LLM"}
-                
-            text = response.text.strip()
-            
-            if text.startswith('```json'):
-                text = text[7:]
-            if text.endswith('```'):
-                text = text[:-3]
-            text = text.strip()
-            
-            result = json.loads(text)
-            return result
+            return self._response_json(response)
         except json.JSONDecodeError as e:
             return {"error": f"Error JSON parsing: {str(e)}"}
         except Exception as e:
             return {"error": f"Error parsing multiple transactions: {str(e)}"}
     
-    def generate_summary(self, transactions_data: Dict[str, Any]) -> str:
-        prompt = f"""
+    @staticmethod
+    def _multiple_failed(error: Optional[Exception]) -> Dict[str, Any]:
+        if error is None:
+            return {"error": "LLM service not initialized"}
+        return {"error": f"Error parsing multiple transactions: {str(error)}"}
+    
+    def parse_multiple_transactions(self, user_message: str) -> Dict[str, Any]:
+        """
+        Parse message that might contain multiple transactions
+        Returns either single transaction or list of transactions
+        """
+        return self._generate(
+            self._multiple_prompt(user_message),
+            self._multiple_from_response,
+            self._multiple_failed,
+            cache_key=(CACHE_MULTIPLE, user_message)
+        )
+    
+    async def parse_multiple_transactions_async(self, user_message: str) -> Dict[str, Any]:
+        return await self._generate_async(
+            self._multiple_prompt(user_message),
+            self._multiple_from_response,
+            self._multiple_failed,
+            cache_key=(CACHE_MULTIPLE, user_message)
+        )
+    
+    def _interpret_prompt(self, user_message: str) -> str:
+        return f"""
+Kamu adalah CuanBOT, asisten akunting untuk UMKM Indonesia. Klasifikasikan pesan berikut lalu kembalikan hasilnya dalam SATU objek JSON.
+
+Pesan: "{user_message}"
+
+KLASIFIKASI ("kind"):
+- "single": satu transaksi. Jika ada beberapa item BELANJA untuk stok toko dalam satu konteks, hitung TOTAL sebagai satu transaksi expense
+- "multiple": beberapa transaksi terpisah (campuran pemasukan dan pengeluaran, atau waktu/konteks berbeda)
+- "question": pertanyaan atau pesan yang bukan transaksi
+
+ATURAN TRANSAKSI:
+1. transaction_type: "expense" (belanja/beli/bayar), "income" (terima/jual/pendapatan), "receivable" (piutang), "payable" (hutang)
+2. amount berupa angka positif. Konversi: ribu/rb = x1000, juta = x1000000
+3. Kategori sesuai konteks bisnis, deskripsi singkat dan jelas
+
+ATURAN JAWABAN (hanya untuk "question"):
+1. Maksimal 10-12 baris, bahasa santai tapi profesional
+2. Gunakan emoji yang relevan (💰 📊 💡 ✅ ⚠️ 📈) dan bullet points sederhana
+3. JANGAN gunakan markdown formatting (###, **, ---, *, dll)
+4. WAJIB akhiri dengan soft selling CuanBOT (1 kalimat singkat)
+
+FORMAT JSON:
+{{"kind": "single", "transactions": [{{"transaction_type": "expense", "amount": 556000, "category": "Pembelian Stok", "description": "Belanja stok toko: beras, gula, minyak"}}]}}
+{{"kind": "multiple", "transactions": [{{"transaction_type": "income", "amount": 200000, "category": "Penjualan", "description": "Jual nasi goreng"}}, {{"transaction_type": "expense", "amount": 50000, "category": "Gas", "description": "Beli gas"}}]}}
+{{"kind": "question", "answer": "Jawaban untuk pengguna"}}
+"""
+    
+    @staticmethod
+    def _valid_transaction(data: Any) -> Optional[Dict[str, Any]]:
+        if not isinstance(data, dict):
+            return None
+        transaction_type = str(data.get("transaction_type", "")).lower()
+        amount = data.get("amount")
+        if transaction_type not in TRANSACTION_TYPES:
+            return None
+        if isinstance(amount, bool) or not isinstance(amount, (int, float)) or amount <= 0:
+            return None
+        return {
+            "transaction_type": transaction_type,
+            "amount": amount,
+            "category": data.get("category") or "Umum",
+            "description": data.get("description") or ""
+        }
+    
+    def _interpret_fallback(self, user_message: str) -> Dict[str, Any]:
+        parsed = self.parse_transaction_fallback(user_message)
+        if "error" in parsed:
+            return {"kind": "error", "error": parsed["error"]}
+        return {"kind": "single", "transactions": [parsed]}
+    
+    def _interpret_from_response(self, user_message: str, response) -> Dict[str, Any]:
+        try:
+            if not response or not response.text:
+                print("Empty response from LLM, using fallback parsing")
+                return self._interpret_fallback(user_message)
+            result = self._response_json(response)
+        except Exception as e:
+            print(f"LLM interpret error: {e}, using fallback parsing")
+            return self._interpret_fallback(user_message)
+        
+        if not isinstance(result, dict):
+            return self._interpret_fallback(user_message)
+        
+        kind = result.get("kind")
+        if kind == "question" and isinstance(result.get("answer"), str) and result["answer"].strip():
+            return {"kind": "question", "answer": result["answer"]}
+        
+        if kind in ("single", "multiple"):
+            transactions = [t for t in map(self._valid_transaction, result.get("transactions") or []) if t]
+            if transactions:
+                return {"kind": "single" if len(transactions) == 1 else "multiple", "transactions": transactions}
+        
+        print("Incomplete interpretation from LLM, using fallback parsing")
+        return self._interpret_fallback(user_message)
+    
+    def _interpret_failed(self, user_message: str, error: Optional[Exception]) -> Dict[str, Any]:
+        if error is None:
+            print("LLM model not initialized, using fallback parsing")
+        else:
+            print(f"LLM interpret error: {error}, using fallback parsing")
+        return self._interpret_fallback(user_message)
+    
+    def interpret_message(self, user_message: str) -> Dict[str, Any]:
+        """
+        Classify and parse a message in one LLM round-trip. Returns
+        {"kind": "single"|"multiple", "transactions": [...]},
+        {"kind": "question", "answer": str} or {"kind": "error", "error": str}.
+        """
+        return self._generate(
+            self._interpret_prompt(user_message),
+            partial(self._interpret_from_response, user_message),
+            partial(self._interpret_failed, user_message),
+            JSON_GENERATION_CONFIG,
+            cache_key=(CACHE_INTERPRET, user_message)
+        )
+    
+    async def interpret_message_async(self, user_message: str) -> Dict[str, Any]:
+        return await self._generate_async(
+            self._interpret_prompt(user_message),
+            partial(self._interpret_from_response, user_message),
+            partial(self._interpret_failed, user_message),
+            JSON_GENERATION_CONFIG,
+            cache_key=(CACHE_INTERPRET, user_message)
+        )
+    
+    def _summary_prompt(self, transactions_data: Dict[str, Any]) -> str:
+        return f"""
 Buatkan ringkasan keuangan RINGKAS dan MENARIK berdasarkan data berikut:
 
 {json.dumps(transactions_data, indent=2)}
@@ -283,18 +496,26 @@ Format:
 
 [Soft selling CuanBOT]
 """
-        
+    
+    @staticmethod
+    def _summary_from_response(response) -> str:
         try:
-            if not self.model:
-                return "Maaf, sistem sedang bermasalah. Tidak dapat membuat ringkasan."
-                
-            response = self.model.generate_content(prompt)
-            
             if not response or not response.text:
                 return "Maaf, tidak dapat membuat ringkasan saat ini."
-                
             return response.text
         except Exception as e:
             return f"Maaf, tidak dapat membuat ringkasan: {str(e)}"
+    
+    @staticmethod
+    def _summary_failed(error: Optional[Exception]) -> str:
+        if error is None:
+            return "Maaf, sistem sedang bermasalah. Tidak dapat membuat ringkasan."
+        return f"Maaf, tidak dapat membuat ringkasan: {str(error)}"
+    
+    def generate_summary(self, transactions_data: Dict[str, Any]) -> str:
+        return self._generate(self._summary_prompt(transactions_data), self._summary_from_response, self._summary_failed)
+    
+    async def generate_summary_async(self, transactions_data: Dict[str, Any]) -> str:
+        return await self._generate_async(self._summary_prompt(transactions_data), self._summary_from_response, self._summary_failed)
 
 llm_service = LLMService()
@@ -1,24 +1,104 @@
 import pandas as pd
 import numpy as np
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple, Union
 from sklearn.ensemble import IsolationForest
-from datetime import datetime, timedelta
-from collections import Counter
+from datetime import datetime
+import logging
 import pytz
 import warnings
+from .anomaly_registry import AnomalyModel, AnomalyModelRegistry, anomaly_model_registry
+from .anomaly_rules import AnomalyRule, RuleContext, DEFAULT_RULES, evaluate_rules
+from .user_stats import UserStats
 warnings.filterwarnings('ignore')
 
+logger = logging.getLogger(__name__)
+
 class AnomalyDetectionService:
-    def __init__(self):
+    def __init__(self, rules: Optional[List[AnomalyRule]] = None, registry: Optional[AnomalyModelRegistry] = None):
+        # Rule-based checks run after the model; see anomaly_rules.DEFAULT_RULES
+        self.rules = list(rules) if rules is not None else list(DEFAULT_RULES)
+        # Without a registry every call fits a fresh model
+        self.registry = registry
+    
+    @staticmethod
+    def _new_estimator() -> IsolationForest:
         # Isolation Forest with lower contamination for more precise detection
-        self.model = IsolationForest(
+        return IsolationForest(
             contamination=0.05,  # Expect 5% anomalies
             random_state=42,
             n_estimators=100,
             max_samples='auto'
         )
     
-    def detect_anomalies(self, transactions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    @staticmethod
+    def _score(estimator: IsolationForest, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(predictions, scores) from a single pass; same labels as `estimator.predict`."""
+        scores = estimator.score_samples(X)
+        predictions = np.where(scores - estimator.offset_ < 0, -1, 1)
+        return predictions, scores
+    
+    def _fit(self, df: pd.DataFrame, hour_distribution: Dict[int, float], category_stats: pd.DataFrame) -> Tuple[AnomalyModel, np.ndarray]:
+        X = self._build_features(df, hour_distribution, category_stats)
+        estimator = self._new_estimator().fit(X)
+        predictions, _ = self._score(estimator, X)
+        model = AnomalyModel(
+            estimator,
+            category_stats[['mean', 'std', 'count']],
+            hour_distribution,
+            watermark={
+                "max_id": int(df['id'].max()),
+                "max_date": df['transaction_date'].max().isoformat(),
+                "count": len(df)
+            },
+            baseline_anomaly_rate=float((predictions == -1).mean())
+        )
+        return model, X
+    
+    def _model_for(
+        self,
+        user_id: Optional[int],
+        df: pd.DataFrame,
+        hour_distribution: Dict[int, float],
+        category_stats: pd.DataFrame,
+        force_retrain: bool = False
+    ) -> Tuple[AnomalyModel, np.ndarray, Optional[str]]:
+        """
+        The user's model and the feature matrix of `df` for it, plus why it
+        was (re)trained on this call (None when the registered model was reused).
+        """
+        if self.registry is None:
+            model, X = self._fit(df, hour_distribution, category_stats)
+            return model, X, "unregistered"
+        
+        key = self.registry.key_for(user_id)
+        model = None if force_retrain else self.registry.load(key)
+        X = predictions = None
+        if model is not None:
+            X = self._build_features(df, model.hour_distribution, model.category_stats)
+            predictions, _ = self._score(model.estimator, X)
+        
+        reason = "forced" if force_retrain else self.registry.retrain_reason(model, df['id'], predictions)
+        if reason is None:
+            return model, X, None
+        
+        with self.registry.lock(key):
+            latest = self.registry.load(key)
+            if not force_retrain and latest is not None and latest is not model:
+                # Retrained by another request while this one waited
+                return latest, self._build_features(df, latest.hour_distribution, latest.category_stats), None
+            model, X = self._fit(df, hour_distribution, category_stats)
+            self.registry.save(key, model)
+        
+        logger.info(f"Anomaly model {key} trained on {len(df)} transactions ({reason})")
+        return model, X, reason
+    
+    def detect_anomalies(
+        self,
+        transactions: Union[List[Dict[str, Any]], pd.DataFrame],
+        user_id: Optional[int] = None,
+        force_retrain: bool = False,
+        stats: Optional[UserStats] = None
+    ) -> Dict[str, Any]:
         """
         Detect anomalies using Isolation Forest with comprehensive pattern analysis.
         
@@ -43,45 +123,26 @@ class AnomalyDetectionService:
                 }
             }
         
-        df = pd.DataFrame(transactions)
+        # A frame from load_transactions_frame is used as-is (shallow copy; columns are added below)
+        df = transactions.copy(deep=False) if isinstance(transactions, pd.DataFrame) else pd.DataFrame(transactions)
         df['transaction_date'] = pd.to_datetime(df['transaction_date'])
         
-        # Calculate statistics per category
-        category_stats = df.groupby('category')['amount'].agg(['mean', 'std', 'count']).to_dict('index')
-        
-        # Analyze user's business patterns
-        business_pattern = self._analyze_business_pattern(df)
-        
-        # Feature engineering for Isolation Forest
-        features_list = []
-        for idx, row in df.iterrows():
-            # Convert to Jakarta timezone for consistent hour extraction
-            jakarta_dt = self._convert_to_jakarta_timezone(row['transaction_date'])
-            hour = jakarta_dt.hour
-            day_of_week = jakarta_dt.weekday()
-            
-            # Get category statistics
-            cat_stats = category_stats.get(row['category'], {'mean': 0, 'std': 1, 'count': 1})
-            
-            # Calculate hour deviation from user's normal pattern
-            hour_deviation = self._calculate_hour_deviation(hour, business_pattern['hour_pattern'])
+        if stats is not None and stats.total:
+            # Maintained incrementally per user; no rescan of the history
+            category_stats = stats.category_frame()
+            business_pattern = self.business_pattern_from_stats(stats)
+        else:
+            # Calculate statistics per category
+            category_stats = df.groupby('category')['amount'].agg(['mean', 'std', 'count'])
             
-            features = [
-                row['amount'],                          # Amount
-                hour,                                   # Hour of day
-                day_of_week,                           # Day of week
-                1 if row['transaction_type'] == 'expense' else 0,  # Type
-                row['amount'] / (cat_stats['mean'] + 1),  # Amount ratio to category mean
-                cat_stats['count'],                    # Category frequency
-                hour_deviation,                        # Hour deviation from normal pattern
-            ]
-            features_list.append(features)
-        
-        X = np.array(features_list)
-        
-        # Fit Isolation Forest
-        predictions = self.model.fit_predict(X)
-        scores = self.model.score_samples(X)
+            # Analyze user's business patterns
+            business_pattern = self._analyze_business_pattern(df)
+        
+        # Per-user Isolation Forest; refit only when missing, stale or drifting
+        model, X, retrained = self._model_for(
+            user_id, df, business_pattern['hour_pattern']['hour_distribution'], category_stats, force_retrain
+        )
+        predictions, scores = self._score(model.estimator, X)
         
         df['is_anomaly'] = predictions
         df['anomaly_score'] = scores
@@ -98,133 +159,35 @@ class AnomalyDetectionService:
             "operational_spike": 0
         }
         
-        # Detect duplicates
-        duplicates = self._detect_duplicates(df)
-        
-        # Detect frequent capital injections
-        frequent_capital = self._detect_frequent_capital(df)
-        
-        # Process anomalies
-        anomalies = df[df['is_anomaly'] == -1].copy()
-        
-        for idx, row in df.iterrows():
-            anomaly_reasons = []
-            is_anomaly = row['is_anomaly'] == -1
-            severity = "low"
-            
-            # Check duplicates
-            if row['id'] in duplicates:
-                anomaly_reasons.append({
-                    "type": "duplicate",
-                    "message": f"Duplikasi transaksi terdeteksi",
-                    "severity": "high"
-                })
-                anomaly_types["duplicate"] += 1
-                is_anomaly = True
-                severity = "high"
-            
-            # Check odd hours - analyze user's transaction patterns first
-            jakarta_dt = self._convert_to_jakarta_timezone(row['transaction_date'])
-            hour = jakarta_dt.hour
-            
-            if self._is_unusual_hour(hour, business_pattern['hour_pattern']):
-                common_hours = business_pattern['hour_pattern']['common_hours']
-                business_type = business_pattern['business_type']
-                
-                # Customize message based on business type
-                if business_type == "restaurant" and 22 <= hour <= 2:
-                    # Restaurants might operate late, so be less strict
-                    severity_level = "low"
-                    message = f"Transaksi agak terlambat ({hour:02d}:00) - biasanya jam {common_hours}"
-                elif business_type == "online" and 0 <= hour <= 6:
-                    # Online businesses might have 24/7 transactions
-                    severity_level = "low" 
-                    message = f"Transaksi dini hari ({hour:02d}:00) - biasanya jam {common_hours}"
-                else:
-                    severity_level = "medium"
-                    message = f"Transaksi pada jam tidak biasa ({hour:02d}:00) - biasanya jam {common_hours}"
-                
-                anomaly_reasons.append({
-                    "type": "odd_hours",
-                    "message": message,
-                    "severity": severity_level
-                })
-                anomaly_types["odd_hours"] += 1
-                is_anomaly = True
-                if severity == "low":
-                    severity = severity_level
-            
-            # Check large expenses
-            if row['transaction_type'] == 'expense':
-                cat_stats = category_stats.get(row['category'], {'mean': 0, 'std': 1})
-                if cat_stats['mean'] > 0:
-                    z_score = (row['amount'] - cat_stats['mean']) / (cat_stats['std'] + 1)
-                    if z_score > 2.5:  # More than 2.5 standard deviations
-                        normal_range = f"{int(cat_stats['mean'] - cat_stats['std']):,}–{int(cat_stats['mean'] + cat_stats['std']):,}"
-                        anomaly_reasons.append({
-                            "type": "large_expense",
-                            "message": f"{row['category']} Rp {int(row['amount']):,} (biasanya {normal_range} ribu)",
-                            "severity": "high"
-                        })
-                        anomaly_types["large_expense"] += 1
-                        is_anomaly = True
-                        severity = "high"
-            
-            # Check salary spikes
-            if row['category'] and 'gaji' in row['category'].lower():
-                cat_stats = category_stats.get(row['category'], {'mean': 0, 'std': 1})
-                if cat_stats['mean'] > 0:
-                    if row['amount'] > cat_stats['mean'] * 2:
-                        anomaly_reasons.append({
-                            "type": "salary_spike",
-                            "message": f"Gaji crew Rp {int(row['amount']):,} (biasanya {int(cat_stats['mean']):,} ribu)",
-                            "severity": "high"
-                        })
-                        anomaly_types["salary_spike"] += 1
-                        is_anomaly = True
-                        severity = "high"
-            
-            # Check operational spikes (gas, listrik, etc)
-            operational_categories = ['gas', 'listrik', 'bensin', 'operasional']
-            if row['category'] and any(cat in row['category'].lower() for cat in operational_categories):
-                cat_stats = category_stats.get(row['category'], {'mean': 0, 'std': 1})
-                if cat_stats['mean'] > 0:
-                    if row['amount'] > cat_stats['mean'] * 2.5:
-                        anomaly_reasons.append({
-                            "type": "operational_spike",
-                            "message": f"{row['category']} mendadak tinggi Rp {int(row['amount']):,} (biasanya {int(cat_stats['mean']):,})",
-                            "severity": "medium"
-                        })
-                        anomaly_types["operational_spike"] += 1
-                        is_anomaly = True
-                        if severity == "low":
-                            severity = "medium"
-            
-            # Check frequent capital injections
-            if row['id'] in frequent_capital:
-                anomaly_reasons.append({
-                    "type": "frequent_capital",
-                    "message": f"Setoran modal {frequent_capital[row['id']]} kali dalam {frequent_capital['days']} hari",
-                    "severity": "medium"
-                })
-                anomaly_types["frequent_capital"] += 1
-                is_anomaly = True
-                if severity == "low":
-                    severity = "medium"
-            
-            # Add to anomalies list if any reason found
-            if is_anomaly and anomaly_reasons:
-                anomalies_detailed.append({
-                    "transaction_id": int(row.get('id', idx)),
-                    "amount": float(row['amount']),
-                    "transaction_type": row['transaction_type'],
-                    "category": row.get('category', 'Unknown'),
-                    "description": row.get('description', ''),
-                    "date": self._format_date_indonesia(row['transaction_date']),
-                    "anomaly_score": float(row['anomaly_score']),
-                    "severity": severity,
-                    "reasons": anomaly_reasons
-                })
+        hours = self._to_jakarta_series(df['transaction_date']).dt.hour
+        hour_pattern = business_pattern['hour_pattern']
+        context = RuleContext(
+            df,
+            hours,
+            category_stats,
+            business_pattern,
+            unusual_hours={hour for hour in range(24) if self._is_unusual_hour(hour, hour_pattern)},
+            duplicates=self._detect_duplicates(df),
+            frequent_capital=self._detect_frequent_capital(df)
+        )
+        flagged, counts = evaluate_rules(self.rules, context)
+        for rule_type, count in counts.items():
+            anomaly_types[rule_type] = anomaly_types.get(rule_type, 0) + count
+        
+        # Build the response only for rows with at least one reason
+        for idx, severity, anomaly_reasons in flagged:
+            row = df.loc[idx]
+            anomalies_detailed.append({
+                "transaction_id": int(row.get('id', idx)),
+                "amount": float(row['amount']),
+                "transaction_type": row['transaction_type'],
+                "category": row.get('category', 'Unknown'),
+                "description": row.get('description', ''),
+                "date": self._format_date_indonesia(row['transaction_date']),
+                "anomaly_score": float(row['anomaly_score']),
+                "severity": severity,
+                "reasons": anomaly_reasons
+            })
         
         # Sort by severity and anomaly score
         severity_order = {"high": 0, "medium": 1, "low": 2}
@@ -233,6 +196,7 @@ class AnomalyDetectionService:
         return {
             "status": "success",
             "model": "isolation_forest",
+            "model_info": {**model.info(), "retrained": retrained},
             "total_transactions": len(df),
             "anomalies_detected": len(anomalies_detailed),
             "anomalies": anomalies_detailed,
@@ -246,53 +210,90 @@ class AnomalyDetectionService:
             }
         }
     
-    def _detect_duplicates(self, df: pd.DataFrame) -> List[int]:
-        """Detect duplicate transactions (same amount, category, within 1 hour)"""
-        duplicates = []
-        df_sorted = df.sort_values('transaction_date')
-        
-        for i in range(len(df_sorted) - 1):
-            current = df_sorted.iloc[i]
-            next_row = df_sorted.iloc[i + 1]
-            
-            # Check if same amount and category within 1 hour
-            if (current['amount'] == next_row['amount'] and 
-                current['category'] == next_row['category'] and
-                abs((next_row['transaction_date'] - current['transaction_date']).total_seconds()) < 3600):
-                duplicates.extend([current['id'], next_row['id']])
-        
-        return list(set(duplicates))
+    def _build_features(
+        self,
+        df: pd.DataFrame,
+        hour_distribution: Dict[int, float],
+        category_stats: Optional[pd.DataFrame] = None
+    ) -> np.ndarray:
+        """
+        Isolation Forest feature matrix, one row per transaction: amount, hour,
+        day of week, expense flag, amount / category mean, category count and
+        hour deviation from the user's normal pattern. `category_stats`
+        (mean/count per category) defaults to the statistics of `df` itself;
+        registered models pass the ones they were trained with.
+        """
+        # Jakarta timezone for consistent hour extraction
+        jakarta_dates = self._to_jakarta_series(df['transaction_date'])
+        
+        # Category statistics; unknown categories get mean 0, count 1
+        if category_stats is None:
+            category_stats = df.groupby('category')['amount'].agg(['mean', 'count'])
+        category_mean = df['category'].map(category_stats['mean']).fillna(0)
+        category_count = df['category'].map(category_stats['count']).fillna(1)
+        
+        # Hour deviation: inverse frequency of the hour, 1.0 for hours never used before
+        hour = jakarta_dates.dt.hour
+        hour_deviation = 1.0 - hour.map(hour_distribution).fillna(0.0)
+        
+        return np.column_stack([
+            df['amount'].to_numpy(dtype=float),                         # Amount
+            hour.to_numpy(dtype=float),                                 # Hour of day
+            jakarta_dates.dt.weekday.to_numpy(dtype=float),             # Day of week
+            (df['transaction_type'] == 'expense').to_numpy(dtype=float),  # Type
+            (df['amount'] / (category_mean + 1)).to_numpy(dtype=float),  # Amount ratio to category mean
+            category_count.to_numpy(dtype=float),                       # Category frequency
+            hour_deviation.to_numpy(dtype=float),                       # Hour deviation from normal pattern
+        ])
+    
+    def _detect_duplicates(self, df: pd.DataFrame, window_seconds: int = 3600) -> List[int]:
+        """
+        Detect duplicate transactions: same amount and category, within 1 hour
+        of another one. Sorting by time and grouping by (amount, category)
+        makes any such pair show up as neighbours, so one diff() each way
+        is enough. Uncategorized transactions are never duplicates.
+        """
+        frame = pd.DataFrame({
+            'id': df['id'],
+            'amount': df['amount'],
+            'category': df['category'],
+            'date': pd.to_datetime(df['transaction_date'], utc=True)
+        }).sort_values('date', kind='stable')
+        
+        dates = frame.groupby(['amount', 'category'], sort=False)['date']
+        window = pd.Timedelta(seconds=window_seconds)
+        close_to_previous = dates.diff() < window
+        close_to_next = dates.diff(-1).abs() < window
+        
+        return frame.loc[close_to_previous | close_to_next, 'id'].drop_duplicates().tolist()
     
-    def _detect_frequent_capital(self, df: pd.DataFrame) -> Dict[int, int]:
-        """Detect frequent capital injections (setoran modal)"""
+    def _detect_frequent_capital(self, df: pd.DataFrame, days: int = 3, min_count: int = 3) -> Dict[int, int]:
+        """Detect frequent capital injections (setoran modal): 3+ within ±3 days of each other"""
         capital_transactions = df[
             (df['transaction_type'] == 'income') & 
             (df['category'].str.contains('modal|setoran', case=False, na=False))
-        ].copy()
+        ]
         
         if len(capital_transactions) < 2:
             return {}
         
-        # Check for multiple capital injections within short period
-        capital_transactions = capital_transactions.sort_values('transaction_date')
-        frequent = {}
+        # Count capital injections within the ±3-day window of each one with two binary searches
+        dates = pd.to_datetime(capital_transactions['transaction_date'], utc=True).dt.tz_convert(None).to_numpy()
+        order = np.argsort(dates, kind='stable')
+        sorted_dates = dates[order]
+        sorted_ids = capital_transactions['id'].to_numpy()[order]
         
-        for i in range(len(capital_transactions)):
-            current_date = capital_transactions.iloc[i]['transaction_date']
-            current_id = capital_transactions.iloc[i]['id']
-            
-            # Count capital injections within 3 days
-            window_start = current_date - timedelta(days=3)
-            window_end = current_date + timedelta(days=3)
-            
-            count = len(capital_transactions[
-                (capital_transactions['transaction_date'] >= window_start) &
-                (capital_transactions['transaction_date'] <= window_end)
-            ])
-            
-            if count >= 3:  # 3 or more within 6 days
-                frequent[current_id] = count
-                frequent['days'] = 6
+        window = np.timedelta64(days, 'D')
+        counts = (
+            np.searchsorted(sorted_dates, sorted_dates + window, side='right')
+            - np.searchsorted(sorted_dates, sorted_dates - window, side='left')
+        )
+        
+        frequent = {}
+        for transaction_id, count in zip(sorted_ids[counts >= min_count].tolist(), counts[counts >= min_count].tolist()):
+            frequent[transaction_id] = count
+        if frequent:
+            frequent['days'] = days * 2
         
         return frequent
     
@@ -301,25 +302,28 @@ class AnomalyDetectionService:
         Analyze user's transaction hour patterns to determine what's normal for them
         """
         # Extract hours from all transactions (in Jakarta timezone)
-        hours = []
-        for _, row in df.iterrows():
-            jakarta_dt = self._convert_to_jakarta_timezone(row['transaction_date'])
-            hours.append(jakarta_dt.hour)
+        hours = self._to_jakarta_series(df['transaction_date']).dt.hour
+        
+        # Count frequency of each hour (in order of first appearance)
+        hour_counts = hours.value_counts(sort=False)
+        total_transactions = len(hours)
         
-        if not hours:
+        # Calculate hour distribution percentages
+        hour_distribution = {int(hour): int(count)/total_transactions for hour, count in hour_counts.items()}
+        
+        return self._hour_pattern(hour_distribution)
+    
+    def _hour_pattern(self, hour_distribution: Dict[int, float]) -> Dict[str, Any]:
+        """
+        Normal hours for a user from their hour distribution (share of transactions per Jakarta hour)
+        """
+        if not hour_distribution:
             return {
                 'common_hours': '08:00-18:00',
                 'hour_distribution': {},
                 'unusual_threshold': 0.05
             }
         
-        # Count frequency of each hour
-        hour_counts = Counter(hours)
-        total_transactions = len(hours)
-        
-        # Calculate hour distribution percentages
-        hour_distribution = {hour: count/total_transactions for hour, count in hour_counts.items()}
-        
         # Find common hours (hours with >5% of transactions)
         common_hours = [hour for hour, pct in hour_distribution.items() if pct >= 0.05]
         common_hours.sort()
@@ -401,6 +405,15 @@ class AnomalyDetectionService:
         # Analyze categories to determine business type
         categories = df['category'].value_counts().to_dict()
         
+        return self._business_pattern(categories, self._analyze_user_hour_patterns(df))
+    
+    def business_pattern_from_stats(self, stats: UserStats) -> Dict[str, Any]:
+        """
+        Same analysis as _analyze_business_pattern, read from the incremental per-user statistics
+        """
+        return self._business_pattern(stats.category_counts(), self._hour_pattern(stats.hour_distribution()))
+    
+    def _business_pattern(self, categories: Dict[str, int], hour_pattern: Dict[str, Any]) -> Dict[str, Any]:
         # Determine business type based on categories
         business_type = "general"
         if any(cat and ('makanan' in cat.lower() or 'menu' in cat.lower() or 'penjualan' in cat.lower()) for cat in categories.keys()):
@@ -410,9 +423,6 @@ class AnomalyDetectionService:
         elif any(cat and ('online' in cat.lower() or 'digital' in cat.lower()) for cat in categories.keys()):
             business_type = "online"
         
-        # Get hour pattern
-        hour_pattern = self._analyze_user_hour_patterns(df)
-        
         return {
             'business_type': business_type,
             'hour_pattern': hour_pattern,
@@ -449,6 +459,11 @@ class AnomalyDetectionService:
         # Format as DD/MM/YYYY, HH.MM.SS
         return jakarta_dt.strftime("%d/%m/%Y, %H.%M.%S")
     
+    @staticmethod
+    def _to_jakarta_series(dates: pd.Series) -> pd.Series:
+        """Vectorized `_convert_to_jakarta_timezone`: naive values are taken as UTC."""
+        return pd.to_datetime(dates, utc=True).dt.tz_convert('Asia/Jakarta')
+    
     def _convert_to_jakarta_timezone(self, dt):
         """
         Convert datetime to Jakarta timezone
@@ -461,4 +476,4 @@ class AnomalyDetectionService:
         jakarta_tz = pytz.timezone('Asia/Jakarta')
         return dt.astimezone(jakarta_tz)
 
-anomaly_detection_service = AnomalyDetectionService()
+anomaly_detection_service = AnomalyDetectionService(registry=anomaly_model_registry)
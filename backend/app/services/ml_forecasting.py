@@ -1,21 +1,115 @@
 import pandas as pd
 import numpy as np
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
-from prophet import Prophet
+from typing import List, Dict, Any, Union, Optional, Callable
+import hashlib
+import threading
+import time
 import warnings
+from ..config import settings
+from .forecasters import Forecaster, select_engine
 warnings.filterwarnings('ignore')
 
+# Bump when an engine's configuration or the result layout changes, so cached forecasts are not reused
+FORECAST_CACHE_VERSION = 3
+
+# Compact response layout: parallel arrays over history + future days
+COLUMNAR_KEYS = ("dates", "actual", "yhat", "lower", "upper")
+OUTPUT_FORMATS = ("records", "columnar")
+
+def to_records(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Expand a columnar forecast into the actual/forecast/chart_data record lists."""
+    if result.get("format") != "columnar":
+        return result
+    
+    rest = {key: value for key, value in result.items() if key not in COLUMNAR_KEYS and key != "format"}
+    if result.get("status") != "success":
+        return {**rest, "actual": [], "forecast": [], "chart_data": []}
+    
+    dates, actual, yhat, lower, upper = (result[key] for key in COLUMNAR_KEYS)
+    split = result["metadata"]["training_samples"]
+    metadata = rest.pop("metadata")
+    return {
+        **rest,
+        "actual": [
+            {"date": date, "actual_amount": amount, "type": "actual"}
+            for date, amount in zip(dates[:split], actual[:split])
+        ],
+        "forecast": [
+            {"date": date, "predicted_amount": predicted, "lower_bound": low, "upper_bound": high, "type": "forecast"}
+            for date, predicted, low, high in zip(dates[split:], yhat[split:], lower[split:], upper[split:])
+        ],
+        # Combined data for easy charting
+        "chart_data": [
+            {"date": date, "actual": amount, "predicted": predicted, "lower_bound": low, "upper_bound": high}
+            for date, amount, predicted, low, high in zip(dates, actual, yhat, lower, upper)
+        ],
+        "metadata": metadata
+    }
+
+def to_columnar(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Collapse a record-style forecast into parallel arrays (dates, actual, yhat, lower, upper)."""
+    if result.get("format") == "columnar":
+        return result
+    
+    rest = {key: value for key, value in result.items() if key not in ("actual", "forecast", "chart_data")}
+    chart_data = result.get("chart_data") or []
+    return {
+        **rest,
+        "format": "columnar",
+        "dates": [row["date"] for row in chart_data],
+        "actual": [row["actual"] for row in chart_data],
+        "yhat": [row["predicted"] for row in chart_data],
+        "lower": [row["lower_bound"] for row in chart_data],
+        "upper": [row["upper_bound"] for row in chart_data]
+    }
+
+def format_forecast(result: Dict[str, Any], output_format: str = "records") -> Dict[str, Any]:
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown forecast format: {output_format}")
+    return to_columnar(result) if output_format == "columnar" else to_records(result)
+
 class ForecastingService:
-    def __init__(self):
+    def __init__(self, cache_size: int = 256):
         self.model = None
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
     
-    def prepare_data(self, transactions: List[Dict[str, Any]]) -> pd.DataFrame:
+    @staticmethod
+    def fingerprint(df: pd.DataFrame, periods: int, user_id: Optional[int] = None, engine: str = "prophet") -> str:
+        """
+        Hash of the daily income series (ds, y) plus user, horizon and engine;
+        equal data -> equal forecast. Daily totals are rounded to cents first:
+        the batch job sums in SQL and the endpoint in pandas, and the two can
+        differ in the last bits of a float.
+        """
+        digest = hashlib.sha256(f"v{FORECAST_CACHE_VERSION}:{engine}:{user_id}:{periods}:".encode())
+        digest.update(df['ds'].to_numpy(dtype='datetime64[ns]').tobytes())
+        digest.update(np.round(df['y'].to_numpy(dtype=np.float64), 2).tobytes())
+        return digest.hexdigest()
+    
+    def _cache_get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._cache_lock:
+            result = self._cache.get(key)
+            if result is not None:
+                self._cache.move_to_end(key)
+            return result
+    
+    def _cache_set(self, key: str, result: Dict[str, Any]):
+        with self._cache_lock:
+            self._cache[key] = result
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+    
+    def prepare_data(self, transactions: Union[List[Dict[str, Any]], pd.DataFrame]) -> pd.DataFrame:
         """
         Prepare transaction data for Prophet.
         Prophet requires columns: 'ds' (datestamp) and 'y' (value to forecast)
         """
-        df = pd.DataFrame(transactions)
+        df = transactions.copy(deep=False) if isinstance(transactions, pd.DataFrame) else pd.DataFrame(transactions)
         if df.empty:
             return df
         
@@ -31,103 +125,103 @@ class ForecastingService:
         
         return df
     
-    def forecast_revenue(self, transactions: List[Dict[str, Any]], periods: int = 30) -> Dict[str, Any]:
+    def forecast_revenue(
+        self,
+        transactions: Union[List[Dict[str, Any]], pd.DataFrame],
+        periods: int = 30,
+        user_id: Optional[int] = None,
+        find_stored: Optional[Callable[[str], Optional[Dict[str, Any]]]] = None,
+        engine: Optional[str] = None,
+        output_format: str = "records"
+    ) -> Dict[str, Any]:
         """
-        Forecast revenue using Facebook Prophet.
+        Forecast revenue with Prophet or the NumPy seasonal engine
+        (`engine`: "prophet", "seasonal" or "auto" = by history length).
         Returns actual data + predictions for visualization.
+        
+        Results are cached by fingerprint of the daily income series: unchanged
+        data is served from memory or, via `find_stored(fingerprint)`, from a
+        previously saved prediction, without refitting. `cache.status` is
+        "memory", "stored" or "miss"; `metadata.fit_ms` is the original fit time.
+        
+        `output_format` "records" gives actual/forecast/chart_data lists,
+        "columnar" the compact dates/actual/yhat/lower/upper arrays (the form
+        that is cached and stored).
         """
         df = self.prepare_data(transactions)
         
         if len(df) < 7:
-            return {
+            return format_forecast({
                 "status": "insufficient_data",
                 "message": "Minimal 7 hari data diperlukan untuk forecasting",
                 "actual": [],
                 "forecast": [],
                 "chart_data": []
+            }, output_format)
+        
+        started = time.perf_counter()
+        forecaster = self.engine_for(engine, len(df))
+        key = self.fingerprint(df, periods, user_id, forecaster.name)
+        
+        status = "memory"
+        result = self._cache_get(key)
+        if result is None and find_stored is not None:
+            status = "stored"
+            result = find_stored(key)
+            if result is not None and result.get("status") == "success":
+                self._cache_set(key, result)
+            else:
+                result = None
+        if result is not None:
+            return {
+                **format_forecast(result, output_format),
+                "cache": {"status": status, "fingerprint": key, "lookup_ms": round((time.perf_counter() - started) * 1000, 2)}
             }
         
+        result = self.fit_forecast(df, periods, forecaster)
+        if result["status"] == "success":
+            self._cache_set(key, result)
+        return {**format_forecast(result, output_format), "cache": {"status": "miss", "fingerprint": key, "lookup_ms": None}}
+    
+    def engine_for(self, engine: Optional[str], history_days: int) -> Forecaster:
+        return select_engine(engine or settings.forecast_engine, history_days, settings.forecast_fast_max_days)
+    
+    def fit_forecast(self, df: pd.DataFrame, periods: int, forecaster: Optional[Forecaster] = None) -> Dict[str, Any]:
+        """Fit an engine on a prepared daily series (ds, y) and build the columnar forecast; no caching."""
+        forecaster = forecaster or self.engine_for(None, len(df))
         try:
-            # Initialize and train Prophet model
-            model = Prophet(
-                daily_seasonality=True,
-                weekly_seasonality=True,
-                yearly_seasonality=False,  # Not enough data for yearly patterns
-                changepoint_prior_scale=0.05,  # Flexibility of trend changes
-                seasonality_prior_scale=10.0,  # Strength of seasonality
-                interval_width=0.95  # 95% confidence interval
-            )
+            fit_started = time.perf_counter()
             
-            model.fit(df)
-            
-            # Create future dataframe for predictions
-            future = model.make_future_dataframe(periods=periods, freq='D')
-            forecast = model.predict(future)
+            forecast = forecaster.fit_predict(df, periods)
             
             # Ensure predictions are non-negative
             forecast['yhat'] = forecast['yhat'].clip(lower=0)
             forecast['yhat_lower'] = forecast['yhat_lower'].clip(lower=0)
             forecast['yhat_upper'] = forecast['yhat_upper'].clip(lower=0)
             
-            # Separate actual and predicted data
-            actual_data = []
-            for _, row in df.iterrows():
-                actual_data.append({
-                    "date": row['ds'].strftime("%Y-%m-%d"),
-                    "actual_amount": float(row['y']),
-                    "type": "actual"
-                })
-            
             # Get only future predictions (after last actual date)
             last_actual_date = df['ds'].max()
             future_forecast = forecast[forecast['ds'] > last_actual_date]
             
-            forecast_data = []
-            for _, row in future_forecast.iterrows():
-                forecast_data.append({
-                    "date": row['ds'].strftime("%Y-%m-%d"),
-                    "predicted_amount": float(row['yhat']),
-                    "lower_bound": float(row['yhat_lower']),
-                    "upper_bound": float(row['yhat_upper']),
-                    "type": "forecast"
-                })
-            
-            # Combine for chart visualization (actual + forecast)
-            chart_data = []
-            
-            # Add actual data
-            for item in actual_data:
-                chart_data.append({
-                    "date": item["date"],
-                    "actual": item["actual_amount"],
-                    "predicted": None,
-                    "lower_bound": None,
-                    "upper_bound": None
-                })
-            
-            # Add forecast data
-            for item in forecast_data:
-                chart_data.append({
-                    "date": item["date"],
-                    "actual": None,
-                    "predicted": item["predicted_amount"],
-                    "lower_bound": item["lower_bound"],
-                    "upper_bound": item["upper_bound"]
-                })
-            
             # Calculate statistics
             avg_actual = float(df['y'].mean())
             avg_forecast = float(future_forecast['yhat'].mean())
             trend = "increasing" if avg_forecast > avg_actual else "decreasing"
             
+            # Columnar payload: history rows have no prediction, future rows no actual
+            history_points = len(df)
+            future_points = len(future_forecast)
             return {
                 "status": "success",
-                "model": "prophet",
-                "actual": actual_data,
-                "forecast": forecast_data,
-                "chart_data": chart_data,  # Combined data for easy charting
+                "model": forecaster.name,
+                "format": "columnar",
+                "dates": df['ds'].dt.strftime("%Y-%m-%d").tolist() + future_forecast['ds'].dt.strftime("%Y-%m-%d").tolist(),
+                "actual": df['y'].astype(float).tolist() + [None] * future_points,
+                "yhat": [None] * history_points + future_forecast['yhat'].astype(float).tolist(),
+                "lower": [None] * history_points + future_forecast['yhat_lower'].astype(float).tolist(),
+                "upper": [None] * history_points + future_forecast['yhat_upper'].astype(float).tolist(),
                 "metadata": {
-                    "training_samples": len(df),
+                    "training_samples": history_points,
                     "forecast_period_days": periods,
                     "average_actual_revenue": avg_actual,
                     "average_forecast_revenue": avg_forecast,
@@ -135,7 +229,8 @@ class ForecastingService:
                     "confidence_interval": "95%",
                     "first_date": df['ds'].min().strftime("%Y-%m-%d"),
                     "last_actual_date": last_actual_date.strftime("%Y-%m-%d"),
-                    "last_forecast_date": future_forecast['ds'].max().strftime("%Y-%m-%d")
+                    "last_forecast_date": future_forecast['ds'].max().strftime("%Y-%m-%d"),
+                    "fit_ms": round((time.perf_counter() - fit_started) * 1000, 2)
                 }
             }
             
@@ -148,4 +243,4 @@ class ForecastingService:
                 "chart_data": []
             }
 
-forecasting_service = ForecastingService()
+forecasting_service = ForecastingService(cache_size=settings.forecast_cache_size)
@@ -0,0 +1,56 @@
+from typing import Any, Dict, Optional
+from sqlalchemy.orm import Session
+from ..models.prediction import Prediction, PredictionType, encode_payload
+
+def summarize(prediction_type: PredictionType, data: Dict[str, Any]) -> Dict[str, Any]:
+    """The few fields /history lists by default."""
+    summary = {"status": data.get("status")}
+    if data.get("status") != "success":
+        summary["message"] = data.get("message")
+        return summary
+    
+    if prediction_type == PredictionType.FORECAST:
+        metadata = data.get("metadata") or {}
+        summary.update({
+            "model": data.get("model"),
+            "training_samples": metadata.get("training_samples"),
+            "forecast_period_days": metadata.get("forecast_period_days"),
+            "trend": metadata.get("trend"),
+            "average_forecast_revenue": metadata.get("average_forecast_revenue"),
+            "last_actual_date": metadata.get("last_actual_date"),
+            "last_forecast_date": metadata.get("last_forecast_date")
+        })
+    else:
+        counts = data.get("summary") or {}
+        summary.update({
+            "total_transactions": data.get("total_transactions"),
+            "anomalies_detected": data.get("anomalies_detected"),
+            "anomaly_types": {name: count for name, count in (counts.get("anomaly_types") or {}).items() if count},
+            "high_severity": counts.get("high_severity"),
+            "medium_severity": counts.get("medium_severity"),
+            "low_severity": counts.get("low_severity")
+        })
+    return summary
+
+def prediction_row(
+    prediction_type: PredictionType,
+    data: Dict[str, Any],
+    user_id: Optional[int] = None,
+    extra_metadata: Optional[Dict[str, Any]] = None,
+    fingerprint: Optional[str] = None
+) -> Dict[str, Any]:
+    """Column values for a new prediction: compressed payload + summary (also used for bulk inserts)."""
+    return {
+        "prediction_type": prediction_type,
+        "user_id": user_id,
+        "payload": encode_payload(data),
+        "summary": summarize(prediction_type, data),
+        "fingerprint": fingerprint,
+        "extra_metadata": extra_metadata
+    }
+
+def save_prediction(db: Session, prediction_type: PredictionType, data: Dict[str, Any], **kwargs: Any) -> Prediction:
+    prediction = Prediction(**prediction_row(prediction_type, data, **kwargs))
+    db.add(prediction)
+    db.commit()
+    return prediction
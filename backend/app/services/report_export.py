@@ -0,0 +1,154 @@
+import csv
+import io
+import tempfile
+from datetime import datetime
+from typing import Any, Iterable, Iterator, List, Sequence
+import pytz
+
+# Export columns, in file order (same fields as the report listing). Batches
+# are sequences of rows in this order with transaction_type already a value
+EXPORT_COLUMNS = (
+    "id", "user_id", "username", "transaction_type", "amount",
+    "category", "description", "transaction_date", "is_anomaly"
+)
+
+DATE_INDEX = EXPORT_COLUMNS.index("transaction_date")
+
+# Excel's row limit per sheet, header included
+XLSX_MAX_ROWS = 1048576
+
+JAKARTA_TZ = pytz.timezone('Asia/Jakarta')
+
+def _excel_datetime(value: datetime) -> datetime:
+    """Naive Asia/Jakarta wall time (Excel has no timezones); naive values are taken as UTC."""
+    if value.tzinfo is None:
+        value = pytz.utc.localize(value)
+    return value.astimezone(JAKARTA_TZ).replace(tzinfo=None)
+
+def csv_chunks(batches: Iterable[Sequence[Any]]) -> Iterator[bytes]:
+    """UTF-8 CSV, one encoded chunk per batch of rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+
+    for batch in batches:
+        writer.writerows(batch)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+def xlsx_chunks(
+    batches: Iterable[Sequence[Any]],
+    spool_size: int = 8 * 1024 * 1024,
+    chunk_size: int = 64 * 1024
+) -> Iterator[bytes]:
+    """
+    XLSX built with openpyxl's write-only mode (rows go straight to temp
+    files). The zip is only complete at save(), so it is written to a
+    spooled file first and then streamed. Rows past Excel's limit continue
+    on another sheet; dates are written in WIB.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = None
+    sheet_rows = XLSX_MAX_ROWS
+
+    for batch in batches:
+        for row in batch:
+            if sheet_rows >= XLSX_MAX_ROWS:
+                sheet = workbook.create_sheet(f"Transaksi {len(workbook.worksheets) + 1}")
+                sheet.append(EXPORT_COLUMNS)
+                sheet_rows = 1
+            values = list(row)
+            if values[DATE_INDEX] is not None:
+                values[DATE_INDEX] = _excel_datetime(values[DATE_INDEX])
+            sheet.append(values)
+            sheet_rows += 1
+
+    if sheet is None:
+        sheet = workbook.create_sheet("Transaksi 1")
+        sheet.append(EXPORT_COLUMNS)
+
+    with tempfile.SpooledTemporaryFile(max_size=spool_size) as spool:
+        workbook.save(spool)
+        spool.seek(0)
+        while True:
+            chunk = spool.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+class _ChunkSink:
+    """Write-only file for pyarrow that hands out what was written since the last drain."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def parquet_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("id", pa.int64()),
+        ("user_id", pa.int64()),
+        ("username", pa.string()),
+        ("transaction_type", pa.string()),
+        ("amount", pa.float64()),
+        ("category", pa.string()),
+        ("description", pa.string()),
+        # Instants in UTC: aware values are converted, naive ones are already UTC
+        ("transaction_date", pa.timestamp("us", tz="UTC")),
+        ("is_anomaly", pa.int8()),
+    ])
+
+def parquet_chunks(batches: Iterable[Sequence[Any]], compression: str = "snappy") -> Iterator[bytes]:
+    """
+    Parquet with one row group per batch. Each row group is sent as soon as
+    it is written; the footer follows the last one.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = parquet_schema()
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema, compression=compression)
+    try:
+        for batch in batches:
+            columns = list(zip(*batch))
+            if not columns:
+                continue
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                schema=schema
+            ))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
@@ -0,0 +1,145 @@
+from typing import Any, Iterable, Iterator, List, Optional, Sequence, Tuple
+from reportlab.platypus import Flowable, Table, TableStyle
+
+# Upper bound for one page table, in case a frame reports an unbounded height
+MAX_ROWS_PER_TABLE = 60
+
+class LazyStory:
+    """
+    List-like story for doc.build() backed by a generator.
+
+    Platypus only works at the front of the story (len, [i], del [0],
+    insert(0) and [0:0] = ...), so flowables are produced as layout reaches
+    them and at most `lookahead` are held ahead of the current one.
+    """
+
+    def __init__(self, flowables: Iterable[Flowable], lookahead: int = 2):
+        self._source = iter(flowables)
+        self._buffer: List[Flowable] = []
+        self._lookahead = lookahead
+
+    def _fill(self, count: int):
+        while self._source is not None and len(self._buffer) < count:
+            try:
+                self._buffer.append(next(self._source))
+            except StopIteration:
+                self._source = None
+
+    def __len__(self) -> int:
+        self._fill(self._lookahead)
+        return len(self._buffer)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            self._fill(index.stop if index.stop is not None else self._lookahead)
+        else:
+            self._fill(index + 1)
+        return self._buffer[index]
+
+    def __setitem__(self, index, value):
+        self._buffer[index] = value
+
+    def __delitem__(self, index):
+        del self._buffer[index]
+
+    def insert(self, index: int, value: Flowable):
+        self._buffer.insert(index, value)
+
+class TableRows:
+    """
+    Shared row source for a run of PageTables.
+
+    Row and header heights are measured once from a sample row; every body
+    row has the same height because cells are single-line strings (the date
+    is always two lines).
+    """
+
+    def __init__(
+        self,
+        rows: Iterator[Sequence[str]],
+        header: Sequence[str],
+        col_widths: Sequence[float],
+        style: List[Tuple],
+        row_backgrounds: Sequence[Any],
+        sample_row: Sequence[str]
+    ):
+        self._rows = iter(rows)
+        self._pending: Optional[Sequence[str]] = None
+        self.header = list(header)
+        self.col_widths = list(col_widths)
+        self.taken = 0
+
+        # Alternating colours as one ROWBACKGROUNDS command; the second style
+        # starts on the other colour for tables that begin on an even row
+        first, second = row_backgrounds
+        self._styles = (
+            TableStyle(style + [('ROWBACKGROUNDS', (0, 1), (-1, -1), [first, second])]),
+            TableStyle(style + [('ROWBACKGROUNDS', (0, 1), (-1, -1), [second, first])])
+        )
+
+        self.header_height = self._measure([])
+        self.row_height = self._measure([sample_row]) - self.header_height
+
+    def _measure(self, rows: List[Sequence[str]]) -> float:
+        table = Table([self.header] + rows, colWidths=self.col_widths, style=self._styles[0])
+        return table.wrap(sum(self.col_widths), 1e9)[1]
+
+    def has_more(self) -> bool:
+        if self._pending is None:
+            self._pending = next(self._rows, None)
+        return self._pending is not None
+
+    def take(self, count: int) -> Optional[Table]:
+        """Table of the next `count` rows (header repeated), or None when the rows ran out."""
+        rows = []
+        while len(rows) < count and self.has_more():
+            rows.append(self._pending)
+            self._pending = None
+        if not rows:
+            return None
+
+        style = self._styles[self.taken % 2]
+        self.taken += len(rows)
+        return Table([self.header] + rows, colWidths=self.col_widths, style=style, repeatRows=1)
+
+    def tables(self) -> Iterator[Flowable]:
+        while self.has_more():
+            yield PageTable(self)
+
+class PageTable(Flowable):
+    """
+    Table that takes only as many rows as fit where it is laid out.
+
+    Rows are pulled on the first wrap, so consecutive PageTables break on
+    page boundaries and each page holds one small table.
+    """
+
+    def __init__(self, rows: TableRows):
+        super().__init__()
+        self._rows = rows
+        self._table: Optional[Table] = None
+        self._empty = False
+
+    def wrap(self, availWidth, availHeight):
+        if self._table is None and not self._empty:
+            count = int((availHeight - self._rows.header_height) // self._rows.row_height)
+            if count < 1:
+                # Nothing fits in this frame; split() returns [] and the doc moves on
+                return availWidth, availHeight + 1
+            self._table = self._rows.take(min(count, MAX_ROWS_PER_TABLE))
+            self._empty = self._table is None
+
+        if self._empty:
+            self.width, self.height = 0, 0
+        else:
+            self.width, self.height = self._table.wrap(availWidth, availHeight)
+        return self.width, self.height
+
+    def split(self, availWidth, availHeight):
+        if self._table is None:
+            return []
+        return self._table.split(availWidth, availHeight)
+
+    def draw(self):
+        if self._table is not None:
+            self._table.drawOn(self.canv, 0, 0)
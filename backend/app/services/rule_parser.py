@@ -0,0 +1,244 @@
+import re
+import threading
+from typing import Dict, Any, List, Tuple, Optional
+
+# Amount grammar: optional "Rp", a number with optional . or , separators and an optional unit
+AMOUNT_PATTERN = re.compile(
+    r'(?P<rp>\brp\.?\s*)?(?P<number>\d+(?:[.,]\d+)*)\s*(?P<unit>ribu|rb|k|juta|jt)?(?![a-z])',
+    re.IGNORECASE
+)
+
+UNIT_MULTIPLIERS = {
+    'ribu': 1_000, 'rb': 1_000, 'k': 1_000,
+    'juta': 1_000_000, 'jt': 1_000_000,
+}
+
+# Bare numbers below this are treated as quantities ("2 bungkus"), not money
+MIN_BARE_AMOUNT = 1_000
+
+# A multiplier next to an amount makes it a unit price ("10rb x 3", "3 x 15rb", "@15rb")
+MULTIPLIER_BEFORE = re.compile(r'(?<![a-z])[x×@]\s*$', re.IGNORECASE)
+MULTIPLIER_AFTER = re.compile(r'\s*[x×@](?![a-z])', re.IGNORECASE)
+
+# A bare number followed by one of these counts items ("2024 pcs", "1.5 kg")
+QUANTITY_UNIT_AFTER = re.compile(
+    r'\s*(?:pcs|pc|buah|biji|bungkus|bks|porsi|kg|kilo|gram|gr|ons|liter|ltr|lusin|kodi|karung|sak|'
+    r'dus|box|pack|pak|botol|gelas|cup|ikat|ekor|lembar|potong|kotak|paket|unit|meter|roll)\b',
+    re.IGNORECASE
+)
+
+# Keyword tables: (regex, transaction_type). Affixed forms (membeli, pembelian) are listed explicitly
+TYPE_KEYWORDS: List[Tuple[str, str]] = [
+    (r'\b(?:jual|menjual|dijual|terjual|penjualan|laku)\b', 'income'),
+    (r'\b(?:terima|menerima|diterima|dapat|dapet|pendapatan|pemasukan|omzet|omset)\b', 'income'),
+    (r'\b(?:setoran|setor)\b', 'income'),
+    (r'\b(?:piutang|tagih|menagih|tagihan)\b', 'receivable'),
+    (r'\b(?:hutang|utang|ngutang|berhutang|pinjam|pinjaman|meminjam)\b', 'payable'),
+    (r'\b(?:beli|membeli|dibeli|pembelian|belanja|bayar|membayar|dibayar|biaya|ongkos|restok|kulakan)\b', 'expense'),
+]
+
+# Category keywords, most specific first: (regex, category, transaction type it implies or None)
+CATEGORY_KEYWORDS: List[Tuple[str, str, Optional[str]]] = [
+    (r'\b(?:modal|setoran|setor)\b', 'Modal', 'income'),
+    (r'\b(?:stok|restok|kulakan)\b', 'Pembelian Stok', 'expense'),
+    (r'\b(?:listrik|pln|token)\b', 'Listrik', 'expense'),
+    (r'\b(?:gas|elpiji|lpg)\b', 'Gas', 'expense'),
+    (r'\b(?:bensin|bbm|solar|pertalite|pertamax)\b', 'Bensin', 'expense'),
+    (r'\b(?:gaji|gajian|upah|honor)\b', 'Gaji', 'expense'),
+    (r'\b(?:sewa|kontrakan|kontrak)\b', 'Sewa', 'expense'),
+    (r'\b(?:kemasan|plastik|packaging|dus|kardus|cup)\b', 'Kemasan', 'expense'),
+    (r'\b(?:ongkir|ojek|ojol|parkir|transport|transportasi|angkot)\b', 'Transportasi', 'expense'),
+    (r'\b(?:internet|wifi|pulsa|kuota)\b', 'Internet', 'expense'),
+    (r'\b(?:pdam|air\s+bersih)\b', 'Air', 'expense'),
+    (r'\b(?:bahan\s+baku|beras|gula|minyak|tepung|telur|telor|sayur|sayuran|daging|ayam|bumbu|cabai|cabe|bawang)\b', 'Bahan Baku', 'expense'),
+]
+
+DEFAULT_CATEGORIES = {
+    'income': 'Penjualan',
+    'receivable': 'Piutang',
+    'payable': 'Hutang',
+    'expense': 'Pengeluaran',
+}
+
+QUESTION_PATTERN = re.compile(
+    r'\?|\b(?:apa|apakah|bagaimana|gimana|kenapa|mengapa|berapa|kapan|cara|bisakah|tolong\s+jelaskan)\b',
+    re.IGNORECASE
+)
+
+def _parse_number(number: str, has_unit: bool) -> float:
+    """
+    Interpret separators: with a unit "1,5"/"1.5" is a decimal, "1.500" is
+    thousands; without a unit "15.000" / "1,500,000" are thousands separators.
+    """
+    parts = re.split(r'[.,]', number)
+    if len(parts) == 1:
+        return float(number)
+    if has_unit and len(parts) == 2 and len(parts[1]) <= 2:
+        return float(f"{parts[0]}.{parts[1]}")
+    if all(len(part) == 3 for part in parts[1:]):
+        return float(''.join(parts))
+    if len(parts) > 2 and all(len(part) == 3 for part in parts[1:-1]) and len(parts[-1]) <= 2:
+        # "15.000,00" -> thousands separators plus cents
+        return float(f"{''.join(parts[:-1])}.{parts[-1]}")
+    if len(parts) == 2:
+        return float(f"{parts[0]}.{parts[1]}")
+    return float(''.join(parts))
+
+def _match_amount(match) -> Optional[Tuple[float, bool]]:
+    """(amount, explicit) for a money-shaped match, None for small counts like "2 bungkus"."""
+    unit = (match.group('unit') or '').lower()
+    value = _parse_number(match.group('number'), bool(unit))
+    if unit:
+        return value * UNIT_MULTIPLIERS[unit], True
+    if match.group('rp'):
+        return value, True
+    if value >= MIN_BARE_AMOUNT:
+        return value, False
+    return None
+
+def _is_quantity(match) -> bool:
+    """True for unit prices next to a multiplier and for bare numbers followed by a quantity unit."""
+    text = match.string
+    if MULTIPLIER_BEFORE.search(text, 0, match.start()) or MULTIPLIER_AFTER.match(text, match.end()):
+        return True
+    if match.group('unit') or match.group('rp'):
+        return False
+    return bool(QUANTITY_UNIT_AFTER.match(text, match.end()))
+
+def extract_amounts(text: str) -> List[Tuple[float, bool]]:
+    """Return (amount, explicit) pairs; explicit means it had a unit or an Rp prefix."""
+    amounts = []
+    for match in AMOUNT_PATTERN.finditer(text):
+        amount = _match_amount(match)
+        if amount and not _is_quantity(match):
+            amounts.append(amount)
+    return amounts
+
+def has_priced_quantity(text: str) -> bool:
+    """True when a money-shaped number is a unit price or an item count, so the total needs working out."""
+    return any(_match_amount(match) and _is_quantity(match) for match in AMOUNT_PATTERN.finditer(text))
+
+def normalize_amounts(text: str) -> str:
+    """Rewrite money-shaped amounts as plain numbers ("Rp 15.000", "15rb" -> "15000"); small counts are kept."""
+    def canonical(match):
+        amount = _match_amount(match)
+        if not amount:
+            return match.group(0)
+        value = amount[0]
+        return f" {int(value) if value.is_integer() else value} "
+    return AMOUNT_PATTERN.sub(canonical, text)
+
+class RuleBasedParser:
+    """
+    Deterministic parser for simple one-line transactions
+    ("bayar listrik 300 ribu", "jual nasi goreng 15rb").
+
+    Every result carries a `confidence` in [0, 1]; callers only fall back to
+    the LLM when it is below their threshold. Hit/miss counters are kept for
+    monitoring the fast-path ratio.
+    """
+
+    def __init__(self):
+        self._type_patterns = [(re.compile(p, re.IGNORECASE), t) for p, t in TYPE_KEYWORDS]
+        self._category_patterns = [(re.compile(p, re.IGNORECASE), c, t) for p, c, t in CATEGORY_KEYWORDS]
+        self._lock = threading.Lock()
+        self._fast_path_hits = 0
+        self._llm_fallbacks = 0
+
+    def parse(self, user_message: str) -> Dict[str, Any]:
+        text = user_message.strip()
+        amounts = extract_amounts(text)
+
+        if not amounts:
+            return {"error": "Tidak ditemukan jumlah uang", "confidence": 0.0}
+
+        types = {t for pattern, t in self._type_patterns if pattern.search(text)}
+        categories = [(c, t) for pattern, c, t in self._category_patterns if pattern.search(text)]
+
+        confidence = 0.0
+
+        # Transaction type
+        if len(types) == 1:
+            transaction_type = types.pop()
+            confidence += 0.45
+        elif not types:
+            # A category alone can imply the type ("listrik 300rb")
+            implied = {t for _, t in categories if t}
+            if len(implied) == 1:
+                transaction_type = implied.pop()
+                confidence += 0.25
+            else:
+                transaction_type = 'expense'
+                confidence += 0.1
+        else:
+            # Conflicting keywords ("bayar hutang", "jual ... beli ...") need the LLM
+            transaction_type = 'income' if 'income' in types else sorted(types)[0]
+            confidence += 0.05
+
+        # Amount
+        if len(amounts) == 1:
+            confidence += 0.35 if amounts[0][1] else 0.2
+        elif all(explicit for _, explicit in amounts):
+            # Shopping list ("beras 265rb, gula 126rb") is summed into one transaction
+            confidence += 0.25
+        else:
+            confidence += 0.1
+        amount = sum(value for value, _ in amounts)
+
+        # Category
+        matching = [c for c, t in categories if t in (None, transaction_type)]
+        if matching:
+            category = matching[0]
+            confidence += 0.2
+        else:
+            category = DEFAULT_CATEGORIES[transaction_type]
+            confidence += 0.1
+
+        # Questions and long, multi-line messages are the LLM's job
+        if QUESTION_PATTERN.search(text):
+            confidence -= 0.5
+        if '\n' in text or len(text) > 160:
+            confidence -= 0.2
+        # "10rb x 3", "2024 pcs": the amounts found may not be the total
+        if has_priced_quantity(text):
+            confidence -= 0.5
+
+        return {
+            "transaction_type": transaction_type,
+            "amount": int(amount) if float(amount).is_integer() else amount,
+            "category": category,
+            "description": self._describe(text, category, len(amounts)),
+            "confidence": round(max(0.0, min(confidence, 1.0)), 2)
+        }
+
+    @staticmethod
+    def _describe(text: str, category: str, item_count: int) -> str:
+        description = AMOUNT_PATTERN.sub(
+            lambda m: ' ' if _match_amount(m) and not _is_quantity(m) else m.group(0), text
+        )
+        # Separators between digits belong to a kept number ("1.5 kg")
+        description = re.sub(r'(?:[\s;:]|(?<!\d)[.,]|[.,](?!\d))+', ' ', description).strip(' -')
+        if not description:
+            description = f"Transaksi {category.lower()}"
+            if item_count > 1:
+                description += f" ({item_count} item)"
+        return (description[:1].upper() + description[1:])[:100]
+
+    def record(self, fast_path: bool):
+        with self._lock:
+            if fast_path:
+                self._fast_path_hits += 1
+            else:
+                self._llm_fallbacks += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self._fast_path_hits + self._llm_fallbacks
+            return {
+                "messages": total,
+                "fast_path_hits": self._fast_path_hits,
+                "llm_fallbacks": self._llm_fallbacks,
+                "hit_ratio": (self._fast_path_hits / total) if total else 0.0
+            }
+
+rule_parser = RuleBasedParser()
@@ -1,6 +1,7 @@
 from telegram import Update
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 import pytz
 from ..config import settings
@@ -8,7 +9,13 @@ from ..models.user import User
 from ..models.transaction import Transaction, TransactionType
 from ..models.bot_log import BotLog, LogLevel
 from .llm_service import llm_service
+from .rule_parser import rule_parser
+from .aggregation import build_transaction_filters, get_transaction_summary_async
+from .anomaly_registry import anomaly_model_registry
+from .user_stats import user_stats_store
+import asyncio
 import logging
+import time
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -17,9 +24,11 @@ class TelegramBotService:
     def __init__(self, db_session_factory):
         self.db_session_factory = db_session_factory
         self.application = None
+        self._anomaly_preloads = set()
     
-    def get_or_create_user(self, db: Session, telegram_user) -> User:
-        user = db.query(User).filter(User.telegram_id == str(telegram_user.id)).first()
+    async def get_or_create_user(self, db: AsyncSession, telegram_user) -> User:
+        result = await db.execute(select(User).where(User.telegram_id == str(telegram_user.id)))
+        user = result.scalars().first()
         if not user:
             user = User(
                 telegram_id=str(telegram_user.id),
@@ -28,11 +37,64 @@ class TelegramBotService:
                 last_name=telegram_user.last_name
             )
             db.add(user)
-            db.commit()
-            db.refresh(user)
+            await db.commit()
+            await db.refresh(user)
         return user
     
-    def log_interaction(self, db: Session, user_id: int, user_input: str, bot_response: str, level: LogLevel = LogLevel.INFO):
+    def _preload_anomaly_model(self, key: str):
+        """Load the user's anomaly model from disk in the background, for the next transaction."""
+        if key in self._anomaly_preloads:
+            return
+        self._anomaly_preloads.add(key)
+        future = asyncio.get_running_loop().run_in_executor(None, anomaly_model_registry.load, key)
+        future.add_done_callback(lambda _: self._anomaly_preloads.discard(key))
+    
+    def score_transaction(self, transaction: Transaction) -> str:
+        """
+        Set is_anomaly/anomaly_score on a new transaction from the user's cached
+        anomaly model (in-memory only, ~2 ms) and return a warning for the reply.
+        """
+        if not settings.anomaly_inline_scoring:
+            return ""
+        
+        key = anomaly_model_registry.key_for(transaction.user_id)
+        started = time.perf_counter()
+        try:
+            result = anomaly_model_registry.score_new(
+                key,
+                transaction.amount,
+                transaction.transaction_type.value,
+                transaction.category,
+                transaction.transaction_date
+            )
+        except Exception as e:
+            logger.warning(f"Inline anomaly scoring failed for {key}: {e}")
+            return ""
+        
+        if result is None:
+            self._preload_anomaly_model(key)
+            return ""
+        
+        transaction.is_anomaly = 1 if result["is_anomaly"] else 0
+        transaction.anomaly_score = result["anomaly_score"]
+        
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if elapsed_ms > settings.anomaly_inline_budget_ms:
+            logger.warning(f"Inline anomaly scoring took {elapsed_ms:.1f} ms (budget {settings.anomaly_inline_budget_ms} ms)")
+        return result["warning"] or ""
+    
+    @staticmethod
+    def record_stats(transaction: Transaction):
+        """Fold a committed transaction into the user's incremental statistics."""
+        user_stats_store.record_insert(
+            transaction.user_id,
+            transaction.id,
+            transaction.category,
+            transaction.amount,
+            transaction.transaction_date
+        )
+    
+    async def log_interaction(self, db: AsyncSession, user_id: int, user_input: str, bot_response: str, level: LogLevel = LogLevel.INFO):
         log = BotLog(
             user_id=user_id,
             level=level,
@@ -41,12 +103,12 @@ class TelegramBotService:
             bot_response=bot_response
         )
         db.add(log)
-        db.commit()
+        await db.commit()
     
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         db = self.db_session_factory()
         try:
-            user = self.get_or_create_user(db, update.effective_user)
+            user = await self.get_or_create_user(db, update.effective_user)
             
             message = """
 🤖 *Selamat datang di CuanBot!*
@@ -70,14 +132,14 @@ Saya akan membantu mencatat dan melacak keuangan-mu! 💰
 """
             
             await update.message.reply_text(message, parse_mode='Markdown')
-            self.log_interaction(db, user.id, "/start", message)
+            await self.log_interaction(db, user.id, "/start", message)
         finally:
-            db.close()
+            await db.close()
     
     async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         db = self.db_session_factory()
         try:
-            user = self.get_or_create_user(db, update.effective_user)
+            user = await self.get_or_create_user(db, update.effective_user)
             
             message = """
 📚 *Panduan CuanBot*
@@ -101,27 +163,27 @@ Tanyakan apapun tentang akunting, contoh:
 """
             
             await update.message.reply_text(message, parse_mode='Markdown')
-            self.log_interaction(db, user.id, "/help", message)
+            await self.log_interaction(db, user.id, "/help", message)
         finally:
-            db.close()
+            await db.close()
     
     async def summary_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         db = self.db_session_factory()
         try:
-            user = self.get_or_create_user(db, update.effective_user)
+            user = await self.get_or_create_user(db, update.effective_user)
             
-            transactions = db.query(Transaction).filter(Transaction.user_id == user.id).all()
+            totals = await get_transaction_summary_async(db, build_transaction_filters(user_id=user.id))
             
-            if not transactions:
+            if totals["transaction_count"] == 0:
                 message = "Belum ada transaksi yang tercatat. Mulai dengan mencatat transaksi Anda!"
                 await update.message.reply_text(message)
-                self.log_interaction(db, user.id, "/summary", message)
+                await self.log_interaction(db, user.id, "/summary", message)
                 return
             
-            total_income = sum(t.amount for t in transactions if t.transaction_type == TransactionType.INCOME)
-            total_expense = sum(t.amount for t in transactions if t.transaction_type == TransactionType.EXPENSE)
-            total_receivable = sum(t.amount for t in transactions if t.transaction_type == TransactionType.RECEIVABLE)
-            total_payable = sum(t.amount for t in transactions if t.transaction_type == TransactionType.PAYABLE)
+            total_income = totals["total_income"]
+            total_expense = totals["total_expense"]
+            total_receivable = totals["total_receivable"]
+            total_payable = totals["total_payable"]
             
             balance = total_income - total_expense
             
@@ -131,10 +193,10 @@ Tanyakan apapun tentang akunting, contoh:
                 "total_receivable": total_receivable,
                 "total_payable": total_payable,
                 "balance": balance,
-                "transaction_count": len(transactions)
+                "transaction_count": totals["transaction_count"]
             }
             
-            ai_summary = llm_service.generate_summary(trans_data)
+            ai_summary = await llm_service.generate_summary_async(trans_data)
             
             message = f"""
 📊 *Ringkasan Keuangan*
@@ -151,109 +213,128 @@ Tanyakan apapun tentang akunting, contoh:
 """
             
             await update.message.reply_text(message, parse_mode='Markdown')
-            self.log_interaction(db, user.id, "/summary", message)
+            await self.log_interaction(db, user.id, "/summary", message)
         except Exception as e:
             logger.error(f"Error in summary_command: {e}")
             await update.message.reply_text("Maaf, terjadi error saat membuat ringkasan.")
         finally:
-            db.close()
+            await db.close()
     
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         db = self.db_session_factory()
         try:
-            user = self.get_or_create_user(db, update.effective_user)
+            user = await self.get_or_create_user(db, update.effective_user)
             user_message = update.message.text
             
             # Log the incoming message for debugging
             logger.info(f"Processing message from user {user.id}: {user_message[:100]}...")
             
-            # Try parsing as single transaction first
-            parsed = llm_service.parse_transaction(user_message)
-            logger.info(f"Single parsing result: {parsed}")
-            
-            if "error" in parsed:
-                # If single parsing fails, try multiple transaction parsing
-                logger.info("Single parsing failed, trying multiple transaction parsing...")
-                multi_parsed = llm_service.parse_multiple_transactions(user_message)
-                logger.info(f"Multiple parsing result: {multi_parsed}")
+            # Simple one-liners are parsed deterministically; the LLM only sees low-confidence messages
+            parsed = rule_parser.parse(user_message)
+            if parsed.get("confidence", 0) >= settings.fast_parse_min_confidence:
+                rule_parser.record(fast_path=True)
+                logger.info(f"Fast-path parsing result: {parsed}")
+                transactions = [parsed]
+            else:
+                rule_parser.record(fast_path=False)
+                # One structured call classifies the message and returns its payload
+                interpreted = await llm_service.interpret_message_async(user_message)
+                logger.info(f"LLM interpretation: {interpreted}")
                 
-                if "error" in multi_parsed:
-                    logger.info(f"All parsing failed, treating as accounting question")
-                    response = llm_service.answer_accounting_question(user_message)
+                if interpreted["kind"] == "question":
+                    response = interpreted["answer"]
                     await update.message.reply_text(response)
-                    self.log_interaction(db, user.id, user_message, response)
+                    await self.log_interaction(db, user.id, user_message, response)
                     return
-                else:
-                    # Handle multiple transactions
-                    if multi_parsed.get("type") == "single":
-                        parsed = multi_parsed["transaction"]
-                    elif multi_parsed.get("type") == "multiple":
-                        # Process multiple transactions
-                        transactions_created = []
-                        total_amount = 0
-                        
-                        for trans_data in multi_parsed["transactions"]:
-                            try:
-                                transaction_type = TransactionType[trans_data['transaction_type'].upper()]
-                                transaction = Transaction(
-                                    user_id=user.id,
-                                    transaction_type=transaction_type,
-                                    amount=float(trans_data['amount']),
-                                    category=trans_data.get('category', 'Umum'),
-                                    description=trans_data.get('description', ''),
-                                    transaction_date=datetime.now(pytz.timezone('Asia/Jakarta'))
-                                )
-                                db.add(transaction)
-                                transactions_created.append(trans_data)
-                                total_amount += trans_data['amount']
-                            except Exception as e:
-                                logger.error(f"Error creating transaction: {e}")
-                                continue
-                        
-                        if transactions_created:
-                            db.commit()
-                            response = f"""
+                
+                if interpreted["kind"] == "error":
+                    response = "Maaf, pesan tidak dapat dipahami sebagai transaksi. Gunakan /help untuk panduan."
+                    await update.message.reply_text(response)
+                    await self.log_interaction(db, user.id, user_message, response, LogLevel.WARNING)
+                    return
+                
+                transactions = interpreted["transactions"]
+            
+            if len(transactions) > 1:
+                # Process multiple transactions
+                transactions_created = []
+                records = []
+                warnings = []
+                total_amount = 0
+                
+                for trans_data in transactions:
+                    try:
+                        transaction_type = TransactionType[trans_data['transaction_type'].upper()]
+                        transaction = Transaction(
+                            user_id=user.id,
+                            transaction_type=transaction_type,
+                            amount=float(trans_data['amount']),
+                            category=trans_data.get('category', 'Umum'),
+                            description=trans_data.get('description', ''),
+                            transaction_date=datetime.now(pytz.timezone('Asia/Jakarta'))
+                        )
+                        warning = self.score_transaction(transaction)
+                        db.add(transaction)
+                        transactions_created.append(trans_data)
+                        records.append(transaction)
+                        total_amount += trans_data['amount']
+                        if warning:
+                            warnings.append(warning)
+                    except Exception as e:
+                        logger.error(f"Error creating transaction: {e}")
+                        continue
+                
+                if transactions_created:
+                    await db.commit()
+                    for transaction in records:
+                        self.record_stats(transaction)
+                    response = f"""
 ✅ *{len(transactions_created)} Transaksi berhasil dicatat!*
 
 💰 Total: Rp {total_amount:,.0f}
 
 📋 Detail:
 """
-                            for i, trans in enumerate(transactions_created, 1):
-                                response += f"• {i}. {trans['transaction_type'].title()}: Rp {trans['amount']:,.0f} - {trans.get('description', '')}\n"
-                            
-                            await update.message.reply_text(response, parse_mode='Markdown')
-                            self.log_interaction(db, user.id, user_message, response)
-                            logger.info(f"{len(transactions_created)} transactions successfully recorded for user {user.id}")
-                            return
-                        else:
-                            await update.message.reply_text("Maaf, tidak ada transaksi yang berhasil diproses.")
-                            return
+                    for i, trans in enumerate(transactions_created, 1):
+                        response += f"• {i}. {trans['transaction_type'].title()}: Rp {trans['amount']:,.0f} - {trans.get('description', '')}\n"
+                    if warnings:
+                        response += "\n" + "\n".join(warnings) + "\n"
+                    
+                    await update.message.reply_text(response, parse_mode='Markdown')
+                    await self.log_interaction(db, user.id, user_message, response)
+                    logger.info(f"{len(transactions_created)} transactions successfully recorded for user {user.id}")
+                else:
+                    await update.message.reply_text("Maaf, tidak ada transaksi yang berhasil diproses.")
+                return
             
             # Handle single transaction
-            if "error" not in parsed:
-                # Validate transaction type
-                try:
-                    transaction_type = TransactionType[parsed['transaction_type'].upper()]
-                except KeyError:
-                    logger.error(f"Invalid transaction type: {parsed['transaction_type']}")
-                    await update.message.reply_text("Maaf, tipe transaksi tidak valid. Gunakan /help untuk panduan.")
-                    return
-                
-                transaction = Transaction(
-                    user_id=user.id,
-                    transaction_type=transaction_type,
-                    amount=float(parsed['amount']),
-                    category=parsed.get('category', 'Umum'),
-                    description=parsed.get('description', ''),
-                    transaction_date=datetime.now(pytz.timezone('Asia/Jakarta'))
-                )
-                
-                db.add(transaction)
-                db.commit()
-                db.refresh(transaction)
-                
-                response = f"""
+            parsed = transactions[0]
+            
+            # Validate transaction type
+            try:
+                transaction_type = TransactionType[parsed['transaction_type'].upper()]
+            except KeyError:
+                logger.error(f"Invalid transaction type: {parsed['transaction_type']}")
+                await update.message.reply_text("Maaf, tipe transaksi tidak valid. Gunakan /help untuk panduan.")
+                return
+            
+            transaction = Transaction(
+                user_id=user.id,
+                transaction_type=transaction_type,
+                amount=float(parsed['amount']),
+                category=parsed.get('category', 'Umum'),
+                description=parsed.get('description', ''),
+                transaction_date=datetime.now(pytz.timezone('Asia/Jakarta'))
+            )
+            
+            # Scored before the commit so is_anomaly/anomaly_score are saved with the row
+            warning = self.score_transaction(transaction)
+            db.add(transaction)
+            await db.commit()
+            await db.refresh(transaction)
+            self.record_stats(transaction)
+            
+            response = f"""
 ✅ *Transaksi berhasil dicatat!*
 
 📋 Detail:
@@ -262,10 +343,12 @@ Tanyakan apapun tentang akunting, contoh:
 • Kategori: {parsed.get('category', 'Umum')}
 • Deskripsi: {parsed.get('description', '-')}
 """
-                
-                await update.message.reply_text(response, parse_mode='Markdown')
-                self.log_interaction(db, user.id, user_message, response)
-                logger.info(f"Transaction successfully recorded for user {user.id}")
+            if warning:
+                response += f"\n{warning}\n"
+            
+            await update.message.reply_text(response, parse_mode='Markdown')
+            await self.log_interaction(db, user.id, user_message, response)
+            logger.info(f"Transaction successfully recorded for user {user.id}")
             
         except Exception as e:
             logger.error(f"Error handling message: {e}", exc_info=True)
@@ -279,9 +362,9 @@ Tanyakan apapun tentang akunting, contoh:
                 error_msg = "Maaf, terjadi error. Coba lagi atau gunakan /help untuk bantuan."
             
             await update.message.reply_text(error_msg)
-            self.log_interaction(db, user.id, user_message, f"Error: {str(e)}", LogLevel.ERROR)
+            await self.log_interaction(db, user.id, user_message, f"Error: {str(e)}", LogLevel.ERROR)
         finally:
-            db.close()
+            await db.close()
     
     def setup_handlers(self):
         self.application.add_handler(CommandHandler("start", self.start_command))
@@ -290,7 +373,8 @@ Tanyakan apapun tentang akunting, contoh:
         self.application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_message))
     
     async def initialize(self):
-        self.application = Application.builder().token(settings.telegram_bot_token).build()
+        # Updates are handled concurrently; handlers never block the event loop
+        self.application = Application.builder().token(settings.telegram_bot_token).concurrent_updates(True).build()
         self.setup_handlers()
         await self.application.initialize()
         await self.application.start()
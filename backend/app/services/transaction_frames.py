@@ -0,0 +1,56 @@
+from typing import Any, Sequence
+import pandas as pd
+from sqlalchemy import String, select, type_coerce
+from sqlalchemy.orm import Session
+from ..models.transaction import Transaction, TransactionType
+from .aggregation import build_transaction_filters
+
+# Columns the ML services read; callers project a subset
+TRANSACTION_COLUMNS = ("id", "transaction_type", "amount", "transaction_date", "category", "description")
+
+# Stored enum names (and values, for rows written as values) -> the values the services compare against
+_TRANSACTION_TYPE_VALUES = {
+    **{t.name: t.value for t in TransactionType},
+    **{t.value: t.value for t in TransactionType}
+}
+
+def transactions_query(columns: Sequence[str] = TRANSACTION_COLUMNS, **filters: Any):
+    """SELECT of only `columns`, filtered like listings (see build_transaction_filters)."""
+    selected = []
+    for name in columns:
+        column = getattr(Transaction, name)
+        if name == "transaction_type":
+            # Raw string instead of an Enum object per row; mapped column-wise afterwards
+            column = type_coerce(column, String)
+        selected.append(column.label(name))
+    
+    return (
+        select(*selected)
+        .where(*build_transaction_filters(**filters))
+        .order_by(Transaction.id)
+        .execution_options(stream_results=True)
+    )
+
+def load_transactions_frame(
+    db: Session,
+    columns: Sequence[str] = TRANSACTION_COLUMNS,
+    chunksize: int = 50000,
+    **filters: Any
+) -> pd.DataFrame:
+    """
+    Stream the selected transaction columns straight into a DataFrame.
+
+    Rows are fetched `chunksize` at a time through a server-side cursor
+    (stream_results) with pd.read_sql, so no ORM objects or per-row dicts
+    are built. `transaction_type` holds the enum values ("income", ...).
+    """
+    chunks = pd.read_sql(
+        transactions_query(columns, **filters),
+        db.connection(),
+        chunksize=chunksize
+    )
+    df = pd.concat(chunks, ignore_index=True)
+    
+    if "transaction_type" in df.columns:
+        df["transaction_type"] = df["transaction_type"].map(_TRANSACTION_TYPE_VALUES)
+    return df
@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Update keys whose payload carries the chat the update belongs to
+_CHAT_KEYS = ("message", "edited_message", "channel_post", "edited_channel_post", "my_chat_member", "chat_member", "chat_join_request")
+
+def chat_key(update_data: Dict[str, Any]) -> Any:
+    """Chat id used to keep updates of one chat in order (falls back to the sender or update_id)."""
+    for key in _CHAT_KEYS:
+        chat = (update_data.get(key) or {}).get("chat")
+        if chat and "id" in chat:
+            return chat["id"]
+
+    callback = update_data.get("callback_query") or {}
+    chat = (callback.get("message") or {}).get("chat")
+    if chat and "id" in chat:
+        return chat["id"]
+
+    for key in ("callback_query", "inline_query", "chosen_inline_result", "shipping_query", "pre_checkout_query"):
+        sender = (update_data.get(key) or {}).get("from")
+        if sender and "id" in sender:
+            return sender["id"]
+
+    return update_data.get("update_id")
+
+class UpdateQueue:
+    """
+    Bounded in-process queue between the Telegram webhook and the bot.
+
+    Updates are sharded by chat onto a fixed pool of workers, so a chat's
+    updates are processed in arrival order while different chats run in
+    parallel. A full shard rejects the update (the webhook answers 503 and
+    Telegram redelivers later); repeated update_ids are dropped.
+    """
+
+    ACCEPTED = "accepted"
+    DUPLICATE = "duplicate"
+    REJECTED = "rejected"
+
+    def __init__(
+        self,
+        handler: Callable[[Dict[str, Any]], Awaitable[Any]],
+        workers: int = 4,
+        maxsize: int = 1000,
+        dedup_window: int = 10000
+    ):
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.maxsize = max(self.workers, maxsize)
+        self.dedup_window = dedup_window
+
+        self._queues: List[asyncio.Queue] = []
+        self._tasks: List[asyncio.Task] = []
+        self._seen: "OrderedDict[int, None]" = OrderedDict()
+        self._accepting = False
+
+        self._counters = {
+            "received": 0,
+            "accepted": 0,
+            "duplicates": 0,
+            "rejected": 0,
+            "processed": 0,
+            "failed": 0
+        }
+        self._high_water_mark = 0
+        self._total_latency = 0.0
+
+    async def start(self):
+        shard_size = -(-self.maxsize // self.workers)
+        self._queues = [asyncio.Queue(maxsize=shard_size) for _ in range(self.workers)]
+        self._tasks = [
+            asyncio.create_task(self._worker(queue), name=f"update-worker-{i}")
+            for i, queue in enumerate(self._queues)
+        ]
+        self._accepting = True
+        logger.info(f"Update queue started with {self.workers} workers, capacity {self.maxsize}")
+
+    def submit(self, update_data: Dict[str, Any]) -> str:
+        """Enqueue an update without waiting; returns ACCEPTED, DUPLICATE or REJECTED."""
+        self._counters["received"] += 1
+        update_id = update_data.get("update_id")
+
+        if update_id in self._seen:
+            self._counters["duplicates"] += 1
+            return self.DUPLICATE
+
+        if not self._accepting:
+            self._counters["rejected"] += 1
+            return self.REJECTED
+
+        queue = self._queues[hash(chat_key(update_data)) % self.workers]
+        try:
+            queue.put_nowait((time.perf_counter(), update_data))
+        except asyncio.QueueFull:
+            self._counters["rejected"] += 1
+            return self.REJECTED
+
+        self._seen[update_id] = None
+        if len(self._seen) > self.dedup_window:
+            self._seen.popitem(last=False)
+
+        self._counters["accepted"] += 1
+        self._high_water_mark = max(self._high_water_mark, self.depth())
+        return self.ACCEPTED
+
+    async def _worker(self, queue: asyncio.Queue):
+        while True:
+            enqueued_at, update_data = await queue.get()
+            try:
+                await self.handler(update_data)
+                self._counters["processed"] += 1
+            except Exception as e:
+                self._counters["failed"] += 1
+                logger.error(f"Error processing update {update_data.get('update_id')}: {e}", exc_info=True)
+            finally:
+                self._total_latency += time.perf_counter() - enqueued_at
+                queue.task_done()
+
+    async def stop(self, timeout: float = 10.0):
+        """Stop accepting updates, drain what is queued (up to `timeout`) and stop the workers."""
+        self._accepting = False
+        try:
+            await asyncio.wait_for(asyncio.gather(*(queue.join() for queue in self._queues)), timeout)
+            logger.info("Update queue drained")
+        except asyncio.TimeoutError:
+            logger.warning(f"Update queue drain timed out with {self.depth()} updates left")
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def depth(self) -> int:
+        return sum(queue.qsize() for queue in self._queues)
+
+    def metrics(self) -> Dict[str, Any]:
+        completed = self._counters["processed"] + self._counters["failed"]
+        return {
+            **self._counters,
+            "accepting": self._accepting,
+            "workers": self.workers,
+            "capacity": self.maxsize,
+            "depth": self.depth(),
+            "depth_per_worker": [queue.qsize() for queue in self._queues],
+            "high_water_mark": self._high_water_mark,
+            "avg_latency_ms": (self._total_latency / completed * 1000) if completed else 0.0
+        }
@@ -0,0 +1,149 @@
+import math
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import pytz
+from sqlalchemy.orm import Session
+from ..models.transaction import Transaction
+
+JAKARTA_TZ = pytz.timezone('Asia/Jakarta')
+
+def jakarta_hour(dt: datetime) -> int:
+    """Hour in Asia/Jakarta; naive datetimes are taken as UTC (as in the anomaly service)."""
+    if dt.tzinfo is None:
+        dt = pytz.utc.localize(dt)
+    return dt.astimezone(JAKARTA_TZ).hour
+
+class RunningStats:
+    """Welford's online mean/variance."""
+    __slots__ = ("count", "mean", "m2")
+    
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+    
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+    
+    @property
+    def std(self) -> float:
+        """Sample standard deviation (ddof=1, NaN below two values, like pandas)."""
+        if self.count < 2:
+            return math.nan
+        return math.sqrt(self.m2 / (self.count - 1))
+
+class UserStats:
+    """One user's per-category running amount statistics and 24-bucket Jakarta hour histogram."""
+    
+    def __init__(self):
+        self.categories: Dict[str, RunningStats] = {}
+        self.hours: List[int] = [0] * 24
+        self.total = 0
+        # Highest transaction id included, so inserts already in the bootstrap are not counted twice
+        self.max_id = 0
+    
+    def add(self, category: Optional[str], amount: float, transaction_date: datetime):
+        self.total += 1
+        self.hours[jakarta_hour(transaction_date)] += 1
+        if category is not None:
+            self.categories.setdefault(category, RunningStats()).add(amount)
+    
+    def hour_distribution(self) -> Dict[int, float]:
+        return {hour: count / self.total for hour, count in enumerate(self.hours) if count}
+    
+    def category_counts(self) -> Dict[str, int]:
+        """Transactions per category, most frequent first (like value_counts)."""
+        return {
+            category: stats.count
+            for category, stats in sorted(self.categories.items(), key=lambda item: -item[1].count)
+        }
+    
+    def category_frame(self):
+        """mean/std/count per category, shaped like groupby('category')['amount'].agg(...)."""
+        import pandas as pd
+        
+        return pd.DataFrame(
+            {
+                'mean': [stats.mean for stats in self.categories.values()],
+                'std': [stats.std for stats in self.categories.values()],
+                'count': [stats.count for stats in self.categories.values()]
+            },
+            index=pd.Index(list(self.categories), name='category')
+        )
+
+class UserStatsStore:
+    """
+    In-memory UserStats per user. A user is bootstrapped with one streaming
+    pass over their transactions on first read; after that inserts update
+    it in O(1), so readers get O(categories) data instead of rescanning
+    history. Deletes and other bulk changes must call invalidate(). Writes
+    that race a bootstrap discard its result (the next read bootstraps again).
+    """
+    
+    def __init__(self, batch_size: int = 5000):
+        self.batch_size = batch_size
+        self._users: Dict[int, UserStats] = {}
+        self._writes: Dict[int, int] = {}
+        self._lock = threading.Lock()
+    
+    def get(self, db: Session, user_id: int) -> UserStats:
+        with self._lock:
+            stats = self._users.get(user_id)
+            if stats is not None:
+                return stats
+            writes_before = self._writes.get(user_id, 0)
+        
+        stats = self._bootstrap(db, user_id)
+        
+        with self._lock:
+            if user_id in self._users:
+                return self._users[user_id]
+            if self._writes.get(user_id, 0) == writes_before:
+                self._users[user_id] = stats
+        return stats
+    
+    def _bootstrap(self, db: Session, user_id: int) -> UserStats:
+        stats = UserStats()
+        rows = (
+            db.query(Transaction.id, Transaction.category, Transaction.amount, Transaction.transaction_date)
+            .filter(Transaction.user_id == user_id)
+            .order_by(Transaction.id)
+            .yield_per(self.batch_size)
+        )
+        for row in rows:
+            stats.add(row.category, row.amount, row.transaction_date)
+            stats.max_id = row.id
+        return stats
+    
+    def record_insert(self, user_id: int, transaction_id: int, category: Optional[str], amount: float, transaction_date: datetime):
+        """Call after the insert is committed."""
+        with self._lock:
+            self._writes[user_id] = self._writes.get(user_id, 0) + 1
+            stats = self._users.get(user_id)
+            if stats is not None and transaction_id > stats.max_id:
+                stats.add(category, amount, transaction_date)
+                stats.max_id = transaction_id
+    
+    def invalidate(self, user_id: Optional[int] = None):
+        """Forget one user (or everyone) after deletes or bulk changes; the next read bootstraps again."""
+        with self._lock:
+            if user_id is None:
+                for key in set(self._users) | set(self._writes):
+                    self._writes[key] = self._writes.get(key, 0) + 1
+                self._users.clear()
+            else:
+                self._writes[user_id] = self._writes.get(user_id, 0) + 1
+                self._users.pop(user_id, None)
+    
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "users": len(self._users),
+                "transactions": sum(stats.total for stats in self._users.values())
+            }
+
+user_stats_store = UserStatsStore()
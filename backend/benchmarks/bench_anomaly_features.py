@@ -0,0 +1,112 @@
+"""
+Feature-engineering benchmark for AnomalyDetectionService.
+
+Compares the original per-row (`iterrows` + pytz) construction of the
+Isolation Forest feature matrix and hour pattern against the vectorized
+`_analyze_business_pattern` + `_build_features`, on synthetic merchants of
+10k, 100k and 1M transactions, and checks that both produce identical
+output. The legacy path is very slow at 1M rows; cap it with
+`--legacy-max`.
+
+Usage (from backend/):
+    python -m benchmarks.bench_anomaly_features --sizes 10000 100000 1000000
+"""
+import argparse
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import pytz
+
+from app.services.ml_anomaly import AnomalyDetectionService
+
+CATEGORIES = ["Penjualan", "Bahan Baku", "Gas", "Listrik", "Gaji", "Modal", "Kemasan", None]
+TYPES = ["income", "expense", "expense", "expense", "expense", "income", "expense", "expense"]
+
+def synthetic_transactions(n: int, seed: int = 42):
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2025-01-01", tz="UTC")
+    # Business hours in Jakarta (UTC+7) with a tail of odd-hour transactions
+    offsets = rng.integers(0, 365 * 24 * 3600, n)
+    dates = (start + pd.to_timedelta(offsets, unit="s")).to_pydatetime()
+    picks = rng.integers(0, len(CATEGORIES), n)
+    amounts = rng.lognormal(11, 1, n).round(-2)
+    return [
+        {
+            "id": i + 1,
+            "transaction_type": TYPES[picks[i]],
+            "amount": float(amounts[i]),
+            "transaction_date": dates[i],
+            "category": CATEGORIES[picks[i]],
+            "description": ""
+        }
+        for i in range(n)
+    ]
+
+def _legacy_jakarta(dt):
+    if dt.tzinfo is None:
+        dt = pytz.utc.localize(dt)
+    return dt.astimezone(pytz.timezone("Asia/Jakarta"))
+
+def legacy_hour_distribution(df: pd.DataFrame):
+    hours = []
+    for _, row in df.iterrows():
+        hours.append(_legacy_jakarta(row["transaction_date"]).hour)
+    counts = Counter(hours)
+    return {hour: count / len(hours) for hour, count in counts.items()}
+
+def legacy_features(df: pd.DataFrame, hour_distribution) -> np.ndarray:
+    category_stats = df.groupby("category")["amount"].agg(["mean", "std", "count"]).to_dict("index")
+    features_list = []
+    for _, row in df.iterrows():
+        jakarta_dt = _legacy_jakarta(row["transaction_date"])
+        hour = jakarta_dt.hour
+        cat_stats = category_stats.get(row["category"], {"mean": 0, "std": 1, "count": 1})
+        hour_deviation = 1.0 - hour_distribution[hour] if hour in hour_distribution else 1.0
+        features_list.append([
+            row["amount"],
+            hour,
+            jakarta_dt.weekday(),
+            1 if row["transaction_type"] == "expense" else 0,
+            row["amount"] / (cat_stats["mean"] + 1),
+            cat_stats["count"],
+            hour_deviation,
+        ])
+    return np.array(features_list)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--legacy-max", type=int, default=1_000_000, help="skip the per-row path above this size")
+    args = parser.parse_args()
+
+    service = AnomalyDetectionService()
+    print(f"{'rows':>10} {'legacy':>10} {'vectorized':>11} {'speedup':>8}  identical")
+
+    for n in args.sizes:
+        df = pd.DataFrame(synthetic_transactions(n))
+        df["transaction_date"] = pd.to_datetime(df["transaction_date"])
+
+        started = time.perf_counter()
+        pattern = service._analyze_business_pattern(df)
+        X = service._build_features(df, pattern["hour_pattern"]["hour_distribution"])
+        vectorized = time.perf_counter() - started
+
+        if n > args.legacy_max:
+            print(f"{n:>10} {'skipped':>10} {vectorized:>10.2f}s {'-':>8}  -")
+            continue
+
+        started = time.perf_counter()
+        hour_distribution = legacy_hour_distribution(df)
+        X_legacy = legacy_features(df, hour_distribution)
+        legacy = time.perf_counter() - started
+
+        identical = (
+            np.array_equal(X, X_legacy)
+            and list(hour_distribution.items()) == list(pattern["hour_pattern"]["hour_distribution"].items())
+        )
+        print(f"{n:>10} {legacy:>9.2f}s {vectorized:>10.2f}s {legacy / vectorized:>7.0f}x  {identical}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Duplicate and capital-burst detection benchmark.
+
+Times `_detect_duplicates` (sort + groupby diff) and
+`_detect_frequent_capital` (searchsorted ±3-day window) against the
+original row-by-row versions. Duplicates are a superset of the old result
+(any pair within the hour, not just time-adjacent rows); capital bursts
+must be identical. The legacy versions are quadratic; cap them with
+`--legacy-max`.
+
+Usage (from backend/):
+    python -m benchmarks.bench_anomaly_windows --sizes 10000 100000 1000000 --legacy-max 20000
+"""
+import argparse
+import time
+from datetime import timedelta
+
+import pandas as pd
+
+from app.services.ml_anomaly import AnomalyDetectionService
+from benchmarks.bench_anomaly_features import synthetic_transactions
+
+def legacy_duplicates(df: pd.DataFrame):
+    duplicates = []
+    df_sorted = df.sort_values("transaction_date")
+    for i in range(len(df_sorted) - 1):
+        current = df_sorted.iloc[i]
+        next_row = df_sorted.iloc[i + 1]
+        if (current["amount"] == next_row["amount"] and
+            current["category"] == next_row["category"] and
+            abs((next_row["transaction_date"] - current["transaction_date"]).total_seconds()) < 3600):
+            duplicates.extend([current["id"], next_row["id"]])
+    return list(set(duplicates))
+
+def legacy_frequent_capital(df: pd.DataFrame):
+    capital = df[
+        (df["transaction_type"] == "income") &
+        (df["category"].str.contains("modal|setoran", case=False, na=False))
+    ].sort_values("transaction_date")
+    if len(capital) < 2:
+        return {}
+    frequent = {}
+    for i in range(len(capital)):
+        current_date = capital.iloc[i]["transaction_date"]
+        count = len(capital[
+            (capital["transaction_date"] >= current_date - timedelta(days=3)) &
+            (capital["transaction_date"] <= current_date + timedelta(days=3))
+        ])
+        if count >= 3:
+            frequent[capital.iloc[i]["id"]] = count
+            frequent["days"] = 6
+    return frequent
+
+def with_duplicates(transactions, every: int = 50):
+    """Copy every `every`-th transaction onto the next id so duplicates exist."""
+    for i in range(0, len(transactions) - 1, every):
+        transactions[i + 1] = dict(transactions[i], id=transactions[i + 1]["id"])
+    return transactions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--legacy-max", type=int, default=20_000, help="skip the row-by-row path above this size")
+    args = parser.parse_args()
+
+    service = AnomalyDetectionService()
+    print(f"{'rows':>10} {'legacy':>10} {'windowed':>10} {'dups old/new':>14} {'capital':>8}  check")
+
+    for n in args.sizes:
+        df = pd.DataFrame(with_duplicates(synthetic_transactions(n)))
+        df["transaction_date"] = pd.to_datetime(df["transaction_date"])
+
+        started = time.perf_counter()
+        duplicates = set(service._detect_duplicates(df))
+        capital = service._detect_frequent_capital(df)
+        windowed = time.perf_counter() - started
+
+        if n > args.legacy_max:
+            print(f"{n:>10} {'skipped':>10} {windowed:>9.2f}s {'- / ' + str(len(duplicates)):>14} {len(capital):>8}  -")
+            continue
+
+        started = time.perf_counter()
+        old_duplicates = set(legacy_duplicates(df))
+        old_capital = legacy_frequent_capital(df)
+        legacy = time.perf_counter() - started
+
+        check = old_duplicates <= duplicates and old_capital == capital
+        print(f"{n:>10} {legacy:>9.2f}s {windowed:>9.2f}s {f'{len(old_duplicates)} / {len(duplicates)}':>14} {len(capital):>8}  {check}")
+
+if __name__ == "__main__":
+    main()
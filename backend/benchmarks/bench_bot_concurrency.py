@@ -0,0 +1,130 @@
+"""
+Load test for concurrent Telegram chats.
+
+Drives N simultaneous chats through TelegramBotService.handle_message
+against the configured database, with Gemini replaced by a fake model
+that answers after a fixed latency (plus jitter). The LLM response cache
+is turned off, otherwise every chat after the first would be answered from
+it. With the async path the wall time should be close to the slowest chat,
+not the sum of all chats. `--blocking` simulates the old behaviour (sync
+LLM call on the event loop).
+
+Usage (from backend/):
+    python -m benchmarks.bench_bot_concurrency --chats 20 --llm-latency 1.0
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from types import SimpleNamespace
+
+from sqlalchemy import delete, select
+
+from app.database import AsyncSessionLocal, Base, engine
+from app.models import User, Transaction, BotLog
+from app.services.llm_service import llm_service
+from app.services.telegram_bot import TelegramBotService
+
+TELEGRAM_ID_OFFSET = 9_000_000_000
+
+# Amount written in words, so the rule-based fast path defers to the LLM
+LLM_MESSAGE = "Bayar tagihan listrik bulan ini tiga ratus ribu"
+
+class FakeGeminiModel:
+    """Answers every prompt with a fixed transaction after `latency` seconds."""
+
+    def __init__(self, latency: float, jitter: float, blocking: bool):
+        self.latency = latency
+        self.jitter = jitter
+        self.blocking = blocking
+
+    def _response(self):
+        return SimpleNamespace(text=json.dumps({
+            "kind": "single",
+            "transactions": [{
+                "transaction_type": "expense",
+                "amount": 300000,
+                "category": "Listrik",
+                "description": "Bayar listrik"
+            }]
+        }))
+
+    def _delay(self) -> float:
+        return self.latency + random.uniform(0, self.jitter)
+
+    def generate_content(self, prompt, generation_config=None):
+        time.sleep(self._delay())
+        return self._response()
+
+    async def generate_content_async(self, prompt, generation_config=None):
+        if self.blocking:
+            # What a synchronous SDK call does when invoked from a coroutine
+            time.sleep(self._delay())
+        else:
+            await asyncio.sleep(self._delay())
+        return self._response()
+
+def fake_update(chat_index: int, text: str, latencies: list):
+    async def reply_text(message, **kwargs):
+        latencies.append(time.perf_counter() - started)
+
+    user = SimpleNamespace(
+        id=TELEGRAM_ID_OFFSET + chat_index,
+        username=f"bench_{chat_index}",
+        first_name="Bench",
+        last_name=str(chat_index)
+    )
+    started = time.perf_counter()
+    return SimpleNamespace(effective_user=user, message=SimpleNamespace(text=text, reply_text=reply_text))
+
+async def cleanup():
+    async with AsyncSessionLocal() as db:
+        user_ids = select(User.id).where(User.telegram_id.like(f"{TELEGRAM_ID_OFFSET // 1000}%"))
+        await db.execute(delete(Transaction).where(Transaction.user_id.in_(user_ids)))
+        await db.execute(delete(BotLog).where(BotLog.user_id.in_(user_ids)))
+        await db.execute(delete(User).where(User.id.in_(user_ids)))
+        await db.commit()
+
+async def run(chats: int) -> dict:
+    service = TelegramBotService(AsyncSessionLocal)
+    latencies = []
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        service.handle_message(fake_update(i, LLM_MESSAGE, latencies), None)
+        for i in range(chats)
+    ))
+    return {"wall": time.perf_counter() - started, "latencies": latencies}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=1.0, help="Seconds per fake Gemini call")
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--blocking", action="store_true", help="Simulate a blocking LLM call on the event loop")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    llm_service.model = FakeGeminiModel(args.llm_latency, args.jitter, args.blocking)
+    # Every chat sends the same message; each one must reach the model
+    llm_service.cache = None
+
+    async def bench():
+        await cleanup()
+        try:
+            return await run(args.chats)
+        finally:
+            await cleanup()
+
+    result = asyncio.run(bench())
+    latencies = sorted(result["latencies"])
+
+    mode = "blocking" if args.blocking else "async"
+    print(f"mode={mode} chats={args.chats} llm_latency={args.llm_latency}s")
+    print(f"wall time:          {result['wall']:.2f}s")
+    print(f"slowest chat:       {latencies[-1]:.2f}s")
+    print(f"sum of chat times:  {sum(latencies):.2f}s")
+    print(f"wall / llm latency: {result['wall'] / args.llm_latency:.2f}x (async ~1x, blocking ~{args.chats}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Forecast payload benchmark: record-style vs columnar responses.
+
+Fits the seasonal engine on synthetic histories, then compares the JSON
+size and `json.dumps` time of the records layout (actual/forecast/
+chart_data) with the columnar one (dates/actual/yhat/lower/upper).
+
+Usage (from backend/):
+    python -m benchmarks.bench_forecast_payload --history 90 365 730 --horizon 30 365
+"""
+import argparse
+import json
+import time
+
+from app.services.forecasters import ENGINES
+from app.services.ml_forecasting import ForecastingService, to_records
+from benchmarks.bench_forecast_engines import synthetic_series
+
+def dumps_ms(payload, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        json.dumps(payload)
+    return (time.perf_counter() - started) / repeat * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--history", type=int, nargs="+", default=[90, 365, 730])
+    parser.add_argument("--horizon", type=int, nargs="+", default=[30, 365])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    service = ForecastingService()
+    print(f"{'days':>5} {'horizon':>7} {'records KB':>10} {'columnar KB':>11} {'size':>6} {'records ms':>10} {'columnar ms':>11} {'speed':>6}")
+    for days in args.history:
+        df = synthetic_series(days, seed=days)
+        for horizon in args.horizon:
+            columnar = service.fit_forecast(df, horizon, ENGINES["seasonal"])
+            records = to_records(columnar)
+            records_kb, columnar_kb = len(json.dumps(records)) / 1024, len(json.dumps(columnar)) / 1024
+            records_ms, columnar_ms = dumps_ms(records, args.repeat), dumps_ms(columnar, args.repeat)
+            print(
+                f"{days:>5} {horizon:>7} {records_kb:>10.1f} {columnar_kb:>11.1f} {records_kb / columnar_kb:>5.1f}x"
+                f" {records_ms:>10.2f} {columnar_ms:>11.2f} {records_ms / columnar_ms:>5.1f}x"
+            )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Startup import-cost benchmark.
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter and
+reports the wall time plus the most expensive imports, both per module and
+aggregated per top-level package. Heavy services (Gemini SDK, Prophet,
+scikit-learn) should not show up for `app.main`; pass `--module
+app.services.ml_forecasting` etc. to see what loading them on first use
+costs.
+
+Usage (from backend/, with the usual environment variables set):
+    python -m benchmarks.bench_import_time --module app.main --top 15 --runs 3
+"""
+import argparse
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+# "import time:       self [us] |  cumulative | imported package"
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$')
+
+def measure(module: str) -> Tuple[float, List[Tuple[str, int, int, int]]]:
+    """Wall seconds and (module, self_us, cumulative_us, depth) rows for one cold import."""
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True
+    )
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        sys.exit(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((name, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return wall, rows
+
+def by_package(rows: List[Tuple[str, int, int, int]]) -> Dict[str, int]:
+    """Self time summed per top-level package."""
+    totals: Dict[str, int] = defaultdict(int)
+    for name, self_us, _, _ in rows:
+        totals[name.split(".")[0]] += self_us
+    return totals
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(max(1, args.runs))]
+    walls = [wall for wall, _ in runs]
+    # The fastest run has the warmest OS file cache; use it for the breakdown
+    _, rows = min(runs, key=lambda run: run[0])
+
+    print(f"module={args.module} runs={len(runs)}")
+    print(f"wall time:  min {min(walls):.2f}s  max {max(walls):.2f}s")
+    print(f"imports:    {len(rows)} modules, {sum(r[1] for r in rows) / 1e6:.2f}s self time")
+
+    print(f"\nTop {args.top} packages (self time):")
+    for package, self_us in sorted(by_package(rows).items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {self_us / 1000:9.1f} ms  {package}")
+
+    print(f"\nTop {args.top} modules (cumulative):")
+    for name, _, cumulative_us, depth in sorted(rows, key=lambda row: -row[2])[:args.top]:
+        print(f"  {cumulative_us / 1000:9.1f} ms  {'  ' * depth}{name}")
+
+    heavy = [name for name in ("google.generativeai", "prophet", "sklearn", "pandas") if any(r[0] == name for r in rows)]
+    print(f"\nHeavy packages imported: {', '.join(heavy) if heavy else 'none'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+PDF export benchmark.
+
+Seeds N rows into a scratch SQLite database for each size given, calls
+`export_pdf` and reads the whole streamed response. Reports wall time,
+peak Python memory (tracemalloc), page count and output size; peak memory
+should stay roughly flat as the row count grows.
+
+Usage (from backend/):
+    python -m benchmarks.bench_pdf_export --rows 1000 10000 50000
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import tracemalloc
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.api.reports import export_pdf
+from benchmarks.bench_transaction_loader import seed
+
+async def read_body(response) -> bytes:
+    chunks = []
+    async for chunk in response.body_iterator:
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+def export(make_session) -> bytes:
+    db = make_session()
+    try:
+        return asyncio.run(read_body(export_pdf(db=db)))
+    finally:
+        db.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 50000])
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+            seed(engine, rows)
+            make_session = sessionmaker(bind=engine)
+
+            started = time.perf_counter()
+            pdf = export(make_session)
+            elapsed = time.perf_counter() - started
+
+            tracemalloc.start()
+            export(make_session)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            pages = pdf.count(b"/Type /Page\n")
+            print(f"rows {rows:>8}   {elapsed:8.2f} s   peak {peak / 2**20:7.1f} MiB   "
+                  f"pages {pages:>6}   {len(pdf) / 2**20:6.1f} MiB")
+            engine.dispose()
+
+if __name__ == "__main__":
+    main()
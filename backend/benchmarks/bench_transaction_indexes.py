@@ -0,0 +1,138 @@
+"""
+Query plan benchmark for the transactions indexes (migration 0002).
+
+Seeds a scratch copy of the transactions table with N rows (default 1M),
+runs EXPLAIN ANALYZE on the hot queries without indexes, creates the
+composite + trigram indexes and runs them again.
+
+Usage (from backend/, PostgreSQL only):
+    python -m benchmarks.bench_transaction_indexes --rows 1000000
+"""
+import argparse
+import re
+import time
+
+from sqlalchemy import create_engine, text
+
+BENCH_TABLE = "bench_transactions"
+
+HOT_QUERIES = {
+    "list_by_user": f"""
+        SELECT * FROM {BENCH_TABLE}
+        WHERE user_id = :user_id
+        ORDER BY transaction_date DESC
+        LIMIT 100
+    """,
+    "list_by_user_and_type": f"""
+        SELECT * FROM {BENCH_TABLE}
+        WHERE user_id = :user_id AND transaction_type = 'EXPENSE'
+        ORDER BY transaction_date DESC
+        LIMIT 100
+    """,
+    "stats_last_30_days": f"""
+        SELECT transaction_type, SUM(amount), COUNT(id) FROM {BENCH_TABLE}
+        WHERE user_id = :user_id AND transaction_date >= now() - interval '30 days'
+        GROUP BY transaction_type
+    """,
+    "report_category_ilike": f"""
+        SELECT * FROM {BENCH_TABLE}
+        WHERE category ILIKE '%bahan%'
+        ORDER BY transaction_date DESC
+        LIMIT 50
+    """,
+}
+
+INDEXES = [
+    f"CREATE INDEX bench_ix_user_date ON {BENCH_TABLE} (user_id, transaction_date)",
+    f"CREATE INDEX bench_ix_user_type_date ON {BENCH_TABLE} (user_id, transaction_type, transaction_date)",
+    f"CREATE INDEX bench_ix_category_trgm ON {BENCH_TABLE} USING gin (category gin_trgm_ops)",
+]
+
+def seed(conn, rows: int, users: int):
+    conn.execute(text(f"DROP TABLE IF EXISTS {BENCH_TABLE}"))
+    conn.execute(text(f"CREATE TABLE {BENCH_TABLE} (LIKE transactions INCLUDING DEFAULTS)"))
+    conn.execute(text(f"""
+        INSERT INTO {BENCH_TABLE} (id, user_id, transaction_type, amount, category, description, transaction_date, is_anomaly)
+        SELECT
+            g,
+            1 + (g % :users),
+            (ARRAY['INCOME', 'EXPENSE', 'RECEIVABLE', 'PAYABLE'])[1 + (g % 4)]::transactiontype,
+            round((random() * 500000)::numeric, 0),
+            (ARRAY['Penjualan', 'Bahan Baku', 'Gas', 'Listrik', 'Gaji', 'Sewa', 'Kemasan', 'Operasional'])[1 + (g % 8)],
+            'bench row ' || g,
+            now() - (random() * interval '365 days'),
+            0
+        FROM generate_series(1, :rows) AS g
+    """), {"rows": rows, "users": users})
+    conn.execute(text(f"ALTER TABLE {BENCH_TABLE} ADD PRIMARY KEY (id)"))
+    conn.execute(text(f"ANALYZE {BENCH_TABLE}"))
+
+def explain_all(conn, user_id: int) -> dict:
+    results = {}
+    for name, sql in HOT_QUERIES.items():
+        plan = conn.execute(
+            text(f"EXPLAIN (ANALYZE, BUFFERS) {sql}"), {"user_id": user_id}
+        ).scalars().all()
+        match = re.search(r"Execution Time: ([\d.]+) ms", plan[-1])
+        results[name] = {
+            "plan": "\n".join(plan),
+            "execution_ms": float(match.group(1)) if match else None,
+        }
+    return results
+
+def scan_nodes(plan: str) -> str:
+    """Condense a plan to its scan/sort nodes, e.g. 'Seq Scan | Sort'."""
+    nodes = re.findall(r"((?:Parallel )?(?:Seq|Index Only|Index|Bitmap Heap|Bitmap Index) Scan|Sort)", plan)
+    return " | ".join(nodes)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=None, help="Defaults to settings.database_url")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--keep", action="store_true", help=f"Keep {BENCH_TABLE} afterwards")
+    parser.add_argument("--verbose", action="store_true", help="Print full query plans")
+    args = parser.parse_args()
+
+    if args.database_url is None:
+        from app.config import settings
+        args.database_url = settings.database_url
+
+    engine = create_engine(args.database_url)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
+        started = time.perf_counter()
+        seed(conn, args.rows, args.users)
+        print(f"Seeded {args.rows:,} rows in {time.perf_counter() - started:.1f}s")
+
+        before = explain_all(conn, user_id=1)
+
+        started = time.perf_counter()
+        for ddl in INDEXES:
+            conn.execute(text(ddl))
+        conn.execute(text(f"ANALYZE {BENCH_TABLE}"))
+        print(f"Created indexes in {time.perf_counter() - started:.1f}s")
+
+        after = explain_all(conn, user_id=1)
+
+        if not args.keep:
+            conn.execute(text(f"DROP TABLE {BENCH_TABLE}"))
+
+    print(f"\n{'query':<24}{'before ms':>12}{'after ms':>12}{'speedup':>10}")
+    for name in HOT_QUERIES:
+        b, a = before[name]["execution_ms"], after[name]["execution_ms"]
+        speedup = f"{b / a:.1f}x" if a else "-"
+        print(f"{name:<24}{b:>12.2f}{a:>12.2f}{speedup:>10}")
+
+    for name in HOT_QUERIES:
+        if args.verbose:
+            print(f"\n=== {name} (before)\n{before[name]['plan']}")
+            print(f"\n=== {name} (after)\n{after[name]['plan']}")
+        else:
+            print(f"\n=== {name}")
+            print(f"before: {scan_nodes(before[name]['plan'])}")
+            print(f"after:  {scan_nodes(after[name]['plan'])}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Baseline schema as created by Base.metadata.create_all
+
+Existing databases that were bootstrapped by the application should be
+stamped with this revision (`alembic stamp 0001_baseline`) instead of
+running it.
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001_baseline'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('telegram_id', sa.String(), nullable=False),
+        sa.Column('username', sa.String(), nullable=True),
+        sa.Column('first_name', sa.String(), nullable=True),
+        sa.Column('last_name', sa.String(), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index('ix_users_id', 'users', ['id'])
+    op.create_index('ix_users_telegram_id', 'users', ['telegram_id'], unique=True)
+
+    op.create_table(
+        'transactions',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column(
+            'transaction_type',
+            sa.Enum('INCOME', 'EXPENSE', 'RECEIVABLE', 'PAYABLE', name='transactiontype'),
+            nullable=False
+        ),
+        sa.Column('amount', sa.Float(), nullable=False),
+        sa.Column('category', sa.String(), nullable=True),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('transaction_date', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('is_anomaly', sa.Integer(), nullable=True),
+        sa.Column('anomaly_score', sa.Float(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index('ix_transactions_id', 'transactions', ['id'])
+
+    op.create_table(
+        'bot_logs',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=True),
+        sa.Column(
+            'level',
+            sa.Enum('INFO', 'WARNING', 'ERROR', 'DEBUG', name='loglevel'),
+            nullable=True
+        ),
+        sa.Column('message', sa.Text(), nullable=False),
+        sa.Column('user_input', sa.Text(), nullable=True),
+        sa.Column('bot_response', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    )
+    op.create_index('ix_bot_logs_id', 'bot_logs', ['id'])
+
+    op.create_table(
+        'predictions',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column(
+            'prediction_type',
+            sa.Enum('FORECAST', 'ANOMALY', name='predictiontype'),
+            nullable=False
+        ),
+        sa.Column('prediction_data', sa.JSON(), nullable=False),
+        sa.Column('extra_metadata', sa.JSON(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    )
+    op.create_index('ix_predictions_id', 'predictions', ['id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_predictions_id', table_name='predictions')
+    op.drop_table('predictions')
+    op.drop_index('ix_bot_logs_id', table_name='bot_logs')
+    op.drop_table('bot_logs')
+    op.drop_index('ix_transactions_id', table_name='transactions')
+    op.drop_table('transactions')
+    op.drop_index('ix_users_telegram_id', table_name='users')
+    op.drop_index('ix_users_id', table_name='users')
+    op.drop_table('users')
+    sa.Enum(name='predictiontype').drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name='loglevel').drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name='transactiontype').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,45 @@
+"""Composite and trigram indexes for transactions
+
+Revision ID: 0002_transaction_indexes
+Revises: 0001_baseline
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002_transaction_indexes'
+down_revision: Union[str, None] = '0001_baseline'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_transactions_user_date', 'transactions', ['user_id', 'transaction_date'])
+    op.create_index(
+        'ix_transactions_user_type_date',
+        'transactions',
+        ['user_id', 'transaction_type', 'transaction_date']
+    )
+
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        op.create_index(
+            'ix_transactions_category_trgm',
+            'transactions',
+            ['category'],
+            postgresql_using='gin',
+            postgresql_ops={'category': 'gin_trgm_ops'}
+        )
+    else:
+        op.create_index('ix_transactions_category_trgm', 'transactions', ['category'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_transactions_category_trgm', table_name='transactions')
+    op.drop_index('ix_transactions_user_type_date', table_name='transactions')
+    op.drop_index('ix_transactions_user_date', table_name='transactions')
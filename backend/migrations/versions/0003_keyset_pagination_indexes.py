@@ -0,0 +1,30 @@
+"""Indexes for keyset pagination on transactions and bot_logs
+
+Revision ID: 0003_keyset_pagination_indexes
+Revises: 0002_transaction_indexes
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003_keyset_pagination_indexes'
+down_revision: Union[str, None] = '0002_transaction_indexes'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_transactions_date_id', 'transactions', ['transaction_date', 'id'])
+    op.create_index('ix_bot_logs_created_id', 'bot_logs', ['created_at', 'id'])
+    op.create_index('ix_bot_logs_user_created_id', 'bot_logs', ['user_id', 'created_at', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_bot_logs_user_created_id', table_name='bot_logs')
+    op.drop_index('ix_bot_logs_created_id', table_name='bot_logs')
+    op.drop_index('ix_transactions_date_id', table_name='transactions')
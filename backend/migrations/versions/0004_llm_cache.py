@@ -0,0 +1,36 @@
+"""Persistent LLM response cache
+
+Revision ID: 0004_llm_cache
+Revises: 0003_keyset_pagination_indexes
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004_llm_cache'
+down_revision: Union[str, None] = '0003_keyset_pagination_indexes'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'llm_cache_entries',
+        sa.Column('key', sa.String(length=64), nullable=False),
+        sa.Column('namespace', sa.String(length=50), nullable=False),
+        sa.Column('value', sa.Text(), nullable=False),
+        sa.Column('expires_at', sa.Float(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index('ix_llm_cache_entries_expires_at', 'llm_cache_entries', ['expires_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_llm_cache_entries_expires_at', table_name='llm_cache_entries')
+    op.drop_table('llm_cache_entries')
@@ -0,0 +1,59 @@
+"""Compact prediction storage: user_id, compressed payload, summary, fingerprint
+
+Revision ID: 0005_prediction_storage
+Revises: 0004_llm_cache
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005_prediction_storage'
+down_revision: Union[str, None] = '0004_llm_cache'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # batch mode so the NOT NULL change also works on SQLite
+    with op.batch_alter_table('predictions') as batch_op:
+        batch_op.add_column(sa.Column('user_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('payload', sa.LargeBinary(), nullable=True))
+        batch_op.add_column(sa.Column('summary', sa.JSON(), nullable=True))
+        batch_op.add_column(sa.Column('fingerprint', sa.String(length=64), nullable=True))
+        batch_op.alter_column('prediction_data', existing_type=sa.JSON(), nullable=True)
+    op.create_index(
+        'ix_predictions_type_user_created', 'predictions', ['prediction_type', 'user_id', 'created_at', 'id']
+    )
+    op.create_index('ix_predictions_fingerprint', 'predictions', ['fingerprint'])
+
+    # Backfill user_id from the metadata so `/history?user_id=` sees existing rows right away
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute(
+            "UPDATE predictions SET user_id = (extra_metadata->>'user_id')::integer "
+            "WHERE user_id IS NULL AND extra_metadata->>'user_id' ~ '^[0-9]+$'"
+        )
+    elif dialect == 'sqlite':
+        op.execute(
+            "UPDATE predictions SET user_id = CAST(json_extract(extra_metadata, '$.user_id') AS INTEGER) "
+            "WHERE user_id IS NULL AND json_valid(extra_metadata) "
+            "AND CAST(json_extract(extra_metadata, '$.user_id') AS TEXT) GLOB '[0-9]*' "
+            "AND CAST(json_extract(extra_metadata, '$.user_id') AS TEXT) NOT GLOB '*[^0-9]*'"
+        )
+    # Existing rows keep their JSON until `python -m app.jobs.prediction_retention` compacts them
+
+
+def downgrade() -> None:
+    op.drop_index('ix_predictions_fingerprint', table_name='predictions')
+    op.drop_index('ix_predictions_type_user_created', table_name='predictions')
+    with op.batch_alter_table('predictions') as batch_op:
+        batch_op.alter_column('prediction_data', existing_type=sa.JSON(), nullable=False)
+        batch_op.drop_column('fingerprint')
+        batch_op.drop_column('summary')
+        batch_op.drop_column('payload')
+        batch_op.drop_column('user_id')
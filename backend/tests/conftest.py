@@ -0,0 +1,63 @@
+import os
+import tempfile
+
+# Settings are read when app.config is imported, so the environment is set
+# up first. The database is always a throwaway SQLite file: the fixtures
+# drop every table.
+_tmp = tempfile.mkdtemp(prefix="cuanbot-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'test.db')}"
+os.environ["LLM_CACHE_URL"] = ""
+os.environ["ANOMALY_MODEL_DIR"] = os.path.join(_tmp, "anomaly_models")
+for name in ("POSTGRES_USER", "POSTGRES_PASSWORD", "POSTGRES_DB", "TELEGRAM_BOT_TOKEN", "GEMINI_API_KEY", "SECRET_KEY"):
+    os.environ.setdefault(name, "test")
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.database import Base, SessionLocal, engine
+from app.models import User
+from app.models.transaction import Transaction, TransactionType
+from app.services.user_stats import user_stats_store
+
+@pytest.fixture
+def db():
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=engine)
+        # Process-wide caches must not outlive the tables
+        user_stats_store.invalidate()
+
+@pytest.fixture
+def make_user(db):
+    def make(telegram_id: str = "1001", username: str = "tester") -> User:
+        user = User(telegram_id=telegram_id, username=username)
+        db.add(user)
+        db.commit()
+        return user
+    return make
+
+@pytest.fixture
+def add_transactions(db):
+    """Insert (amount, category, days_ago[, type]) tuples for a user, dated back from a fixed day."""
+    def add(user: User, rows, start: datetime = datetime(2026, 6, 30, 12, 0)):
+        transactions = []
+        for row in rows:
+            amount, category, days_ago = row[:3]
+            transaction_type = row[3] if len(row) > 3 else TransactionType.INCOME
+            transactions.append(Transaction(
+                user_id=user.id,
+                transaction_type=transaction_type,
+                amount=amount,
+                category=category,
+                description=category,
+                transaction_date=start - timedelta(days=days_ago)
+            ))
+        db.add_all(transactions)
+        db.commit()
+        return transactions
+    return add
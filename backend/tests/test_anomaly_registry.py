@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.anomaly_registry import INLINE_SPIKE_RULES, INLINE_Z_THRESHOLD, AnomalyModelRegistry
+from app.services.anomaly_rules import LargeExpenseRule, OperationalSpikeRule, SalarySpikeRule
+from app.services.ml_anomaly import AnomalyDetectionService
+
+CATEGORIES = [
+    ("income", "Penjualan", 150_000),
+    ("expense", "Bahan Baku", 80_000),
+    ("expense", "Gas", 25_000),
+    ("expense", "Gaji", 500_000),
+]
+
+@pytest.fixture
+def registry(tmp_path):
+    registry = AnomalyModelRegistry(str(tmp_path), retrain_interval=3600)
+    rng = np.random.default_rng(7)
+    start = datetime(2026, 1, 1)
+    rows = []
+    for i in range(200):
+        transaction_type, category, mean = CATEGORIES[i % len(CATEGORIES)]
+        date = start + timedelta(days=i // 4, hours=int(rng.integers(1, 12)))
+        rows.append((i + 1, transaction_type, float(round(mean * rng.uniform(0.8, 1.2), -2)), category, date))
+    df = pd.DataFrame(rows, columns=["id", "transaction_type", "amount", "category", "transaction_date"])
+    df["description"] = df["category"]
+    AnomalyDetectionService(registry=registry).detect_anomalies(df, user_id=1)
+    return registry
+
+def score(registry, amount, transaction_type, category, hour=4):
+    return registry.score_new("user_1", amount, transaction_type, category, datetime(2026, 4, 1, hour))
+
+def test_normal_transaction_is_scored_but_not_flagged(registry):
+    result = score(registry, 80_000, "expense", "Bahan Baku")
+    assert result["is_anomaly"] is False
+    assert result["warning"] is None
+    assert isinstance(result["anomaly_score"], float)
+
+def test_isolation_forest_alone_does_not_flag(registry):
+    # Far outside the training data, but no amount rule applies to income
+    model = registry.cached("user_1")
+    prediction, _ = model.score_one(90_000_000, "income", "Penjualan", datetime(2026, 4, 1, 20))
+    assert prediction == -1
+    result = score(registry, 90_000_000, "income", "Penjualan", hour=20)
+    assert result["is_anomaly"] is False
+    assert result["warning"] is None
+
+@pytest.mark.parametrize("amount, category", [
+    (400_000, "Bahan Baku"),   # large expense
+    (2_000_000, "Gaji"),       # salary spike
+    (90_000, "Gas"),           # operational spike
+])
+def test_amount_rules_flag_and_warn(registry, amount, category):
+    result = score(registry, amount, "expense", category)
+    assert result["is_anomaly"] is True
+    assert category in result["warning"]
+
+def test_unknown_category_or_missing_model(registry):
+    assert score(registry, 5_000_000, "expense", "Lain-lain")["is_anomaly"] is False
+    assert registry.score_new("user_2", 5_000_000, "expense", "Gas", datetime(2026, 4, 1)) is None
+
+def test_inline_thresholds_match_rules():
+    assert INLINE_Z_THRESHOLD == LargeExpenseRule.z_threshold
+    assert [(pattern.pattern, multiplier) for pattern, multiplier in INLINE_SPIKE_RULES] == [
+        (SalarySpikeRule.pattern, SalarySpikeRule.multiplier),
+        (OperationalSpikeRule.pattern, OperationalSpikeRule.multiplier),
+    ]
@@ -0,0 +1,131 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.anomaly_rules import DEFAULT_RULES, RuleContext, evaluate_rules
+from app.services.ml_anomaly import AnomalyDetectionService
+
+service = AnomalyDetectionService()
+
+CATEGORIES = [
+    ("income", "Penjualan", 150_000),
+    ("expense", "Bahan Baku", 80_000),
+    ("expense", "Gaji Crew", 500_000),
+    ("expense", "Gas", 25_000),
+    ("expense", "Listrik", 300_000),
+    ("income", "Setoran Modal", 1_000_000),
+    ("expense", None, 10_000),
+]
+
+def merchant(seed: int, rows: int = 300) -> pd.DataFrame:
+    """Synthetic merchant: business-hour transactions plus spikes, night rows, duplicates and capital bursts."""
+    rng = np.random.default_rng(seed)
+    start = datetime(2026, 1, 1)
+    records = []
+    for i in range(rows):
+        transaction_type, category, mean = CATEGORIES[rng.integers(len(CATEGORIES))]
+        amount = float(round(mean * rng.uniform(0.7, 1.3), -2))
+        if rng.random() < 0.04:
+            amount *= rng.choice([3, 6])
+        # 01:00-11:00 UTC is 08:00-18:00 WIB; two rows land at 03:00 WIB
+        hour = 20 if i in (10, 11) else int(rng.integers(1, 12))
+        date = start + timedelta(days=int(rng.integers(0, 90)), hours=hour, minutes=int(rng.integers(60)))
+        records.append((transaction_type, amount, category, date))
+    # Spikes, the same amount and category 20 minutes apart, and three capital injections in three days
+    for transaction_type, category, amount in [("expense", "Gaji Crew", 3_000_000), ("expense", "Gas", 200_000), ("expense", "Bahan Baku", 900_000)]:
+        records.append((transaction_type, float(amount), category, start + timedelta(days=60, hours=5)))
+    records.append(records[0][:3] + (records[0][3] + timedelta(minutes=20),))
+    for day in range(3):
+        records.append(("income", 2_000_000.0, "Setoran Modal", start + timedelta(days=40 + day, hours=3)))
+
+    df = pd.DataFrame(records, columns=["transaction_type", "amount", "category", "transaction_date"])
+    df.insert(0, "id", np.arange(1, len(df) + 1))
+    df["description"] = df["category"]
+    return df
+
+def legacy_reasons(df, category_stats, business_pattern, duplicates, frequent_capital):
+    """The per-row loop the rules replaced, returning {id: (severity, reasons)} and the type counts."""
+    stats = category_stats.to_dict('index')
+    anomaly_types = {}
+    results = {}
+
+    def add(reasons, type_, message, severity):
+        reasons.append({"type": type_, "message": message, "severity": severity})
+        anomaly_types[type_] = anomaly_types.get(type_, 0) + 1
+
+    for _, row in df.iterrows():
+        reasons = []
+        severity = "low"
+        if row['id'] in duplicates:
+            add(reasons, "duplicate", "Duplikasi transaksi terdeteksi", "high")
+            severity = "high"
+
+        hour = service._convert_to_jakarta_timezone(row['transaction_date'].to_pydatetime()).hour
+        if service._is_unusual_hour(hour, business_pattern['hour_pattern']):
+            common_hours = business_pattern['hour_pattern']['common_hours']
+            business_type = business_pattern['business_type']
+            if business_type == "restaurant" and 22 <= hour <= 2:
+                level, message = "low", f"Transaksi agak terlambat ({hour:02d}:00) - biasanya jam {common_hours}"
+            elif business_type == "online" and 0 <= hour <= 6:
+                level, message = "low", f"Transaksi dini hari ({hour:02d}:00) - biasanya jam {common_hours}"
+            else:
+                level, message = "medium", f"Transaksi pada jam tidak biasa ({hour:02d}:00) - biasanya jam {common_hours}"
+            add(reasons, "odd_hours", message, level)
+            if severity == "low":
+                severity = level
+
+        cat_stats = stats.get(row['category'], {'mean': 0, 'std': 1})
+        if row['transaction_type'] == 'expense' and cat_stats['mean'] > 0:
+            if (row['amount'] - cat_stats['mean']) / (cat_stats['std'] + 1) > 2.5:
+                normal_range = f"{int(cat_stats['mean'] - cat_stats['std']):,}–{int(cat_stats['mean'] + cat_stats['std']):,}"
+                add(reasons, "large_expense", f"{row['category']} Rp {int(row['amount']):,} (biasanya {normal_range} ribu)", "high")
+                severity = "high"
+
+        if row['category'] and 'gaji' in row['category'].lower() and cat_stats['mean'] > 0:
+            if row['amount'] > cat_stats['mean'] * 2:
+                add(reasons, "salary_spike", f"Gaji crew Rp {int(row['amount']):,} (biasanya {int(cat_stats['mean']):,} ribu)", "high")
+                severity = "high"
+
+        if row['category'] and any(c in row['category'].lower() for c in ['gas', 'listrik', 'bensin', 'operasional']):
+            if cat_stats['mean'] > 0 and row['amount'] > cat_stats['mean'] * 2.5:
+                add(reasons, "operational_spike", f"{row['category']} mendadak tinggi Rp {int(row['amount']):,} (biasanya {int(cat_stats['mean']):,})", "medium")
+                if severity == "low":
+                    severity = "medium"
+
+        if row['id'] in frequent_capital:
+            add(reasons, "frequent_capital", f"Setoran modal {frequent_capital[row['id']]} kali dalam {frequent_capital['days']} hari", "medium")
+            if severity == "low":
+                severity = "medium"
+
+        if reasons:
+            results[int(row['id'])] = (severity, reasons)
+    return results, anomaly_types
+
+@pytest.mark.parametrize("seed", [0, 1, 2, 3])
+def test_vectorized_rules_match_legacy_loop(seed):
+    df = merchant(seed)
+    category_stats = df.groupby('category')['amount'].agg(['mean', 'std', 'count'])
+    business_pattern = service._analyze_business_pattern(df)
+    duplicates = service._detect_duplicates(df)
+    frequent_capital = service._detect_frequent_capital(df)
+
+    hour_pattern = business_pattern['hour_pattern']
+    context = RuleContext(
+        df,
+        service._to_jakarta_series(df['transaction_date']).dt.hour,
+        category_stats,
+        business_pattern,
+        unusual_hours={hour for hour in range(24) if service._is_unusual_hour(hour, hour_pattern)},
+        duplicates=duplicates,
+        frequent_capital=frequent_capital
+    )
+    flagged, counts = evaluate_rules(DEFAULT_RULES, context)
+    vectorized = {int(df.loc[label, 'id']): (severity, reasons) for label, severity, reasons in flagged}
+
+    expected, expected_counts = legacy_reasons(df, category_stats, business_pattern, duplicates, frequent_capital)
+    assert vectorized == expected
+    assert {t: c for t, c in counts.items() if c} == expected_counts
+    # Every rule fired at least once, so the comparison covers all of them
+    assert set(expected_counts) == {rule.type for rule in DEFAULT_RULES}
@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from app.services.ml_anomaly import AnomalyDetectionService
+
+service = AnomalyDetectionService()
+
+def frame(rows):
+    """(id, amount, category, minutes after a fixed start) rows."""
+    start = datetime(2026, 3, 1, 2, 0)
+    return pd.DataFrame({
+        'id': [row[0] for row in rows],
+        'amount': [row[1] for row in rows],
+        'category': [row[2] for row in rows],
+        'transaction_date': [start + timedelta(minutes=row[3]) for row in rows],
+    })
+
+def test_duplicates_within_an_hour():
+    df = frame([
+        (1, 50_000.0, "Gas", 0),
+        (2, 15_000.0, "Penjualan", 10),
+        (3, 50_000.0, "Gas", 45),
+        (4, 50_000.0, "Listrik", 50),
+        (5, 15_000.0, "Penjualan", 200),
+    ])
+    assert sorted(service._detect_duplicates(df)) == [1, 3]
+
+def test_duplicates_are_found_across_interleaved_rows():
+    # The legacy loop only compared neighbours in time; 1 and 4 are still one pair
+    df = frame([(1, 20_000.0, "Gas", 0), (2, 5_000.0, "Parkir", 5), (3, 7_000.0, "Kopi", 10), (4, 20_000.0, "Gas", 30)])
+    assert sorted(service._detect_duplicates(df)) == [1, 4]
+
+def test_uncategorized_transactions_are_not_duplicates():
+    df = frame([
+        (1, 10_000.0, None, 0),
+        (2, 10_000.0, None, 5),
+        (3, 10_000.0, float("nan"), 10),
+    ])
+    assert service._detect_duplicates(df) == []
@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services.ml_forecasting import ForecastingService
+
+def income(days: int = 30, bump: float = 0.0):
+    start = datetime(2026, 5, 1, 3)
+    return [
+        {"transaction_type": "income", "amount": 100_000 + 5_000 * (day % 7) + (bump if day == days - 1 else 0),
+         "transaction_date": start + timedelta(days=day)}
+        for day in range(days)
+    ]
+
+@pytest.fixture
+def service():
+    return ForecastingService(cache_size=2)
+
+def test_fingerprint_depends_on_series_user_horizon_and_engine(service):
+    df = service.prepare_data(income())
+    key = service.fingerprint(df, 30, 1, "seasonal")
+    assert key == service.fingerprint(service.prepare_data(income()), 30, 1, "seasonal")
+    assert key != service.fingerprint(service.prepare_data(income(bump=1)), 30, 1, "seasonal")
+    assert key != service.fingerprint(service.prepare_data(income(days=31)), 30, 1, "seasonal")
+    assert key != service.fingerprint(df, 14, 1, "seasonal")
+    assert key != service.fingerprint(df, 30, 2, "seasonal")
+    assert key != service.fingerprint(df, 30, 1, "prophet")
+
+def test_fingerprint_ignores_transaction_order_and_split_amounts(service):
+    rows = income()
+    # Same daily totals from reordered rows, one day split into two transactions
+    split = rows[:5] + [{**rows[5], "amount": rows[5]["amount"] - 40_000}, {**rows[5], "amount": 40_000}] + rows[6:]
+    assert service.fingerprint(service.prepare_data(list(reversed(split))), 30, 1, "seasonal") == \
+        service.fingerprint(service.prepare_data(rows), 30, 1, "seasonal")
+
+def test_forecast_cache_miss_then_memory_hit(service):
+    first = service.forecast_revenue(income(), 14, user_id=1, engine="seasonal")
+    second = service.forecast_revenue(income(), 14, user_id=1, engine="seasonal")
+    assert first["cache"]["status"] == "miss"
+    assert second["cache"]["status"] == "memory"
+    assert second["cache"]["fingerprint"] == first["cache"]["fingerprint"]
+    assert second["forecast"] == first["forecast"]
+
+def test_changed_data_misses(service):
+    service.forecast_revenue(income(), 14, user_id=1, engine="seasonal")
+    assert service.forecast_revenue(income(bump=10_000), 14, user_id=1, engine="seasonal")["cache"]["status"] == "miss"
+
+def test_stored_forecast_is_used_and_cached(service):
+    stored = {}
+    first = service.forecast_revenue(income(), 14, user_id=1, engine="seasonal", output_format="columnar")
+    stored[first["cache"]["fingerprint"]] = {key: value for key, value in first.items() if key != "cache"}
+
+    # A fresh process: empty memory cache, the prediction table has the result
+    fresh = ForecastingService(cache_size=2)
+    lookups = []
+    def find_stored(fingerprint):
+        lookups.append(fingerprint)
+        return stored.get(fingerprint)
+
+    hit = fresh.forecast_revenue(income(), 14, user_id=1, engine="seasonal", find_stored=find_stored)
+    assert hit["cache"]["status"] == "stored"
+    assert hit["forecast"] == service.forecast_revenue(income(), 14, user_id=1, engine="seasonal")["forecast"]
+    assert fresh.forecast_revenue(income(), 14, user_id=1, engine="seasonal", find_stored=find_stored)["cache"]["status"] == "memory"
+    assert len(lookups) == 1
+
+def test_least_recently_used_entry_is_evicted(service):
+    for user_id in (1, 2):
+        service.forecast_revenue(income(), 14, user_id=user_id, engine="seasonal")
+    service.forecast_revenue(income(), 14, user_id=1, engine="seasonal")
+    service.forecast_revenue(income(), 14, user_id=3, engine="seasonal")
+    assert service.forecast_revenue(income(), 14, user_id=1, engine="seasonal")["cache"]["status"] == "memory"
+    assert service.forecast_revenue(income(), 14, user_id=2, engine="seasonal")["cache"]["status"] == "miss"
+
+def test_insufficient_data_is_not_cached(service):
+    result = service.forecast_revenue(income(days=5), 14, user_id=1, engine="seasonal")
+    assert result["status"] == "insufficient_data"
+    assert "cache" not in result
+
+def test_fingerprint_ignores_float_summation_noise(service):
+    df = service.prepare_data(income())
+    noisy = df.assign(y=df['y'] + 1e-9)
+    assert service.fingerprint(noisy, 30, 1, "seasonal") == service.fingerprint(df, 30, 1, "seasonal")
@@ -0,0 +1,67 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import transactions
+from app.api.pagination import NEXT_CURSOR_HEADER
+from app.database import get_db
+
+@pytest.fixture
+def client(db):
+    app = FastAPI()
+    app.include_router(transactions.router)
+    app.dependency_overrides[get_db] = lambda: db
+    return TestClient(app)
+
+@pytest.fixture
+def listing(make_user, add_transactions):
+    user = make_user()
+    # Three rows per day so pages end in the middle of equal transaction_date values
+    add_transactions(user, [(1000 * (i + 1), "Makanan", i // 3) for i in range(25)])
+    return user
+
+def walk_cursor(client, limit, **params):
+    ids, cursor = [], None
+    while True:
+        response = client.get("/api/transactions/", params={**params, "limit": limit, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        ids += [row["id"] for row in response.json()]
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            return ids
+
+def walk_offset(client, limit, **params):
+    ids, skip = [], 0
+    while True:
+        page = client.get("/api/transactions/", params={**params, "limit": limit, "skip": skip}).json()
+        ids += [row["id"] for row in page]
+        if len(page) < limit:
+            return ids
+        skip += limit
+
+@pytest.mark.parametrize("limit", [1, 4, 7, 25, 100])
+def test_cursor_pages_match_offset_pages(client, listing, limit):
+    cursor_ids = walk_cursor(client, limit)
+    assert cursor_ids == walk_offset(client, limit)
+    assert len(cursor_ids) == len(set(cursor_ids)) == 25
+
+def test_cursor_order_is_date_then_id_descending(client, db, listing):
+    rows = db.query(transactions.Transaction).all()
+    expected = [row.id for row in sorted(rows, key=lambda row: (row.transaction_date, row.id), reverse=True)]
+    assert walk_cursor(client, 5) == expected
+
+def test_cursor_respects_filters(client, make_user, add_transactions, listing):
+    other = make_user(telegram_id="2002", username="other")
+    add_transactions(other, [(500, "Bahan", i) for i in range(6)])
+    ids = walk_cursor(client, 4, user_id=other.id)
+    assert ids == walk_offset(client, 4, user_id=other.id)
+    assert len(ids) == 6
+
+def test_no_cursor_header_on_last_page(client, listing):
+    response = client.get("/api/transactions/", params={"limit": 30})
+    assert len(response.json()) == 25
+    assert NEXT_CURSOR_HEADER not in response.headers
+
+def test_invalid_cursor_is_rejected(client, listing):
+    response = client.get("/api/transactions/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.jobs.prediction_retention import run_retention
+from app.models.prediction import Prediction, PredictionType, decode_payload, encode_payload
+from app.services.prediction_store import save_prediction
+
+FORECAST = {
+    "status": "success",
+    "model": "seasonal",
+    "format": "columnar",
+    "dates": [f"2026-06-{day:02d}" for day in range(1, 31)],
+    "actual": [150_000.5] * 20 + [None] * 10,
+    "yhat": [None] * 20 + [151_234.25] * 10,
+    "lower": [None] * 20 + [120_000.0] * 10,
+    "upper": [None] * 20 + [180_000.0] * 10,
+    "metadata": {"training_samples": 20, "forecast_period_days": 10, "trend": "increasing",
+                 "average_forecast_revenue": 151_234.25, "last_actual_date": "2026-06-20",
+                 "last_forecast_date": "2026-06-30", "note": "Pendapatan naik ✓"}
+}
+
+def test_payload_round_trip():
+    payload = encode_payload(FORECAST)
+    assert decode_payload(payload) == FORECAST
+    assert isinstance(payload, bytes)
+
+def test_saved_prediction_round_trip(db):
+    saved_id = save_prediction(db, PredictionType.FORECAST, FORECAST, user_id=7, fingerprint="f" * 64).id
+    db.expunge_all()
+
+    row = db.get(Prediction, saved_id)
+    assert row.data == FORECAST
+    assert row.prediction_data is None
+    assert row.user_id == 7
+    assert row.summary == {
+        "status": "success", "model": "seasonal", "training_samples": 20, "forecast_period_days": 10,
+        "trend": "increasing", "average_forecast_revenue": 151_234.25,
+        "last_actual_date": "2026-06-20", "last_forecast_date": "2026-06-30"
+    }
+
+def test_anomaly_summary_keeps_only_nonzero_types(db):
+    result = {"status": "success", "total_transactions": 40, "anomalies_detected": 1, "anomalies": [{"transaction_id": 3}],
+              "summary": {"anomaly_types": {"duplicate": 1, "odd_hours": 0}, "high_severity": 1,
+                          "medium_severity": 0, "low_severity": 0}}
+    row = save_prediction(db, PredictionType.ANOMALY, result)
+    assert row.summary["anomaly_types"] == {"duplicate": 1}
+    assert row.data == result
+
+@pytest.fixture
+def aged_predictions(db):
+    """Predictions created 5, 40 and 100 days ago, plus a 10-day-old legacy row with uncompressed JSON."""
+    now = datetime.utcnow()
+    rows = {}
+    for age in (5, 40, 100):
+        row = save_prediction(db, PredictionType.FORECAST, FORECAST, user_id=1)
+        row.created_at = now - timedelta(days=age)
+        rows[age] = row
+    legacy = Prediction(
+        prediction_type=PredictionType.FORECAST,
+        prediction_data=FORECAST,
+        extra_metadata={"user_id": 2, "fingerprint": "a" * 64},
+        created_at=now - timedelta(days=10)
+    )
+    db.add(legacy)
+    db.commit()
+    rows["legacy"] = legacy
+    return rows
+
+def test_retention_drops_old_payloads_and_rows(db, aged_predictions):
+    ids = {key: row.id for key, row in aged_predictions.items()}
+    summary = run_retention(db, retention_days=90, payload_days=30)
+    db.expunge_all()
+
+    assert (summary["compacted"], summary["payloads_dropped"], summary["deleted"]) == (1, 2, 1)
+    assert db.get(Prediction, ids[100]) is None
+    expired = db.get(Prediction, ids[40])
+    assert expired.payload is None and expired.data is None
+    assert expired.summary["trend"] == "increasing"
+    assert db.get(Prediction, ids[5]).data == FORECAST
+
+    legacy = db.get(Prediction, ids["legacy"])
+    assert legacy.prediction_data is None
+    assert legacy.data == FORECAST
+    assert (legacy.user_id, legacy.fingerprint) == (2, "a" * 64)
+    assert legacy.summary["model"] == "seasonal"
+
+def test_retention_zero_disables_steps(db, aged_predictions):
+    summary = run_retention(db, retention_days=0, payload_days=0)
+    assert (summary["payloads_dropped"], summary["deleted"]) == (0, 0)
+    assert db.query(Prediction).filter(Prediction.payload.isnot(None)).count() == 4
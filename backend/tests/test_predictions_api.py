@@ -0,0 +1,109 @@
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from app.api import predictions
+from app.api.predictions import write_anomaly_flags
+from app.database import get_db
+from app.jobs.batch_forecast import run_batch_forecast
+from app.models.prediction import Prediction, PredictionType
+from app.models.transaction import Transaction, TransactionType
+from app.services.ml_forecasting import forecasting_service
+from app.services.prediction_store import save_prediction
+
+@pytest.fixture
+def client(db):
+    app = FastAPI()
+    app.include_router(predictions.router)
+    app.dependency_overrides[get_db] = lambda: db
+    return TestClient(app)
+
+def flags(db):
+    """{id: (is_anomaly, anomaly_score)} for every transaction."""
+    db.expire_all()
+    return {row.id: (row.is_anomaly, row.anomaly_score) for row in db.query(Transaction).order_by(Transaction.id)}
+
+@pytest.fixture
+def flagged_history(db, make_user, add_transactions):
+    """Two users, each with rows flagged by an earlier run (ids 1-10 for the first, 11-14 for the second)."""
+    first = make_user()
+    second = make_user(telegram_id="2002", username="other")
+    rows = add_transactions(first, [(10_000 * (i + 1), "Gas", i) for i in range(10)])
+    rows += add_transactions(second, [(5_000, "Parkir", i) for i in range(4)])
+    for row in rows[:2] + rows[10:]:
+        row.is_anomaly, row.anomaly_score = 1, -0.7
+    db.commit()
+    return first, second
+
+def test_write_back_sets_flags_and_resets_the_rest_of_the_user(db, flagged_history):
+    first, _ = flagged_history
+    # A row the bot scored inline after the run loaded its data
+    inline = Transaction(
+        user_id=first.id, transaction_type=TransactionType.EXPENSE, amount=900_000, category="Gas",
+        transaction_date=db.get(Transaction, 1).transaction_date, is_anomaly=1, anomaly_score=-0.8
+    )
+    db.add(inline)
+    db.commit()
+
+    result = write_anomaly_flags(db, [
+        {"transaction_id": 2, "anomaly_score": -0.6},
+        {"transaction_id": 5, "anomaly_score": -0.55},
+    ], first.id, max_id=10)
+
+    after = flags(db)
+    assert after[1] == (0, None)                     # no longer flagged
+    assert after[2] == (1, -0.6)                     # still flagged, new score
+    assert after[5] == (1, -0.55)                    # newly flagged
+    assert all(after[i] == (0, None) for i in (3, 4, 6, 7, 8, 9, 10))
+    assert all(after[i] == (1, -0.7) for i in (11, 12, 13, 14))  # other user untouched
+    assert after[inline.id] == (1, -0.8)             # newer than the run, untouched
+    assert result["flagged"] == 2
+    assert result["previously_flagged"] == 2
+
+def test_write_back_without_user_resets_every_user(db, flagged_history):
+    result = write_anomaly_flags(db, [{"transaction_id": 12, "anomaly_score": -0.9}], None, max_id=14)
+    after = flags(db)
+    assert [i for i, (flag, _) in after.items() if flag] == [12]
+    assert result["previously_flagged"] == 6
+
+def test_write_back_rolls_back_on_error(db, flagged_history):
+    with pytest.raises(HTTPException):
+        write_anomaly_flags(db, [{"transaction_id": 2, "anomaly_score": "not a number"}], None, max_id=14)
+    assert flags(db)[1] == (1, -0.7)
+
+def test_anomaly_endpoint_flags_exactly_the_reported_rows(client, db, make_user, add_transactions):
+    user = make_user()
+    add_transactions(user, [(50_000 + 1_000 * (i % 5), "Bahan Baku", i // 2, TransactionType.EXPENSE) for i in range(40)])
+    add_transactions(user, [(600_000, "Bahan Baku", 3, TransactionType.EXPENSE)])
+
+    response = client.post("/api/predictions/anomaly", json={"user_id": user.id})
+    assert response.status_code == 200
+    body = response.json()
+    reported = sorted(anomaly["transaction_id"] for anomaly in body["anomalies"])
+    assert reported
+    assert sorted(i for i, (flag, _) in flags(db).items() if flag) == reported
+    assert body["write_back"]["flagged"] == len(reported)
+
+def test_forecast_after_batch_run_is_served_from_the_stored_prediction(client, db, make_user, add_transactions):
+    user = make_user()
+    # Several fractional amounts per day, summed in SQL by the job and in pandas by the endpoint
+    add_transactions(user, [(10_000.1 * (1 + i % 3) + 0.2, "Penjualan", i // 3) for i in range(60)])
+
+    summary = run_batch_forecast(db, periods=14, workers=1, engine="seasonal")
+    assert summary["forecasted"] == 1
+    forecasting_service._cache.clear()
+
+    response = client.post("/api/predictions/forecast", json={"user_id": user.id, "periods": 14, "engine": "seasonal"})
+    assert response.status_code == 200
+    assert response.json()["cache"]["status"] == "stored"
+    assert db.query(Prediction).count() == 1
+
+def test_history_lists_summaries_and_decodes_payloads_on_request(client, db):
+    result = {"status": "insufficient_data", "message": "Minimal 7 hari data diperlukan untuk forecasting"}
+    save_prediction(db, PredictionType.FORECAST, result, user_id=4)
+
+    listed = client.get("/api/predictions/history", params={"user_id": 4}).json()["predictions"]
+    assert listed[0]["summary"] == result
+    assert "prediction_data" not in listed[0]
+    full = client.get("/api/predictions/history", params={"user_id": 4, "full": True}).json()["predictions"]
+    assert full[0]["prediction_data"] == result
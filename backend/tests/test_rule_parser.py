@@ -0,0 +1,63 @@
+import pytest
+
+from app.config import settings
+from app.services.rule_parser import extract_amounts, normalize_amounts, rule_parser
+
+THRESHOLD = settings.fast_parse_min_confidence
+
+@pytest.mark.parametrize("text, amounts", [
+    ("jual nasi goreng 15rb", [(15000, True)]),
+    ("bayar listrik 300 ribu", [(300000, True)]),
+    ("modal 1,5jt", [(1500000, True)]),
+    ("terima Rp 15.000", [(15000, True)]),
+    ("terima 1.500.000 dari toko", [(1500000, False)]),
+    ("beras 265rb, gula 126rb", [(265000, True), (126000, True)]),
+    ("jual 2 bungkus nasi 30rb", [(30000, True)]),
+    # Unit prices and item counts are not totals
+    ("beli stok 10rb x 3", []),
+    ("jual kopi 3 x 15rb", []),
+    ("jual kopi 3x 15rb", []),
+    ("jual kopi @15rb", []),
+    ("beli stok 2024 pcs", []),
+    ("beli 1.5 kg daging 180rb", [(180000, True)]),
+])
+def test_extract_amounts(text, amounts):
+    assert extract_amounts(text) == amounts
+
+@pytest.mark.parametrize("text, transaction_type, amount, category", [
+    ("jual nasi goreng 15rb", "income", 15000, "Penjualan"),
+    ("bayar listrik 300 ribu", "expense", 300000, "Listrik"),
+    ("beli gas 3kg 22rb", "expense", 22000, "Gas"),
+    ("beli 1.5 kg daging 180rb", "expense", 180000, "Bahan Baku"),
+])
+def test_simple_messages_take_the_fast_path(text, transaction_type, amount, category):
+    result = rule_parser.parse(text)
+    assert result["confidence"] >= THRESHOLD
+    assert (result["transaction_type"], result["amount"], result["category"]) == (transaction_type, amount, category)
+
+@pytest.mark.parametrize("text", [
+    "beli stok 10rb x 3",
+    "jual kopi 3 x 15rb",
+    "jual kopi @15rb",
+    "beli stok 2024 pcs",
+    # A total is present, but the quantity still makes the message ambiguous
+    "beli stok 2024 pcs 5jt",
+    "jual kopi 3 x 15rb total 45rb",
+    "bayar hutang 500rb",
+    "berapa untung jual 15rb?",
+])
+def test_ambiguous_messages_go_to_the_llm(text):
+    assert rule_parser.parse(text)["confidence"] < THRESHOLD
+
+@pytest.mark.parametrize("text, description", [
+    ("beli 1.5 kg daging 180rb", "Beli 1.5 kg daging"),
+    ("beli 1,5 kg gula 27rb", "Beli 1,5 kg gula"),
+    ("jual nasi goreng 15rb.", "Jual nasi goreng"),
+    ("beras 265rb, gula 126rb", "Beras gula"),
+    ("300rb", "Transaksi pengeluaran"),
+])
+def test_description_keeps_quantities(text, description):
+    assert rule_parser.parse(text)["description"] == description
+
+def test_normalize_amounts_canonicalizes_unit_prices():
+    assert normalize_amounts("beli stok 10rb x 3").split() == normalize_amounts("beli stok Rp 10.000 x 3").split()
@@ -99,10 +99,14 @@ export const api = {
 
   async getPredictionHistory(params?: {
     prediction_type?: string
+    user_id?: number
+    full?: boolean
     limit?: number
   }) {
     const queryParams = new URLSearchParams()
     if (params?.prediction_type) queryParams.append('prediction_type', params.prediction_type)
+    if (params?.user_id) queryParams.append('user_id', params.user_id.toString())
+    if (params?.full) queryParams.append('full', 'true')
     if (params?.limit) queryParams.append('limit', params.limit.toString())
 
     const response = await fetch(`${API_BASE_URL}/api/predictions/history?${queryParams}`)
@@ -198,4 +202,21 @@ export const api = {
 
     return `${API_BASE_URL}/api/reports/export/pdf?${queryParams}`
   },
+
+  getExportUrl(format: 'csv' | 'xlsx' | 'parquet', params?: {
+    transaction_type?: string
+    category?: string
+    start_date?: string
+    end_date?: string
+    user_id?: number
+  }) {
+    const queryParams = new URLSearchParams()
+    if (params?.transaction_type) queryParams.append('transaction_type', params.transaction_type)
+    if (params?.category) queryParams.append('category', params.category)
+    if (params?.start_date) queryParams.append('start_date', params.start_date)
+    if (params?.end_date) queryParams.append('end_date', params.end_date)
+    if (params?.user_id) queryParams.append('user_id', params.user_id.toString())
+
+    return `${API_BASE_URL}/api/reports/export/${format}?${queryParams}`
+  },
 }
@@ -8,3 +8,6 @@ CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
 GRANT ALL PRIVILEGES ON DATABASE cuanbot_db TO cuanbot;
 
 -- Additional setup can be added here
+
+-- Trigram support for category ILIKE searches (ix_transactions_category_trgm)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;